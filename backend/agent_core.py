@@ -1,24 +1,80 @@
 from browser_use import Agent, BrowserSession, ChatGoogle, Controller
+from browser_use.llm.messages import ContentPartImageParam, ContentPartTextParam, ImageURL, UserMessage
 from dotenv import load_dotenv
 import asyncio
 import base64
 import json
 import logging
 import re
+import threading
+from contextlib import asynccontextmanager, contextmanager
 from pydantic import BaseModel, Field
 import os
 from typing import List
+from utils.links import extract_links_static
+from utils.http_client import fetch_page
+from utils.validation_cache import get_validation_cache, make_cache_key
+from screenshot_store import get_screenshot_store
+from log_stream import log_sink
+from metrics import span, record_agent_run, record_llm_usage, record_screenshots
+from viewport_capture import get_capture_engine
+from shared_layout import layout_cache_config, layout_instructions
 
 load_dotenv()
 
 # Cloud vs Local browser detection
 USE_CLOUD = bool(os.getenv('BROWSER_USE_API_KEY'))
 
-def create_browser_session():
+# Models: validation runs on the pro model; tiered mode pre-screens with the cheap one first
+VALIDATION_MODEL = "gemini-3-pro-preview"
+PRESCREEN_MODEL = "gemini-2.5-flash-lite"
+VALIDATION_MODES = ('pro', 'tiered', 'batch')
+
+CONFIDENCE_INSTRUCTIONS = """
+    --- CONFIDENCE ---
+    Also set confidence between 0.0 and 1.0: how sure you are that you saw every section
+    and that the scores and issues are accurate. Use a low value if parts of the page did
+    not load, were hard to read, or you are unsure about the scores.
+    """
+
+# Builds the agents' chat model from a model name; swapped out by set_llm_factory (e.g. the offline benchmarks)
+_llm_factory = None
+
+
+def set_llm_factory(factory):
+    """Use factory(model) instead of ChatGoogle for every agent, None restores the default"""
+    global _llm_factory
+    _llm_factory = factory
+
+
+def create_llm(model):
+    if _llm_factory:
+        return _llm_factory(model)
+    return ChatGoogle(model=model)
+
+def create_browser_session(keep_alive=False):
     """Create a BrowserSession configured for cloud (Render) or local dev."""
     if USE_CLOUD:
-        return BrowserSession(use_cloud=True)
-    return BrowserSession()
+        return BrowserSession(use_cloud=True, keep_alive=keep_alive)
+    return BrowserSession(keep_alive=keep_alive)
+
+
+@asynccontextmanager
+async def browser_session_scope(browser_pool=None):
+    """Check a session out of browser_pool, or create a one-off session that is stopped afterwards"""
+    if browser_pool:
+        async with browser_pool.session() as browser_session:
+            yield browser_session
+        return
+
+    browser_session = create_browser_session()
+    with span('browser_start'):
+        await browser_session.start()
+    try:
+        yield browser_session
+    finally:
+        with span('browser_stop'):
+            await browser_session.stop()
 
 # Strip ANSI escape codes from strings
 ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
@@ -27,114 +83,97 @@ def strip_ansi(text):
     return ANSI_RE.sub('', text)
 
 
-class SocketIOLogHandler(logging.Handler):
-    """Custom log handler that transforms raw browser-use logs into clean agentic messages"""
-    def __init__(self, emit_fn):
-        super().__init__()
-        self.emit_fn = emit_fn
+STEP_RE = re.compile(r'Step\s*(\d+)')
+ACTION_URL_RE = re.compile(r'url:\s*(\S+)')
+ACTION_PAGES_RE = re.compile(r'pages:\s*([\d.]+)')
+ACTION_SECONDS_RE = re.compile(r'seconds:\s*(\d+)')
 
-    def emit(self, record):
-        raw = record.getMessage()
-        if not raw.strip():
-            return
 
-        message = strip_ansi(raw).strip()
-
-        # ── Step counter ──
-        if '📍 Step' in raw:
-            # Extract step number: "📍 Step 3:" → "Step 3"
-            match = re.search(r'Step\s*(\d+)', message)
-            if match:
-                self.emit_fn('log', {
-                    'message': f'Step {match.group(1)}',
-                    'type': 'step'
-                })
-            return
+def _format_step(message):
+    # "📍 Step 3:" → "Step 3"
+    match = STEP_RE.search(message)
+    return (f'Step {match.group(1)}', 'step') if match else None
 
-        # ── Agent's next goal (thought bubble) ──
-        if 'Next goal:' in raw:
-            thought = message.split('Next goal:', 1)[-1].strip()
-            if thought:
-                self.emit_fn('log', {
-                    'message': thought,
-                    'type': 'thought'
-                })
-            return
 
-        # ── Actions performed ──
-        if '▶️' in raw:
-            action = message.replace('▶️', '').strip()
-            # Parse action type
-            if 'navigate' in action.lower():
-                url_match = re.search(r'url:\s*(\S+)', action)
-                url = url_match.group(1).rstrip(',') if url_match else ''
-                self.emit_fn('log', {
-                    'message': f'Navigating to {url}' if url else 'Navigating...',
-                    'type': 'action'
-                })
-            elif 'scroll' in action.lower():
-                down = 'down' in action.lower()
-                pages_match = re.search(r'pages:\s*([\d.]+)', action)
-                pages = pages_match.group(1) if pages_match else ''
-                direction = 'down' if down else 'up'
-                self.emit_fn('log', {
-                    'message': f'Scrolling {direction} {pages + " pages" if pages else ""}',
-                    'type': 'action'
-                })
-            elif 'extract' in action.lower():
-                self.emit_fn('log', {
-                    'message': 'Extracting page content',
-                    'type': 'action'
-                })
-            elif 'wait' in action.lower():
-                sec_match = re.search(r'seconds:\s*(\d+)', action)
-                sec = sec_match.group(1) if sec_match else ''
-                self.emit_fn('log', {
-                    'message': f'Waiting {sec + "s" if sec else ""} for page to load',
-                    'type': 'action'
-                })
-            elif 'done' in action.lower():
-                self.emit_fn('log', {
-                    'message': 'Task completed',
-                    'type': 'action'
-                })
-            # Skip write_file, replace_file, and other internal actions
-            return
+def _format_thought(message):
+    thought = message.split('Next goal:', 1)[-1].strip()
+    return (thought, 'thought') if thought else None
 
-        # ── Navigation result ──
-        if '🔗 Navigated' in raw:
-            url = message.replace('🔗 Navigated to', '').strip()
-            self.emit_fn('log', {
-                'message': url,
-                'type': 'url'
-            })
-            return
 
-        # ── Scroll result ──
-        if '🔍 Scrolled' in raw:
-            self.emit_fn('log', {
-                'message': message.replace('🔍 ', ''),
-                'type': 'result'
-            })
-            return
+def _format_navigate(action):
+    url_match = ACTION_URL_RE.search(action)
+    url = url_match.group(1).rstrip(',') if url_match else ''
+    return f'Navigating to {url}' if url else 'Navigating...'
 
-        # ── Task completed ──
-        if '✅ Task completed' in raw:
-            self.emit_fn('log', {
-                'message': 'Agent finished this task',
-                'type': 'success'
-            })
-            return
 
-        # ── Page readiness warning ──
-        if '⚠️ Page readiness' in raw:
-            self.emit_fn('log', {
-                'message': 'Waiting for page to become ready...',
-                'type': 'action'
-            })
-            return
+def _format_scroll(action):
+    direction = 'down' if 'down' in action.lower() else 'up'
+    pages_match = ACTION_PAGES_RE.search(action)
+    pages = pages_match.group(1) if pages_match else ''
+    return f'Scrolling {direction} {pages + " pages" if pages else ""}'
+
+
+def _format_wait(action):
+    sec_match = ACTION_SECONDS_RE.search(action)
+    sec = sec_match.group(1) if sec_match else ''
+    return f'Waiting {sec + "s" if sec else ""} for page to load'
+
+
+# Action keyword -> formatter, checked in order against the lowercased action
+ACTION_FORMATTERS = (
+    ('navigate', _format_navigate),
+    ('scroll', _format_scroll),
+    ('extract', lambda action: 'Extracting page content'),
+    ('wait', _format_wait),
+    ('done', lambda action: 'Task completed'),
+)
+
+
+def _format_action(message):
+    action = message.replace('▶️', '').strip()
+    lowered = action.lower()
+    for keyword, formatter in ACTION_FORMATTERS:
+        if keyword in lowered:
+            return formatter(action), 'action'
+    # Skip write_file, replace_file, and other internal actions
+    return None
+
+
+# Raw-log marker -> formatter(message) returning (message, type) or None.
+# Checked in order with a plain substring test; anything unmatched (Eval,
+# Memory, write_file, ...) is dropped.
+LOG_DISPATCH = (
+    ('📍 Step', _format_step),
+    ('Next goal:', _format_thought),
+    ('▶️', _format_action),
+    ('🔗 Navigated', lambda message: (message.replace('🔗 Navigated to', '').strip(), 'url')),
+    ('🔍 Scrolled', lambda message: (message.replace('🔍 ', ''), 'result')),
+    ('✅ Task completed', lambda message: ('Agent finished this task', 'success')),
+    ('⚠️ Page readiness', lambda message: ('Waiting for page to become ready...', 'action')),
+)
+
+
+class SocketIOLogHandler(logging.Handler):
+    """
+    Custom log handler that transforms raw browser-use logs into clean agentic messages.
+
+    One instance is installed for the whole process. Each record goes to the
+    emit function in the `log_sink` context variable of the code that logged it,
+    so concurrent crawls only see their own agent's logs.
+    """
 
-        # Skip everything else (Eval, Memory, write_file, replace_file, etc.)
+    def emit(self, record):
+        emit_fn = log_sink.get()
+        if emit_fn is None:
+            return
+        raw = record.getMessage()
+        for marker, formatter in LOG_DISPATCH:
+            if marker in raw:
+                formatted = formatter(strip_ansi(raw).strip())
+                if formatted:
+                    message, log_type = formatted
+                    emit_fn('log', {'message': message, 'type': log_type})
+                return
 
 
 
@@ -154,6 +193,7 @@ class Insight(BaseModel):
     issues: str = Field(description="The issue found")
     recommendations: str = Field(description="Recommendations to make it better")
     viewport_number: int = Field(description="The viewport number (1-based) where this issue was observed during scrolling")
+    region: str = Field(default='content', description="Page region of the element: 'header', 'nav', 'footer' or 'content'")
     
 class Value(BaseModel):
     ctas_found: int
@@ -166,23 +206,77 @@ class Values(BaseModel):
     values: list[Value]
 
 
-async def extract_redirects(url, emit_log=None, stop_flag=None):
+# Tiered validation: the pre-screen also reports how sure it is
+class PreScreen(BaseModel):
+    values: list[Value]
+    confidence: float = Field(description="How confident you are in this audit, from 0.0 (guessing) to 1.0 (certain)")
+
+
+# Single-pass audit: links and validation from one agent run
+class PageAudit(BaseModel):
+    posts: list[redirect] = Field(description="Every link or button that takes the user from this page to another page")
+    values: list[Value]
+
+
+_handler_lock = threading.Lock()
+_installed_handler = None
+
+
+def install_log_handler():
+    """Install the single routing SocketIOLogHandler on the browser_use logger (idempotent)"""
+    global _installed_handler
+    with _handler_lock:
+        if _installed_handler is None:
+            _installed_handler = SocketIOLogHandler()
+            _installed_handler.setLevel(logging.INFO)
+            logging.getLogger('browser_use').addHandler(_installed_handler)
+        return _installed_handler
+
+
+@contextmanager
+def log_session(emit_log):
+    """Send browser_use records logged in this context (and tasks it starts) to emit_log"""
+    install_log_handler()
+    token = log_sink.set(emit_log)
+    try:
+        yield
+    finally:
+        log_sink.reset(token)
+
+
+def build_stop_callback(stop_flag):
+    """Build the agent's should-stop callback from a threading.Event"""
+    if not stop_flag:
+        return None
+
+    async def stop_callback():
+        return stop_flag.is_set()
+
+    return stop_callback
+
+
+async def extract_redirects(url, emit_log=None, stop_flag=None, browser_pool=None, static_first=None):
     # Extraction of navigation links
 
-    # Attach log handler if emit_log is provided
-    handler = None
-    if emit_log:
-        handler = SocketIOLogHandler(emit_log)
-        handler.setLevel(logging.INFO)
-        logging.getLogger('browser_use').addHandler(handler)
+    # Fast path: most sites serve their nav links in the HTML, no agent needed
+    if static_first is None:
+        static_first = os.getenv('STATIC_LINK_EXTRACTION', 'yes').lower() == 'yes'
+    if static_first:
+        try:
+            extracted_urls = await extract_links_static(url)
+        except Exception as e:
+            print(f"Static link extraction failed for {url}: {e}")
+            extracted_urls = None
+        if extracted_urls and extracted_urls['posts']:
+            if emit_log:
+                emit_log('log', {'message': f'Found {len(extracted_urls["posts"])} links in page HTML', 'type': 'info'})
+            return extracted_urls
+        # Nothing in the static HTML, the page is likely JS-rendered — let the agent scroll it
 
     # Build stop callback if stop_flag is provided
-    stop_callback = None
-    if stop_flag:
-        async def stop_callback():
-            return stop_flag.is_set()
+    stop_callback = build_stop_callback(stop_flag)
 
-    llm = ChatGoogle(model="gemini-2.5-flash-lite")
+    llm = create_llm("gemini-2.5-flash-lite")
 
     extraction_controller = Controller(output_model=redirects)
 
@@ -200,24 +294,18 @@ async def extract_redirects(url, emit_log=None, stop_flag=None):
     Stay on the domain of the provided url {url}
     """
 
-    browser_session = create_browser_session()
-
-    agent = Agent(task=task, llm=llm, controller=extraction_controller, browser_session=browser_session, register_should_stop_callback=stop_callback)
-    try:
-        extraction_result = await agent.run()
-    except InterruptedError:
-        if handler:
-            logging.getLogger('browser_use').removeHandler(handler)
-        await browser_session.stop()
-        await agent.close()
-        return None
-    finally:
-        await browser_session.stop()
-        await agent.close()
-
-    # Remove handler to avoid duplicate logs on next call
-    if handler:
-        logging.getLogger('browser_use').removeHandler(handler)
+    # Route browser_use records from this call to the caller's client
+    with log_session(emit_log):
+        async with browser_session_scope(browser_pool) as browser_session:
+            agent = Agent(task=task, llm=llm, controller=extraction_controller, browser_session=browser_session, register_should_stop_callback=stop_callback)
+            try:
+                with span('agent_run'):
+                    extraction_result = await agent.run()
+                record_agent_run('extract_redirects', extraction_result)
+            except InterruptedError:
+                return None
+            finally:
+                await agent.close()
     
     """
     Will generate a structured output as below
@@ -233,30 +321,12 @@ async def extract_redirects(url, emit_log=None, stop_flag=None):
     
     return extracted_urls
 
-    
-async def validate_page(url, audit_config=None, emit_log=None, stop_flag=None):
-
-    # Attach log handler if emit_log is provided
-    handler = None
-    if emit_log:
-        handler = SocketIOLogHandler(emit_log)
-        handler.setLevel(logging.INFO)
-        logging.getLogger('browser_use').addHandler(handler)
-
-    # Build stop callback if stop_flag is provided
-    stop_callback = None
-    if stop_flag:
-        async def stop_callback():
-            return stop_flag.is_set()
-
-    llm = ChatGoogle(model="gemini-3-pro-preview")
 
-    validation_controller = Controller(output_model= Values)
-    
-    # Build dynamic context section if audit_config is provided
-    context_section = ""
-    if audit_config:
-        context_section = f"""
+def build_intent_context(audit_config=None):
+    """Prompt section comparing the page against the user's intended design, empty without audit_config"""
+    if not audit_config:
+        return ""
+    return f"""
     --- USER'S INTENDED DESIGN ---
     The user describes their website as:
     - Type: {audit_config.get('website_type', 'Not specified')}
@@ -272,8 +342,13 @@ async def validate_page(url, audit_config=None, emit_log=None, stop_flag=None):
     - Is it appropriate for "{audit_config.get('target_audience', '')}"?
     - Point out specific mismatches between intended vs actual.
     """
-    
-    task = f"""
+
+
+def build_validation_task(url, audit_config=None, extra_instructions="", shared_regions=None):
+    """Build the section-by-section UI/UX audit task for the validation agent"""
+    context_section = build_intent_context(audit_config) + layout_instructions(shared_regions)
+
+    return f"""
     ROLE: Act as a meticulous UI/UX Auditor who catches every visual flaw a human eye would notice.
 
     GOAL: Perform a SECTION-BY-SECTION deep audit of {url}. Do NOT give generic feedback. Every issue must reference a SPECIFIC element.
@@ -339,11 +414,12 @@ async def validate_page(url, audit_config=None, emit_log=None, stop_flag=None):
     - theme_score: 0-100 based on visual issues (deduct 5-10 points per issue)
     - theme_thoughts: List of specific visual issues found
     {"- Call out mismatches between user's stated intent and actual implementation" if audit_config else ""}
-
+    {extra_instructions}
     --- OUTPUT REQUIREMENTS ---
     - Reference elements by EXACT text/location (e.g., "The 'Learn More' button in Features section")
     - Give SPECIFIC fixes (e.g., "Change button color from #ccc to #0066cc for better contrast")
     - For EVERY issue in cta_thoughts and theme_thoughts, set viewport_number to the viewport where you found it (1 = top of page, 2 = after first scroll, etc.)
+    - Set region to 'header', 'nav' or 'footer' for issues in the site header, navigation menu or footer, and 'content' otherwise
     - Only report issues, skip things that are fine
     - Do NOT click links that leave the domain
     - Stay strictly on {url}
@@ -353,86 +429,442 @@ async def validate_page(url, audit_config=None, emit_log=None, stop_flag=None):
     ⚠️ If you have no specific element names in your issues, you didn't analyze properly.
     ⚠️ If scores are 0 with no reasoning, go back and re-analyze.
     """
-    
-    browser_session = create_browser_session()
 
-    agent = Agent(
-        llm=llm,
-        task=task,
-        controller=validation_controller,
-        browser_session=browser_session,
-        register_should_stop_callback=stop_callback,
-    )
 
-    try:
-        result = await agent.run()
+def build_batch_task(url, audit_config, captures, shared_regions=None):
+    """Audit prompt for one batched request over every captured viewport of url"""
+    return f"""
+    ROLE: Act as a meticulous UI/UX Auditor who catches every visual flaw a human eye would notice.
 
-        validation_result = result.final_result()
-        if isinstance(validation_result, str):
-            validation_result = json.loads(validation_result)
+    GOAL: Perform a SECTION-BY-SECTION deep audit of {url}. Do NOT give generic feedback. Every issue must reference a SPECIFIC element.
+    {build_intent_context(audit_config)}{layout_instructions(shared_regions)}
+    You are given {len(captures)} screenshots of the page, captured top to bottom by scrolling
+    one full viewport ({len(captures)} viewports) at a time. Each image is preceded by its label,
+    e.g. "Viewport 2 (scrolled 800px)". Viewports can overlap at the bottom of the page.
+
+    For EACH viewport:
+    1. IDENTIFY the section (Hero, Features, Testimonials, Footer, etc.)
+    2. FIND ALL CTAs (buttons, links, form submits) with their EXACT text; evaluate visibility,
+       contrast, copy quality, placement and size. Count a CTA once even if two viewports show it.
+    3. ANALYZE icons, typography, buttons, spacing and colors for visual issues.
+
+    Then compile:
+    - ctas_found: Total count of ALL distinct CTAs
+    - cta_score: 0-100 based on CTA quality (deduct for generic text, poor contrast, bad placement)
+    - cta_thoughts: List of specific CTA issues found
+    - theme_score: 0-100 based on visual issues (deduct 5-10 points per issue)
+    - theme_thoughts: List of specific visual issues found
+    {"- Call out mismatches between user's stated intent and actual implementation" if audit_config else ""}
 
-    except InterruptedError:
-        if handler:
-            logging.getLogger('browser_use').removeHandler(handler)
-        await browser_session.stop()
-        await agent.close()
-        return None, None
-    finally:
-        await browser_session.stop()
-        await agent.close()
+    --- OUTPUT REQUIREMENTS ---
+    - Reference elements by EXACT text/location (e.g., "The 'Learn More' button in Features section")
+    - Give SPECIFIC fixes (e.g., "Change button color from #ccc to #0066cc for better contrast")
+    - For EVERY issue, set viewport_number to the label number of the screenshot it is visible in (1 to {len(captures)})
+    - Set region to 'header', 'nav' or 'footer' for issues in the site header, navigation menu or footer, and 'content' otherwise
+    - Only report issues, skip things that are fine
+    """
 
-    # Remove handler to avoid duplicate logs on next call
-    if handler:
-        logging.getLogger('browser_use').removeHandler(handler)
 
-    # Collect unique viewport numbers from all issues
+async def analyze_viewports(url, audit_config, captures, shared_regions=None):
+    """One multimodal request over all captured viewports, returns the Values dict"""
+    content = [ContentPartTextParam(text=build_batch_task(url, audit_config, captures, shared_regions))]
+    for capture in captures:
+        content.append(ContentPartTextParam(text=f"Viewport {capture['viewport_number']} (scrolled {capture['scroll_y']}px)"))
+        encoded = base64.b64encode(capture['image']).decode('ascii')
+        content.append(ContentPartImageParam(image_url=ImageURL(url=f"data:image/jpeg;base64,{encoded}", media_type='image/jpeg')))
+
+    response = await create_llm(VALIDATION_MODEL).ainvoke([UserMessage(content=content)], output_format=Values)
+    if response.usage:
+        record_llm_usage('validate_page_batch', response.usage.prompt_tokens, response.usage.completion_tokens)
+    validation_result = response.completion.model_dump()
+
+    # Findings must point at a real capture
+    last = len(captures)
+    for val in validation_result.get('values', []):
+        for thought in val.get('cta_thoughts', []) + val.get('theme_thoughts', []):
+            thought['viewport_number'] = min(max(int(thought['viewport_number']), 1), last)
+    return validation_result
+
+
+async def store_screenshots(sources):
+    """Store screenshot files/bytes off the event loop and record their bytes, returns their ids"""
+    screenshot_ids, stats = await get_screenshot_store().put_many(sources)
+    record_screenshots(stats)
+    return screenshot_ids
+
+
+async def store_captures(captures, validation_result):
+    """Screenshot ids of the captures referenced by the findings (placeholders when screenshots are off)"""
+    viewport_numbers = referenced_viewports(validation_result)
+    if os.getenv('ENABLE_SCREENSHOTS', 'no').lower() != 'yes':
+        return {vp_num: "placeholder" for vp_num in viewport_numbers}
+    wanted = [capture for capture in captures if capture['viewport_number'] in viewport_numbers]
+    screenshot_ids = await store_screenshots([capture['image'] for capture in wanted])
+    return {capture['viewport_number']: screenshot_id for capture, screenshot_id in zip(wanted, screenshot_ids)}
+
+
+def referenced_viewports(validation_result):
+    """Unique viewport numbers referenced by the findings"""
     viewport_numbers = set()
     for val in validation_result.get('values', []):
-        for thought in val.get('cta_thoughts', []):
-            vp = thought.get('viewport_number')
-            if vp is not None:
-                viewport_numbers.add(int(vp))
-        for thought in val.get('theme_thoughts', []):
+        for thought in val.get('cta_thoughts', []) + val.get('theme_thoughts', []):
             vp = thought.get('viewport_number')
             if vp is not None:
                 viewport_numbers.add(int(vp))
+    return viewport_numbers
+
+
+# Actions that load a page, the scroll position starts over at the top
+NAVIGATION_ACTIONS = ('navigate', 'go_to_url', 'open_tab', 'switch_tab', 'go_back', 'search_google', 'search')
+JS_SCROLL_BY_RE = re.compile(r'scrollBy\(\s*0\s*,\s*(-?)')
+JS_SCROLL_TOP_RE = re.compile(r'scrollTo\(\s*0\s*,\s*0\s*\)')
+
+
+def _step_actions(step):
+    """(name, params) of every action the agent took in one history step"""
+    model_output = getattr(step, 'model_output', None)
+    for action in getattr(model_output, 'action', None) or []:
+        for name, params in action.model_dump(exclude_none=True).items():
+            yield name, params or {}
+
+
+def _scrolled_position(position, name, params):
+    """Scroll position (in viewport heights from the top) after one agent action"""
+    if name in NAVIGATION_ACTIONS:
+        return 0.0
+    if name in ('scroll', 'scroll_down', 'scroll_up'):
+        pages = params.get('pages') or params.get('num_pages') or 1.0
+        if name == 'scroll_up' or params.get('down') is False:
+            pages = -pages
+        return max(0.0, position + pages)
+    # The validation task asks for window.scrollBy(0, window.innerHeight) through JS
+    script = json.dumps(params)
+    if JS_SCROLL_TOP_RE.search(script):
+        return 0.0
+    scroll_by = JS_SCROLL_BY_RE.search(script)
+    if scroll_by:
+        return max(0.0, position + (-1.0 if scroll_by.group(1) else 1.0))
+    return position
+
+
+def tag_step_screenshots(history):
+    """
+    Viewport of every step screenshot of an agent run, from the actions in its history.
+
+    A step's screenshot is taken before its actions run, so it shows the page at
+    the scroll position the earlier steps left it at. Returns
+    {viewport_number: {'path', 'step', 'scroll_offset'}} with the last screenshot
+    taken in each viewport, scroll_offset in viewport heights from the top.
+    """
+    tagged = {}
+    position = 0.0
+    for step_number, step in enumerate(getattr(history, 'history', []), start=1):
+        state = getattr(step, 'state', None)
+        path = getattr(state, 'screenshot_path', None)
+        # Steps before the first navigation only show about:blank
+        if path and (getattr(state, 'url', '') or '').startswith('http'):
+            viewport_number = int(position + 1e-6) + 1
+            tagged[viewport_number] = {'path': path, 'step': step_number, 'scroll_offset': round(position, 2)}
+        for name, params in _step_actions(step):
+            position = _scrolled_position(position, name, params)
+    return tagged
+
+
+async def map_screenshots(result, validation_result, url):
+    """Map the agent's step screenshots to the viewport numbers referenced by its findings"""
+    viewport_numbers = referenced_viewports(validation_result)
+    if not viewport_numbers:
+        return {}
+
+    # Add placeholder for each viewport when screenshots are disabled
+    if os.getenv('ENABLE_SCREENSHOTS', 'no').lower() != 'yes':
+        return {vp_num: "placeholder" for vp_num in viewport_numbers}
+
+    try:
+        tagged = tag_step_screenshots(result)
+        wanted = sorted(vp_num for vp_num in viewport_numbers if vp_num in tagged)
+        missing = sorted(viewport_numbers - set(wanted))
+        if missing:
+            print(f"No step screenshot at viewport(s) {missing} of {url}")
+        # Screenshots go to the content-addressed store, results only carry their ids
+        screenshot_ids = await store_screenshots([tagged[vp_num]['path'] for vp_num in wanted])
+        return dict(zip(wanted, screenshot_ids))
+    except Exception as e:
+        print(f"Screenshot mapping failed for {url}: {e}")
+        return {}
+
+
+async def lookup_cached_validation(url, audit_config=None, bypass_cache=False):
+    """
+    Fetch the page and look its content up in the validation cache.
+
+    Returns (cache_key, cached) where cached is (validation, screenshots) or None.
+    cache_key is None when caching is disabled or the page could not be fetched;
+    with bypass_cache the key is still computed so the fresh result refreshes the entry.
+    """
+    cache = get_validation_cache()
+    if not cache:
+        return None, None
+    try:
+        page = await fetch_page(url)
+    except Exception as e:
+        print(f"Validation cache fetch failed for {url}: {e}")
+        return None, None
+    if page['status'] >= 400:
+        return None, None
+
+    cache_key = make_cache_key(url, page['body'], audit_config)
+    if bypass_cache:
+        return cache_key, None
+    return cache_key, await asyncio.to_thread(cache.get, cache_key)
+
+
+async def store_cached_validation(cache_key, url, validation_result, screenshots):
+    cache = get_validation_cache()
+    if cache and cache_key and validation_result:
+        await asyncio.to_thread(cache.put, cache_key, url, validation_result, screenshots)
 
-    # Map browser-use's built-in step screenshots to viewport numbers.
-    # The agent scrolls sequentially (VP1 → VP2 → VP3 ...), so the step screenshots
-    # correspond to viewports in order. We take the last max_viewport screenshots
-    # from the list (working from the end avoids blank/loading screenshots at the start).
-    screenshots = {}
-    
-    # Check if screenshots are enabled via environment variable
-    enable_screenshots = os.getenv('ENABLE_SCREENSHOTS', 'no').lower() == 'yes'
     
-    if enable_screenshots and viewport_numbers:
-        try:
-            screenshot_paths = result.screenshot_paths()
-            # Filter out None entries (e.g., pre-navigation step)
-            valid_paths = [p for p in screenshot_paths if p is not None]
-
-            max_vp = max(viewport_numbers)
-
-            # The last max_vp screenshots map to viewports 1..max_vp in order
-            if len(valid_paths) >= max_vp:
-                vp_screenshots = valid_paths[-max_vp:]
-            else:
-                # Fewer screenshots than viewports — use what we have, mapped from VP1 onward
-                vp_screenshots = valid_paths
-
-            for i, path in enumerate(vp_screenshots):
-                vp_num = i + 1
-                if vp_num in viewport_numbers:
-                    with open(path, 'rb') as f:
-                        screenshots[vp_num] = base64.b64encode(f.read()).decode('utf-8')
-        except Exception as e:
-            print(f"Screenshot mapping failed for {url}: {e}")
-    elif not enable_screenshots and viewport_numbers:
-        # Add placeholder for each viewport when screenshots are disabled
-        for vp_num in viewport_numbers:
-            screenshots[vp_num] = "placeholder"
+async def run_validation_agent(url, model, output_model, task, agent_name, emit_log=None, stop_flag=None, browser_pool=None):
+    """
+    Run one validation agent on url with the given model and output model.
+
+    Returns (history, structured result dict), or None if the run was stopped.
+    """
+    # Build stop callback if stop_flag is provided
+    stop_callback = build_stop_callback(stop_flag)
+
+    llm = create_llm(model)
+
+    validation_controller = Controller(output_model=output_model)
+
+    # Route browser_use records from this call to the caller's client
+    with log_session(emit_log):
+        async with browser_session_scope(browser_pool) as browser_session:
+            agent = Agent(
+                llm=llm,
+                task=task,
+                controller=validation_controller,
+                browser_session=browser_session,
+                register_should_stop_callback=stop_callback,
+            )
+
+            try:
+                with span('agent_run'):
+                    result = await agent.run()
+                record_agent_run(agent_name, result)
+
+                validation_result = result.final_result()
+                if isinstance(validation_result, str):
+                    validation_result = json.loads(validation_result)
+
+            except InterruptedError:
+                return None
+            finally:
+                await agent.close()
+
+    return result, validation_result
+
+
+def resolve_validation_mode(validation_mode=None):
+    """Per-job validation_mode, else VALIDATION_MODE: 'pro' (default), 'tiered' or 'batch'"""
+    mode = (validation_mode or os.getenv('VALIDATION_MODE', 'pro')).lower()
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode: {mode}")
+    return mode
+
+
+# Cached tiers each mode may reuse: pro only trusts pro, tiered also its own pre-screens, batch anything
+CACHE_TIERS = {
+    'pro': ('pro',),
+    'tiered': ('pro', 'flash-lite'),
+    'batch': ('pro', 'flash-lite', 'batch'),
+}
+
+
+def cached_tier_satisfies(mode, tier):
+    """Whether a cached validation of tier (entries without one predate tiers and are pro) can serve mode"""
+    return (tier or 'pro') in CACHE_TIERS[mode]
+
+
+def escalation_reason(prescreen):
+    """Why a flash-lite pre-screen should be redone by the pro model, or None if it can stand"""
+    min_confidence = float(os.getenv('VALIDATION_MIN_CONFIDENCE', '0.7'))
+    max_findings = int(os.getenv('VALIDATION_MAX_FINDINGS', '8'))
+    threshold = float(os.getenv('VALIDATION_SCORE_THRESHOLD', '70'))
+    margin = float(os.getenv('VALIDATION_SCORE_MARGIN', '10'))
+
+    if not prescreen or not prescreen.get('values'):
+        return 'no result'
+    confidence = prescreen.get('confidence')
+    if not isinstance(confidence, (int, float)) or confidence < min_confidence:
+        return f'low confidence ({confidence})'
+    for value in prescreen['values']:
+        findings = len(value.get('cta_thoughts') or []) + len(value.get('theme_thoughts') or [])
+        if findings > max_findings:
+            return f'{findings} findings'
+        for score_name in ('cta_score', 'theme_score'):
+            score = value.get(score_name)
+            if isinstance(score, (int, float)) and abs(score - threshold) <= margin:
+                return f'{score_name} {score} near the {threshold:g} threshold'
+    return None
+
+
+async def validate_page(url, audit_config=None, emit_log=None, stop_flag=None, browser_pool=None, bypass_cache=False, validation_mode=None, shared_regions=None):
+    """
+    CTA/theme validation of one page, returns (validation, screenshots) or (None, None) if stopped.
+
+    In 'tiered' mode the page is first audited by the cheap pre-screen model and
+    only escalated to the pro model when escalation_reason() finds the result
+    unreliable. In 'batch' mode there is no agent: the page's viewports are
+    captured programmatically and audited in one multimodal request.
+    validation['tier'] records which path produced the result.
+    shared_regions (e.g. ['footer', 'header']) are left out of the audit because
+    another page of the site already covers them (see shared_layout).
+    """
+    mode = resolve_validation_mode(validation_mode)
+
+    # Unchanged page + same audit_config → reuse the previous validation
+    cache_key, cached = await lookup_cached_validation(url, layout_cache_config(audit_config, shared_regions), bypass_cache)
+    # A cheaper cached result (pre-screen, batch) is not good enough for a pro-only audit
+    if cached and cached_tier_satisfies(mode, cached[0].get('tier')):
+        if emit_log:
+            emit_log('log', {'message': 'Page unchanged since last audit, using cached validation', 'type': 'success'})
+        return cached
+
+    task = build_validation_task(url, audit_config, shared_regions=shared_regions)
+    validation_result = None
+    reason = None
+
+    if mode == 'batch':
+        # No agent: scroll and capture programmatically in a pooled session (cloud with USE_CLOUD), then one multimodal request
+        async with browser_session_scope(browser_pool) as browser_session:
+            with span('capture'):
+                captures = await get_capture_engine().capture(url, cdp_url=browser_session.cdp_url)
+        if not captures:
+            raise ValueError(f"No viewports captured for {url}")
+        if stop_flag and stop_flag.is_set():
+            return None, None
+        if emit_log:
+            emit_log('log', {'message': f'Captured {len(captures)} viewports, analyzing them in one request', 'type': 'info'})
+        with span('batch_analysis'):
+            validation_result = await analyze_viewports(url, audit_config, captures, shared_regions)
+        validation_result['tier'] = 'batch'
+        with span('screenshots'):
+            screenshots = await store_captures(captures, validation_result)
+        await store_cached_validation(cache_key, url, validation_result, screenshots)
+        return validation_result, screenshots
+
+    if mode == 'tiered':
+        run = await run_validation_agent(
+            url, PRESCREEN_MODEL, PreScreen,
+            build_validation_task(url, audit_config, extra_instructions=CONFIDENCE_INSTRUCTIONS, shared_regions=shared_regions),
+            'validate_page_prescreen', emit_log=emit_log, stop_flag=stop_flag, browser_pool=browser_pool,
+        )
+        if run is None:
+            return None, None
+        result, prescreen = run
+        reason = escalation_reason(prescreen)
+        if reason is None:
+            validation_result = {'values': prescreen['values'], 'tier': 'flash-lite', 'confidence': prescreen['confidence']}
+        else:
+            if emit_log:
+                emit_log('log', {'message': f'Pre-screen inconclusive ({reason}), escalating to the pro model', 'type': 'info'})
+            if stop_flag and stop_flag.is_set():
+                return None, None
+
+    if validation_result is None:
+        run = await run_validation_agent(
+            url, VALIDATION_MODEL, Values, task, 'validate_page',
+            emit_log=emit_log, stop_flag=stop_flag, browser_pool=browser_pool,
+        )
+        if run is None:
+            return None, None
+        result, validation_result = run
+        validation_result['tier'] = 'pro'
+        if reason:
+            validation_result['escalation_reason'] = reason
+
+    with span('screenshots'):
+        screenshots = await map_screenshots(result, validation_result, url)
+    await store_cached_validation(cache_key, url, validation_result, screenshots)
 
     return validation_result, screenshots
-    
 
+
+async def audit_page(url, audit_config=None, emit_log=None, stop_flag=None, browser_pool=None, bypass_cache=False, shared_regions=None):
+    """
+    Single-pass audit: one navigation and one scroll-through that returns both
+    the page's outgoing links and its CTA/theme validation.
+
+    Returns (extracted, validation, screenshots) shaped like extract_redirects
+    and validate_page, or (None, None, None) if the agent was stopped.
+    Raises ValueError when the agent did not produce a usable result, so the
+    caller can fall back to extract_redirects + validate_page.
+    """
+    # On a cache hit only the links are missing, which the static fast path usually covers
+    cache_key, cached = await lookup_cached_validation(url, layout_cache_config(audit_config, shared_regions), bypass_cache)
+    # Single-pass audits are pro
+    if cached and cached_tier_satisfies('pro', cached[0].get('tier')):
+        if emit_log:
+            emit_log('log', {'message': 'Page unchanged since last audit, using cached validation', 'type': 'success'})
+        extracted = await extract_redirects(url, emit_log=emit_log, stop_flag=stop_flag, browser_pool=browser_pool)
+        validation_result, screenshots = cached
+        return extracted, validation_result, screenshots
+
+    # Build stop callback if stop_flag is provided
+    stop_callback = build_stop_callback(stop_flag)
+
+    llm = create_llm(VALIDATION_MODEL)
+
+    audit_controller = Controller(output_model=PageAudit)
+
+    link_instructions = f"""
+    --- LINK COLLECTION (same scroll-through) ---
+    While you analyze each viewport, ALSO note every link or button that takes the user from
+    the current page to another page (navbar, in-page CTAs, footer). Do NOT click them.
+    In the final output, list them in posts with their caption and absolute url.
+    Only include links on the domain of {url}.
+    """
+
+    task = build_validation_task(url, audit_config, extra_instructions=link_instructions, shared_regions=shared_regions)
+
+    # Route browser_use records from this call to the caller's client
+    with log_session(emit_log):
+        async with browser_session_scope(browser_pool) as browser_session:
+            agent = Agent(
+                llm=llm,
+                task=task,
+                controller=audit_controller,
+                browser_session=browser_session,
+                register_should_stop_callback=stop_callback,
+            )
+
+            try:
+                with span('agent_run'):
+                    result = await agent.run()
+                record_agent_run('audit_page', result)
+
+                audit_result = result.final_result()
+                if isinstance(audit_result, str):
+                    audit_result = json.loads(audit_result)
+
+            except InterruptedError:
+                return None, None, None
+            finally:
+                await agent.close()
+
+    if stop_flag and stop_flag.is_set():
+        return None, None, None
+
+    if not audit_result or not audit_result.get('values'):
+        raise ValueError(f"Single-pass audit returned no validation for {url}")
+
+    extracted = {'posts': audit_result.get('posts', [])}
+    validation_result = {'values': audit_result['values'], 'tier': 'pro'}
+
+    with span('screenshots'):
+        screenshots = await map_screenshots(result, validation_result, url)
+    await store_cached_validation(cache_key, url, validation_result, screenshots)
+
+    return extracted, validation_result, screenshots
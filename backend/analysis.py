@@ -0,0 +1,95 @@
+"""
+The analysis itself, shared by the web process (app.py) and worker processes (worker.py).
+"""
+import asyncio
+
+from bfs_crawler import bfs_crawler
+from browser_pool import get_shared_browser_pool
+from metrics import span
+from scheduler import default_max_concurrent
+from utils.http_client import check_reachable
+from utils.intent import extract_audit_config
+
+
+class AnalysisError(Exception):
+    """A user-facing failure (bad input, unreachable site) rather than an internal error"""
+
+
+async def check_url_reachable(url, timeout=10):
+    """Reachability check through the shared pooled HTTP client (see utils.http_client.check_reachable)"""
+    return await check_reachable(url, timeout=timeout)
+
+
+async def run_analysis(params, emit_log=None, stop_flag=None, on_progress=None, on_page_result=None):
+    """
+    Reachability check, intent parsing and the BFS crawl for one validated request.
+
+    Runs on the shared event loop; blocking steps are moved to threads.
+    Raises AnalysisError for user-facing failures. Returns the crawl results.
+    """
+    def log(message, log_type='info'):
+        print(message)
+        if emit_log:
+            emit_log('log', {'message': message, 'type': log_type})
+
+    url = params['url']
+    user_intent = params.get('user_intent')
+
+    log(f'Checking if {url} is reachable...', 'info')
+    with span('reachability'):
+        is_reachable, error_msg = await check_url_reachable(url)
+    if not is_reachable:
+        raise AnalysisError(error_msg)
+
+    log('URL is reachable. Starting analysis...', 'success')
+
+    # Parse user intent if provided
+    audit_config = None
+    if user_intent:
+        log('Parsing user intent...', 'info')
+        with span('intent'):
+            audit_config_obj = await asyncio.to_thread(extract_audit_config, user_intent)
+        if audit_config_obj:
+            # Convert Pydantic model to dict
+            audit_config = audit_config_obj.model_dump()
+            log('Intent parsed successfully', 'success')
+        else:
+            log('Warning: Failed to parse intent, continuing without it...', 'warning')
+
+    # Run the BFS crawler (this will take 2-5 minutes)
+    # Browser sessions come from the process-wide pool shared by all crawls on this loop
+    results = await bfs_crawler(
+        url,
+        params['max_pages'],
+        audit_config,
+        emit_log=emit_log,
+        stop_flag=stop_flag,
+        concurrency=params.get('concurrency'),
+        single_pass=params.get('single_pass'),
+        bypass_cache=params.get('bypass_cache', False),
+        on_progress=on_progress,
+        on_page_result=on_page_result,
+        template_sample=params.get('template_sample'),
+        incremental=params.get('incremental'),
+        sitemap=params.get('sitemap'),
+        validation_mode=params.get('validation_mode'),
+        shared_layout=params.get('shared_layout'),
+        browser_pool=get_shared_browser_pool(size=default_max_concurrent()),
+    )
+
+    # Add audit_config to results for frontend display
+    if audit_config:
+        results['audit_config'] = audit_config
+
+    print(f"Analysis complete. Analyzed {results['total_pages_analyzed']} pages.")
+    return results
+
+
+def summarize_results(results):
+    """Crawl results without the per-page validation and screenshots (already streamed as page_result)"""
+    summary = {key: value for key, value in results.items() if key != 'results'}
+    summary['pages'] = [
+        {key: value for key, value in result.items() if key not in ('validation', 'screenshots')}
+        for result in results['results']
+    ]
+    return summary
@@ -1,12 +1,17 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
-import asyncio
+import os
 import threading
-import requests
 from urllib.parse import urlparse
-from bfs_crawler import bfs_crawler
-from utils.intent import extract_audit_config
+from agent_core import VALIDATION_MODES
+from analysis import AnalysisError, run_analysis, summarize_results
+from jobs import get_job_runner
+from job_queue import get_dispatcher
+from utils.event_loop import get_event_loop
+from screenshot_store import get_screenshot_store
+from metrics import render_metrics
+from log_stream import buffered_emitter, stats as log_stream_stats
 
 app = Flask(__name__)
 CORS(app, origins=["https://vibeaudit-delta.vercel.app", "http://localhost:5173", "http://localhost:5174"])
@@ -16,6 +21,8 @@ socketio = SocketIO(app, cors_allowed_origins=["https://vibeaudit-delta.vercel.a
 
 # Track active analysis sessions: sid -> threading.Event (stop flag)
 active_sessions = {}
+# sid -> job_id of the session's analysis, so a stop can drop it from the queue
+session_jobs = {}
 
 
 def validate_url(url):
@@ -39,35 +46,120 @@ def validate_url(url):
     return True, None
 
 
-def check_url_reachable(url, timeout=10):
-    try:
-        # HEAD request (faster than GET, doesn't download full page)
-        response = requests.head(url, timeout=timeout, allow_redirects=True)
-        
-        # Accept 2xx and 3xx status codes as success
-        if response.status_code < 400:
-            return True, None
-        else:
-            return False, f"Website returned status code {response.status_code}"
-            
-    except requests.exceptions.Timeout:
-        return False, "Request timeout - website took too long to respond"
-    except requests.exceptions.ConnectionError:
-        return False, "Connection error - could not reach the website"
-    except requests.exceptions.TooManyRedirects:
-        return False, "Too many redirects"
-    except Exception as e:
-        return False, f"Error checking URL: {str(e)}"
-
-
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
         "status": "ok",
-        "message": "QAI Backend API is running"
+        "message": "QAI Backend API is running",
+        "log_stream": dict(log_stream_stats)
     }), 200
 
 
+# Accepted spellings of the yes/no job flags (the same words as the env switches)
+FLAG_VALUES = {'yes': True, 'true': True, 'no': False, 'false': False}
+
+
+def parse_flag(value):
+    """A job flag as True/False (None when absent), raises ValueError for anything else"""
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in FLAG_VALUES:
+        return FLAG_VALUES[value.strip().lower()]
+    raise ValueError(value)
+
+
+def parse_analysis_request(data):
+    """Validate an analysis request body, returns (params, None) or (None, error message)"""
+    if not data:
+        return None, "Request body is required"
+
+    url = (data.get('url') or '').strip()
+    max_pages = data.get('max_pages', 5)
+    concurrency = data.get('concurrency', None)
+    template_sample = data.get('template_sample', None)
+    validation_mode = data.get('validation_mode', None)
+
+    # Validate max_pages
+    if not isinstance(max_pages, int) or max_pages < 1 or max_pages > 10:
+        return None, "max_pages must be an integer between 1 and 10"
+
+    # Validate concurrency
+    if concurrency is not None and (not isinstance(concurrency, int) or concurrency < 1):
+        return None, "concurrency must be a positive integer"
+
+    # Validate template_sample (0 disables template clustering)
+    if template_sample is not None and (not isinstance(template_sample, int) or template_sample < 0):
+        return None, "template_sample must be a non-negative integer"
+
+    # Validate validation_mode
+    if validation_mode is not None and validation_mode not in VALIDATION_MODES:
+        return None, f"validation_mode must be one of: {', '.join(VALIDATION_MODES)}"
+
+    # Validate the yes/no flags: "false" or 0 must not turn a feature on
+    flags = {}
+    for name in ('single_pass', 'bypass_cache', 'incremental', 'sitemap', 'shared_layout'):
+        try:
+            flags[name] = parse_flag(data.get(name))
+        except ValueError:
+            return None, f"{name} must be a boolean (true/false or yes/no)"
+
+    # Validate URL format
+    is_valid, error_msg = validate_url(url)
+    if not is_valid:
+        return None, error_msg
+
+    return {
+        'url': url,
+        'max_pages': max_pages,
+        'user_intent': data.get('user_intent', None),
+        'concurrency': concurrency,
+        'single_pass': flags['single_pass'],
+        'bypass_cache': bool(flags['bypass_cache']),
+        'template_sample': template_sample,
+        'incremental': flags['incremental'],
+        'sitemap': flags['sitemap'],
+        'validation_mode': validation_mode,
+        'shared_layout': flags['shared_layout'],
+    }, None
+
+
+def deliver_remote_event(sid, event, payload):
+    """Forward a frame from a worker process to the client's socket, unless the session has ended"""
+    stop_flag = active_sessions.get(sid)
+    if stop_flag is None or stop_flag.is_set():
+        return
+    socketio.emit(event, payload, room=sid)
+
+
+def finish_remote_job(job_id, sid):
+    """A worker process finished job_id, release its Socket.IO session"""
+    if sid and session_jobs.get(sid) == job_id:
+        active_sessions.pop(sid, None)
+        session_jobs.pop(sid, None)
+
+
+def get_queue_dispatcher():
+    """Dispatcher to worker processes when JOB_QUEUE_URL is set, None when analyses run in this process"""
+    return get_dispatcher(get_job_runner().store, deliver=deliver_remote_event, on_finish=finish_remote_job, screenshot_store=get_screenshot_store())
+
+
+def submit_job(params, client=None, wait=False):
+    """Queue a REST analysis job on the background worker pool, returns its job id"""
+    job_runner = get_job_runner()
+    job_id = job_runner.store.create(params, client=client)
+    dispatcher = get_queue_dispatcher()
+    if dispatcher:
+        dispatcher.submit(job_id, params, wait=wait)
+        return job_id
+    on_progress = job_runner.progress_callback(job_id)
+
+    async def task():
+        return await run_analysis(params, on_progress=on_progress)
+
+    job_runner.submit(job_id, task, client=client)
+    return job_id
+
+
 @socketio.on('start_analysis')
 def handle_start_analysis(data):
     """WebSocket handler for starting analysis with streaming logs"""
@@ -78,70 +170,90 @@ def handle_start_analysis(data):
     stop_flag = threading.Event()
     active_sessions[sid] = stop_flag
 
-    def emit_to_client(event, payload):
+    def send_to_client(event, payload):
         """Wrapper that emits to the specific client using their session ID"""
         if stop_flag.is_set():
             return
         socketio.emit(event, payload, room=sid)
 
-    try:
-        url = data.get('url', '').strip()
-        max_pages = data.get('max_pages', 5)
-        user_intent = data.get('user_intent', None)
-
-        # Validate max_pages
-        if not isinstance(max_pages, int) or max_pages < 1 or max_pages > 10:
-            emit_to_client('error', {'message': 'max_pages must be an integer between 1 and 10'})
-            return
-
-        # Validate URL format
-        is_valid, error_msg = validate_url(url)
-        if not is_valid:
-            emit_to_client('error', {'message': error_msg})
-            return
-
-        emit_to_client('log', {'message': f'Checking if {url} is reachable...', 'type': 'info'})
-
-        is_reachable, error_msg = check_url_reachable(url)
-        if not is_reachable:
-            emit_to_client('error', {'message': error_msg})
-            return
-
-        emit_to_client('log', {'message': 'URL is reachable. Starting analysis...', 'type': 'success'})
-
-        # Parse user intent if provided
-        audit_config = None
-        if user_intent:
-            emit_to_client('log', {'message': 'Parsing user intent...', 'type': 'info'})
-            audit_config_obj = extract_audit_config(user_intent)
-            if audit_config_obj:
-                audit_config = audit_config_obj.model_dump()
-                emit_to_client('log', {'message': 'Intent parsed successfully', 'type': 'success'})
-            else:
-                emit_to_client('log', {'message': 'Warning: Failed to parse intent, continuing without it...', 'type': 'warning'})
-
-        # Run the BFS crawler with emit function and stop flag for cancellation
-        results = asyncio.run(bfs_crawler(url, max_pages, audit_config, emit_log=emit_to_client, stop_flag=stop_flag))
-
-        if stop_flag.is_set():
-            print(f"Analysis for {sid} was stopped by user.")
-            return
-
-        # Add audit_config to results
-        if audit_config:
-            results['audit_config'] = audit_config
-
-        emit_to_client('log', {'message': f'Analysis complete. Analyzed {results["total_pages_analyzed"]} pages.', 'type': 'success'})
-        emit_to_client('complete', {'status': 'success', 'data': results})
-
-    except Exception as e:
-        if stop_flag.is_set():
-            print(f"Analysis for {sid} was stopped by user.")
-            return
-        print(f"ERROR in start_analysis: {str(e)}")
-        emit_to_client('error', {'message': f'Internal server error: {str(e)}'})
-    finally:
-        active_sessions.pop(sid, None)
+    # `log` events are batched into `logs` frames; everything else flushes and goes straight out
+    emit_to_client, log_buffer = buffered_emitter(send_to_client)
+
+    def release_session():
+        log_buffer.close()
+        print(f"Log stream for {sid}: {log_buffer.stats()}")
+        if active_sessions.get(sid) is stop_flag:
+            active_sessions.pop(sid, None)
+            session_jobs.pop(sid, None)
+
+    params, error_msg = parse_analysis_request(data)
+    if error_msg:
+        emit_to_client('error', {'message': error_msg})
+        release_session()
+        return
+
+    # The crawl runs on the shared event loop, not in the Socket.IO handler thread
+    job_runner = get_job_runner()
+    job_id = job_runner.store.create(params, client=sid)
+    on_progress = job_runner.progress_callback(job_id)
+    session_jobs[sid] = job_id
+    emit_to_client('job', {'job_id': job_id})
+
+    dispatcher = get_queue_dispatcher()
+    if dispatcher:
+        # A worker process runs the crawl, its frames (and `queued` position updates) come back through deliver_remote_event
+        dispatcher.submit(job_id, params, sid=sid)
+        log_buffer.close()
+        return
+
+    def on_queued(position, queue_length):
+        """Tell the waiting client where it is in the global queue"""
+        emit_to_client('queued', {'job_id': job_id, 'position': position, 'queue_length': queue_length})
+
+    def on_page_result(result):
+        """Stream each page to the client as soon as it is analyzed"""
+        emit_to_client('page_result', {'job_id': job_id, 'result': result})
+
+    async def task():
+        try:
+            results = await run_analysis(params, emit_log=emit_to_client, stop_flag=stop_flag, on_progress=on_progress, on_page_result=on_page_result)
+
+            if stop_flag.is_set():
+                print(f"Analysis for {sid} was stopped by user.")
+                return None
+
+            emit_to_client('log', {'message': f'Analysis complete. Analyzed {results["total_pages_analyzed"]} pages.', 'type': 'success'})
+            # Pages were already streamed, the final frame only carries the summary
+            emit_to_client('complete', {'status': 'success', 'data': summarize_results(results)})
+            return results
+
+        except AnalysisError as e:
+            emit_to_client('error', {'message': str(e)})
+            raise
+        except Exception as e:
+            if stop_flag.is_set():
+                print(f"Analysis for {sid} was stopped by user.")
+                return None
+            print(f"ERROR in start_analysis: {str(e)}")
+            emit_to_client('error', {'message': f'Internal server error: {str(e)}'})
+            raise
+
+    # Released when the job ends, including when it is cancelled while queued and task() never runs
+    future = job_runner.submit(job_id, task, client=sid, on_queued=on_queued)
+    future.add_done_callback(lambda _: release_session())
+
+
+def cancel_session_job(sid):
+    """Drop the session's job from the scheduler queue if it has not started yet, or stop it on its worker"""
+    job_id = session_jobs.get(sid)
+    if not job_id:
+        return
+    dispatcher = get_queue_dispatcher()
+    if dispatcher:
+        # Queued or running on a worker process, it polls for stop requests
+        dispatcher.stop(job_id)
+    else:
+        get_job_runner().cancel(job_id)
 
 
 @socketio.on('stop_analysis')
@@ -152,6 +264,7 @@ def handle_stop_analysis():
     if stop_flag:
         print(f"Stop requested by client {sid}")
         stop_flag.set()
+        cancel_session_job(sid)
 
 
 @socketio.on('disconnect')
@@ -161,7 +274,18 @@ def handle_disconnect():
     stop_flag = active_sessions.get(sid)
     if stop_flag:
         stop_flag.set()
+        cancel_session_job(sid)
     active_sessions.pop(sid, None)
+    session_jobs.pop(sid, None)
+
+
+def job_accepted_response(job_id):
+    return {
+        "status": "accepted",
+        "job_id": job_id,
+        "status_url": f"/api/jobs/{job_id}",
+        "result_url": f"/api/jobs/{job_id}/result"
+    }
 
 
 @app.route('/api/analyze', methods=['POST'])
@@ -170,65 +294,48 @@ def analyze_website():
         # Get data from request
         data = request.get_json()
 
-        if not data:
+        params, error_msg = parse_analysis_request(data)
+        if error_msg:
             return jsonify({
                 "status": "error",
-                "message": "Request body is required"
-            }), 400
-
-        url = data.get('url', '').strip()
-        max_pages = data.get('max_pages', 5)
-        user_intent = data.get('user_intent', None)
-
-        # Validate max_pages
-        if not isinstance(max_pages, int) or max_pages < 1 or max_pages > 10:
-            return jsonify({
-                "status": "error",
-                "message": "max_pages must be an integer between 1 and 10"
+                "message": error_msg
             }), 400
 
-        # Validate URL format
-        is_valid, error_msg = validate_url(url)
-        if not is_valid:
+        # "async": true hands the crawl to the job API instead of holding the request open
+        try:
+            run_async = parse_flag(data.get('async'))
+        except ValueError:
             return jsonify({
                 "status": "error",
-                "message": error_msg
+                "message": "async must be a boolean (true/false or yes/no)"
             }), 400
-
-        # Check if URL is reachable
-        print(f"Checking if {url} is reachable...")
-        is_reachable, error_msg = check_url_reachable(url)
-        if not is_reachable:
+        if run_async:
+            job_id = submit_job(params, client=request.remote_addr)
+            return jsonify(job_accepted_response(job_id)), 202
+
+        try:
+            dispatcher = get_queue_dispatcher()
+            if dispatcher:
+                # Multi-process mode: blocks this request thread until a worker process finishes the job
+                job_id = submit_job(params, client=request.remote_addr, wait=True)
+                outcome = dispatcher.wait(job_id)
+                if outcome.get('user_error'):
+                    raise AnalysisError(outcome['error'])
+                if outcome['status'] != 'completed':
+                    raise RuntimeError(outcome.get('error') or 'Analysis was stopped')
+                results = outcome['result']
+            else:
+                # Blocks this request thread while the crawl runs on the shared loop,
+                # admitted by the same scheduler as queued jobs
+                scheduler = get_job_runner().scheduler
+                results = get_event_loop().run(scheduler.run(request.remote_addr, None, lambda: run_analysis(params)))
+        except AnalysisError as e:
             return jsonify({
                 "status": "error",
-                "message": error_msg
+                "message": str(e)
             }), 400
 
-        print(f"URL is reachable. Starting analysis...")
-
-        # 4. Parse user intent if provided
-        audit_config = None
-        if user_intent:
-            print(f"Parsing user intent: {user_intent[:100]}...")
-            audit_config_obj = extract_audit_config(user_intent)
-            if audit_config_obj:
-                # Convert Pydantic model to dict
-                audit_config = audit_config_obj.model_dump()
-                print(f"Parsed config: {audit_config}")
-            else:
-                print("Warning: Failed to parse user intent, continuing without it...")
-
-        # 5. Run the BFS crawler (this will take 2-5 minutes)
-        # asyncio.run() handles the async function in sync Flask context
-        results = asyncio.run(bfs_crawler(url, max_pages, audit_config))
-
-        # Add audit_config to results for frontend display
-        if audit_config:
-            results['audit_config'] = audit_config
-
-        print(f"Analysis complete. Analyzed {results['total_pages_analyzed']} pages.")
-
-        # 5. Return results
+        # Return results
         return jsonify({
             "status": "success",
             "data": results
@@ -243,6 +350,120 @@ def analyze_website():
         }), 500
 
 
+@app.route('/api/jobs', methods=['POST'])
+def submit_analysis_job():
+    """Submit an analysis job, returns its id immediately"""
+    data = request.get_json(silent=True)
+    params, error_msg = parse_analysis_request(data)
+    if error_msg:
+        return jsonify({
+            "status": "error",
+            "message": error_msg
+        }), 400
+
+    job_id = submit_job(params, client=request.remote_addr)
+    return jsonify(job_accepted_response(job_id)), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    """Report a job's status and progress (pages done out of the total)"""
+    job = get_job_runner().store.get(job_id)
+    if job is None:
+        return jsonify({
+            "status": "error",
+            "message": "Job not found"
+        }), 404
+
+    return jsonify({
+        "job_id": job['id'],
+        "status": job['status'],
+        "url": job['params']['url'],
+        "progress": {
+            "pages_done": job['pages_done'],
+            "pages_total": job['pages_total']
+        },
+        "error": job['error'],
+        "created_at": job['created_at'],
+        "started_at": job['started_at'],
+        "finished_at": job['finished_at']
+    }), 200
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_analysis_job_result(job_id):
+    """Return a finished job's payload; 202 while it is still queued or running"""
+    job = get_job_runner().store.get(job_id, include_result=True)
+    if job is None:
+        return jsonify({
+            "status": "error",
+            "message": "Job not found"
+        }), 404
+
+    if job['status'] == 'completed':
+        return jsonify({
+            "status": "success",
+            "data": job['result']
+        }), 200
+
+    if job['status'] == 'failed':
+        return jsonify({
+            "status": "error",
+            "message": job['error']
+        }), 500
+
+    if job['status'] == 'stopped':
+        return jsonify({
+            "status": "error",
+            "message": "Analysis was stopped before it finished"
+        }), 409
+
+    return jsonify({
+        "status": job['status'],
+        "job_id": job['id'],
+        "progress": {
+            "pages_done": job['pages_done'],
+            "pages_total": job['pages_total']
+        }
+    }), 202
+
+
+@app.route('/api/screenshots/<screenshot_id>', methods=['GET'])
+def get_screenshot(screenshot_id):
+    """Serve a stored screenshot by id; ?size=thumb returns the downscaled thumbnail"""
+    thumbnail = request.args.get('size') == 'thumb'
+    path = get_screenshot_store().path(screenshot_id, thumbnail=thumbnail)
+    if path is None or not os.path.exists(path):
+        return jsonify({
+            "status": "error",
+            "message": "Screenshot not found"
+        }), 404
+
+    # Content-addressed: the bytes behind an id never change
+    response = send_file(path, mimetype='image/jpeg', max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@app.route('/api/scheduler', methods=['GET'])
+def scheduler_status():
+    """Global admission control state: running analyses and the waiting queue (worker loads in multi-process mode)"""
+    dispatcher = get_queue_dispatcher()
+    if dispatcher:
+        return jsonify({'mode': 'workers', 'workers': dispatcher.status()}), 200
+    return jsonify(get_job_runner().status()), 200
+
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics: stage latency histograms, agent steps, LLM tokens and page counts"""
+    rendered = render_metrics()
+    if rendered is None:
+        return jsonify({"error": "prometheus_client is not installed"}), 503
+    body, content_type = rendered
+    return Response(body, content_type=content_type), 200
+
+
 @app.route('/', methods=['GET'])
 def root():
     """
@@ -254,7 +475,13 @@ def root():
         "description": "Analyzes websites for CTA efficiency and theme consistency",
         "endpoints": {
             "health": "GET /api/health",
-            "analyze": "POST /api/analyze"
+            "analyze": "POST /api/analyze",
+            "submit_job": "POST /api/jobs",
+            "job_status": "GET /api/jobs/<job_id>",
+            "job_result": "GET /api/jobs/<job_id>/result",
+            "scheduler": "GET /api/scheduler",
+            "metrics": "GET /api/metrics",
+            "screenshot": "GET /api/screenshots/<screenshot_id>[?size=thumb]"
         }
     }), 200
 
@@ -265,6 +492,7 @@ if __name__ == '__main__':
     print("="*60)
     print("Server starting on http://localhost:5000")
     print("API endpoint: POST http://localhost:5000/api/analyze")
+    print("Jobs API: POST http://localhost:5000/api/jobs, GET /api/jobs/<job_id>[/result]")
     print("WebSocket: ws://localhost:5000 (event: start_analysis)")
     print("Health check: GET http://localhost:5000/api/health")
     print("="*60)
@@ -0,0 +1,342 @@
+"""
+Offline end-to-end benchmarks.
+
+Runs QAI against local fixture sites (bench/fixtures, served from disk) with a
+scripted stand-in LLM (bench/fake_llm.py), so no network or Gemini key is
+needed. A real local Chromium is still driven through browser_use.
+
+    cd backend
+    python -m bench.run                      # every scenario, compared to bench/baselines.json
+    python -m bench.run crawl socketio       # selected scenarios
+    python -m bench.run --update-baseline    # record the current numbers as the baseline, then commit it
+
+Each scenario runs in its own process so peak RSS is per scenario. The run
+exits with status 1 when a metric is worse than its baseline by more than
+the tolerance (BENCH_TOLERANCE, default 0.25 = 25%), and with status 2 before
+running anything when a selected scenario has no baseline to compare to.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baselines.json')
+RESULT_PREFIX = 'BENCH_RESULT '
+
+# Reported metrics -> True when higher is better
+METRICS = {
+    'pages_per_min': True,
+    'latency_p50': False,
+    'latency_p95': False,
+    'peak_rss_mb': False,
+    'browser_peak_rss_mb': False,
+    'frames': False,
+    'frame_bytes': False,
+}
+
+
+def configure_environment(workdir):
+    """Isolate a benchmark process from the developer's caches, keys and cloud browser"""
+    os.environ.update({
+        'GEMINI_API_KEY': os.getenv('GEMINI_API_KEY') or 'offline-benchmark',
+        'BROWSER_USE_API_KEY': '',  # local Chromium only (an empty value also wins over .env)
+        'ANONYMIZED_TELEMETRY': 'false',
+        'ENABLE_SCREENSHOTS': 'no',
+        'VALIDATION_CACHE': 'no',
+        'INCREMENTAL_AUDIT': 'no',
+        'INTENT_CACHE_PATH': '',
+        'JOB_DB_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+        'SNAPSHOT_DB_PATH': os.path.join(workdir, 'snapshots.sqlite3'),
+        'SCREENSHOT_STORE_DIR': os.path.join(workdir, 'screenshots'),
+        # The shop fixture exercises sitemap discovery and template clustering, both opt-in
+        'SITEMAP_DISCOVERY': 'yes',
+        'SITEMAP_SKIP_EXTRACTION': 'yes',
+        'TEMPLATE_CLUSTERING': 'yes',
+        'TEMPLATE_MIN_SIBLINGS': '3',
+    })
+
+
+def use_scripted_llm(site):
+    from agent_core import set_llm_factory
+    from bench.fake_llm import ScriptedLLM
+    from bench.server import read_fixture
+
+    set_llm_factory(lambda model: ScriptedLLM(model, lambda url: read_fixture(site, url)))
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile, 0.0 for no values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class FrameCounter:
+    """Stands in for socketio.emit and counts frames and their JSON size"""
+
+    def __init__(self):
+        self.frames = 0
+        self.frame_bytes = 0
+
+    def send(self, event, payload):
+        self.frames += 1
+        self.frame_bytes += len(json.dumps([event, payload], default=str))
+
+
+def measurement(pages, elapsed, latencies, frames=0, frame_bytes=0):
+    return {
+        'pages': pages,
+        'elapsed': round(elapsed, 2),
+        'pages_per_min': round(pages / elapsed * 60, 2) if elapsed else 0.0,
+        'latency_p50': round(percentile(latencies, 50), 3),
+        'latency_p95': round(percentile(latencies, 95), 3),
+        'frames': frames,
+        'frame_bytes': frame_bytes,
+    }
+
+
+async def scenario_crawl():
+    """bfs_crawler over the shop fixture (sitemap, templates, split agents), logs through the frame buffer"""
+    from bfs_crawler import bfs_crawler
+    from bench.server import serve_fixture
+    from log_stream import buffered_emitter
+    from utils.http_client import close_http_session
+
+    use_scripted_llm('shop')
+    counter = FrameCounter()
+    emit, log_buffer = buffered_emitter(counter.send)
+    with serve_fixture('shop') as base_url:
+        started = time.perf_counter()
+        try:
+            crawl = await bfs_crawler(
+                base_url + '/',
+                max_pages=int(os.getenv('BENCH_MAX_PAGES', '6')),
+                emit_log=emit,
+                concurrency=int(os.getenv('BENCH_CONCURRENCY', '2')),
+                single_pass=False,
+            )
+        finally:
+            log_buffer.close()
+            await close_http_session()
+        elapsed = time.perf_counter() - started
+
+    latencies = [result['timings']['total'] for result in crawl['results'] if 'timings' in result]
+    return measurement(len(latencies), elapsed, latencies, counter.frames, counter.frame_bytes)
+
+
+async def run_agent_calls(call):
+    """Run call(url, browser_pool, emit) for every landing fixture page, returns a measurement"""
+    from browser_pool import BrowserPool
+    from bench.server import serve_fixture
+    from utils.http_client import close_http_session
+
+    use_scripted_llm('landing')
+    counter = FrameCounter()
+    browser_pool = BrowserPool(size=1)
+    latencies = []
+    with serve_fixture('landing') as base_url:
+        started = time.perf_counter()
+        try:
+            for path in ('/', '/pricing.html', '/signup.html'):
+                call_started = time.perf_counter()
+                await call(base_url + path, browser_pool, counter.send)
+                latencies.append(time.perf_counter() - call_started)
+        finally:
+            await browser_pool.close()
+            await close_http_session()
+        elapsed = time.perf_counter() - started
+    return measurement(len(latencies), elapsed, latencies, counter.frames, counter.frame_bytes)
+
+
+async def scenario_extract_redirects():
+    """Agent link extraction (static fast path off) on each landing page"""
+    from agent_core import extract_redirects
+
+    async def call(url, browser_pool, emit):
+        await extract_redirects(url, emit_log=emit, browser_pool=browser_pool, static_first=False)
+    return await run_agent_calls(call)
+
+
+async def scenario_validate_page():
+    """CTA/theme validation agent on each landing page"""
+    from agent_core import validate_page
+
+    async def call(url, browser_pool, emit):
+        await validate_page(url, emit_log=emit, browser_pool=browser_pool, bypass_cache=True)
+    return await run_agent_calls(call)
+
+
+async def scenario_validate_tiered():
+    """validate_page in tiered mode: flash-lite pre-screen, pro only on escalation (BENCH_CONFIDENCE)"""
+    from agent_core import validate_page
+
+    async def call(url, browser_pool, emit):
+        await validate_page(url, emit_log=emit, browser_pool=browser_pool, bypass_cache=True, validation_mode='tiered')
+    return await run_agent_calls(call)
+
+
+async def scenario_validate_batch():
+    """validate_page in batch mode: programmatic viewport capture and one multimodal request"""
+    from agent_core import validate_page
+    from viewport_capture import get_capture_engine
+
+    async def call(url, browser_pool, emit):
+        await validate_page(url, emit_log=emit, browser_pool=browser_pool, bypass_cache=True, validation_mode='batch')
+    try:
+        return await run_agent_calls(call)
+    finally:
+        await get_capture_engine().close()
+
+
+def scenario_socketio():
+    """Full start_analysis round trip through Flask-SocketIO, counting frames the client receives"""
+    from app import app, socketio
+    from bench.server import serve_fixture
+
+    use_scripted_llm('shop')
+    timeout = float(os.getenv('BENCH_TIMEOUT', '900'))
+    received = []
+    with serve_fixture('shop') as base_url:
+        client = socketio.test_client(app)
+        started = time.perf_counter()
+        client.emit('start_analysis', {'url': base_url + '/', 'max_pages': int(os.getenv('BENCH_MAX_PAGES', '6'))})
+        while time.perf_counter() - started < timeout:
+            received.extend(client.get_received())
+            if any(packet['name'] in ('complete', 'error') for packet in received):
+                break
+            time.sleep(0.2)
+        elapsed = time.perf_counter() - started
+        client.disconnect()
+
+    errors = [packet['args'] for packet in received if packet['name'] == 'error']
+    if errors:
+        raise RuntimeError(f"Analysis failed: {errors[0]}")
+    if not any(packet['name'] == 'complete' for packet in received):
+        raise RuntimeError(f"Analysis did not complete within {timeout}s")
+
+    page_results = [packet['args'][0]['result'] for packet in received if packet['name'] == 'page_result']
+    latencies = [result['timings']['total'] for result in page_results if 'timings' in result]
+    frame_bytes = sum(len(json.dumps([packet['name'], packet['args']], default=str)) for packet in received)
+    return measurement(len(latencies), elapsed, latencies, len(received), frame_bytes)
+
+
+SCENARIOS = {
+    'crawl': scenario_crawl,
+    'extract_redirects': scenario_extract_redirects,
+    'validate_page': scenario_validate_page,
+    'validate_tiered': scenario_validate_tiered,
+    'validate_batch': scenario_validate_batch,
+    'socketio': scenario_socketio,
+}
+
+
+def run_child(name):
+    """Run one scenario in this process and print its result line"""
+    with tempfile.TemporaryDirectory(prefix='qai-bench-') as workdir:
+        configure_environment(workdir)
+        scenario = SCENARIOS[name]
+        result = asyncio.run(scenario()) if asyncio.iscoroutinefunction(scenario) else scenario()
+
+    # ru_maxrss is in KiB on Linux; children = the largest browser process that exited
+    result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    result['browser_peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def run_scenario(name):
+    completed = subprocess.run(
+        [sys.executable, '-m', 'bench.run', '--child', name],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    print(completed.stdout[-2000:])
+    print(completed.stderr[-4000:], file=sys.stderr)
+    raise RuntimeError(f"Scenario {name} failed (exit code {completed.returncode})")
+
+
+def compare(name, result, baseline, tolerance):
+    """Regression messages for metrics worse than baseline by more than tolerance"""
+    regressions = []
+    for metric, higher_is_better in METRICS.items():
+        expected = baseline.get(metric)
+        actual = result.get(metric)
+        if not expected or actual is None:
+            continue
+        if higher_is_better and actual < expected * (1 - tolerance):
+            regressions.append(f"{name}.{metric}: {actual} < baseline {expected}")
+        elif not higher_is_better and actual > expected * (1 + tolerance):
+            regressions.append(f"{name}.{metric}: {actual} > baseline {expected}")
+    return regressions
+
+
+def load_baselines():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline QAI benchmarks')
+    parser.add_argument('scenarios', nargs='*', help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument('--update-baseline', action='store_true', help='Store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=float(os.getenv('BENCH_TOLERANCE', '0.25')))
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios + ([args.child] if args.child else []) if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    if args.child:
+        run_child(args.child)
+        return 0
+
+    baselines = load_baselines()
+    names = args.scenarios or list(SCENARIOS)
+    # A run without a baseline would always "pass", refuse it instead of reporting no regressions
+    missing = [name for name in names if name not in baselines]
+    if missing and not args.update_baseline:
+        print(f"No baseline for {', '.join(missing)} in {BASELINE_PATH}.", file=sys.stderr)
+        print(f"Record it on the reference machine with: python -m bench.run --update-baseline {' '.join(missing)}", file=sys.stderr)
+        print("and commit bench/baselines.json.", file=sys.stderr)
+        return 2
+
+    results = {}
+    regressions = []
+    for name in names:
+        print(f"Running {name}...", flush=True)
+        results[name] = run_scenario(name)
+        print(f"  {json.dumps(results[name])}")
+        if name in baselines:
+            regressions.extend(compare(name, results[name], baselines[name], args.tolerance))
+
+    if args.update_baseline:
+        baselines.update(results)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    if regressions:
+        print("Performance regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
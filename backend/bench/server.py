@@ -0,0 +1,63 @@
+import io
+import os
+import threading
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# robots.txt and sitemaps need absolute URLs, the port is only known once the server is up
+TEMPLATED_SUFFIXES = ('.txt', '.xml')
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """Serves a fixture site from disk, filling {{BASE}} in robots.txt/sitemaps with the server's origin"""
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not path.endswith(TEMPLATED_SUFFIXES) or not os.path.isfile(path):
+            return super().send_head()
+        with open(path, 'rb') as f:
+            body = f.read().replace(b'{{BASE}}', self.server.base_url.encode('utf-8'))
+        self.send_response(200)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def fixture_path(site, url):
+    """File on disk behind a fixture URL (directories resolve to index.html)"""
+    path = urlsplit(url).path.lstrip('/')
+    full = os.path.join(FIXTURES_DIR, site, path)
+    if os.path.isdir(full):
+        full = os.path.join(full, 'index.html')
+    return full
+
+
+def read_fixture(site, url):
+    try:
+        with open(fixture_path(site, url), encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+@contextmanager
+def serve_fixture(site):
+    """Serve bench/fixtures/<site> on a free localhost port, yields the base URL"""
+    handler = partial(FixtureHandler, directory=os.path.join(FIXTURES_DIR, site))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    thread = threading.Thread(target=server.serve_forever, name=f'fixture-{site}', daemon=True)
+    thread.start()
+    try:
+        yield server.base_url
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,51 @@
+import json
+import sys
+
+import pytest
+
+from bench import run
+
+
+@pytest.fixture
+def baseline_path(tmp_path, monkeypatch):
+    path = tmp_path / 'baselines.json'
+    monkeypatch.setattr(run, 'BASELINE_PATH', str(path))
+    return path
+
+
+def main(monkeypatch, *argv):
+    monkeypatch.setattr(sys, 'argv', ['bench.run', *argv])
+    return run.main()
+
+
+def fake_results(monkeypatch, result):
+    ran = []
+    monkeypatch.setattr(run, 'run_scenario', lambda name: ran.append(name) or dict(result))
+    return ran
+
+
+def test_missing_baseline_fails_before_running(baseline_path, monkeypatch):
+    ran = fake_results(monkeypatch, {'pages_per_min': 10})
+    assert main(monkeypatch, 'crawl') == 2
+    assert ran == []
+
+
+def test_scenario_missing_from_baseline_fails(baseline_path, monkeypatch):
+    baseline_path.write_text(json.dumps({'crawl': {'pages_per_min': 10}}))
+    ran = fake_results(monkeypatch, {'pages_per_min': 10})
+    assert main(monkeypatch, 'crawl', 'socketio') == 2
+    assert ran == []
+
+
+def test_update_baseline_records_results(baseline_path, monkeypatch):
+    fake_results(monkeypatch, {'pages_per_min': 10})
+    assert main(monkeypatch, 'crawl', '--update-baseline') == 0
+    assert json.loads(baseline_path.read_text()) == {'crawl': {'pages_per_min': 10}}
+
+
+def test_regression_against_baseline(baseline_path, monkeypatch):
+    baseline_path.write_text(json.dumps({'crawl': {'pages_per_min': 10, 'latency_p95': 2.0}}))
+    fake_results(monkeypatch, {'pages_per_min': 9, 'latency_p95': 2.1})
+    assert main(monkeypatch, 'crawl') == 0
+    fake_results(monkeypatch, {'pages_per_min': 5, 'latency_p95': 2.1})
+    assert main(monkeypatch, 'crawl') == 1
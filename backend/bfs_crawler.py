@@ -1,7 +1,16 @@
 import asyncio
-from collections import deque
-from urllib.parse import urlparse
-from agent_core import extract_redirects, validate_page
+import os
+from urllib.parse import urldefrag, urlparse
+from agent_core import extract_redirects, validate_page, audit_page
+from browser_pool import BrowserPool, default_pool_size
+from utils.validation_cache import get_validation_cache
+from frontier import Frontier
+from url_clusters import TemplateClusters
+from log_stream import log_sink
+from utils.page_snapshots import get_page_snapshots, revalidate_page
+from discovery import discover_site
+from shared_layout import SharedLayout
+from metrics import page_timer, record_page, span
 
 
 def get_domain(url):
@@ -15,14 +24,14 @@ def get_domain(url):
 
 
 def normalize_url(url):
-    """Normalize URL by removing trailing slash and fragments"""
-    # Remove trailing slash
-    if url.endswith('/'):
-        url = url[:-1]
-    # Remove fragments
-    if '#' in url:
-        url = url.split('#')[0]
-    return url
+    """
+    URL to fetch for a discovered link: trimmed, without the fragment, otherwise as the site wrote it.
+
+    The canonical form (utils.urls.canonicalize_url / url_key) only deduplicates;
+    servers that care about query encoding, blank values or trailing slashes
+    get the URL they linked to.
+    """
+    return urldefrag(url.strip())[0]
 
 
 def is_valid_link(url, base_domain):
@@ -45,16 +54,79 @@ def is_valid_link(url, base_domain):
     return link_domain == base_domain
 
 
-async def bfs_crawler(starting_url, max_pages=5, audit_config=None, emit_log=None, stop_flag=None):
+def resolve_concurrency(concurrency=None):
+    """Pick the number of crawl workers: per-job value, else CRAWL_CONCURRENCY, capped by MAX_CRAWL_CONCURRENCY"""
+    if concurrency is None:
+        concurrency = int(os.getenv('CRAWL_CONCURRENCY', '1'))
+    max_concurrency = int(os.getenv('MAX_CRAWL_CONCURRENCY', '4'))
+    return max(1, min(int(concurrency), max_concurrency))
+
+
+def resolve_template_clusters(template_sample=None):
+    """TemplateClusters for the crawl, or None when clustering is off (opt-in: TEMPLATE_CLUSTERING=yes or template_sample > 0)"""
+    if template_sample is None:
+        if os.getenv('TEMPLATE_CLUSTERING', 'no').lower() != 'yes':
+            return None
+        return TemplateClusters()
+    if int(template_sample) <= 0:
+        return None
+    return TemplateClusters(sample_size=int(template_sample))
+
+
+def resolve_sitemap(sitemap=None):
+    """Per-job sitemap flag, else the SITEMAP_DISCOVERY env switch"""
+    if sitemap is None:
+        return os.getenv('SITEMAP_DISCOVERY', 'no').lower() == 'yes'
+    return bool(sitemap)
+
+
+def resolve_incremental(incremental=None):
+    """Per-job incremental flag, else the INCREMENTAL_AUDIT env switch"""
+    if incremental is None:
+        return os.getenv('INCREMENTAL_AUDIT', 'no').lower() == 'yes'
+    return bool(incremental)
+
+
+def resolve_shared_layout(shared_layout=None):
+    """Per-job shared_layout flag, else the SHARED_LAYOUT env switch"""
+    if shared_layout is None:
+        return os.getenv('SHARED_LAYOUT', 'no').lower() == 'yes'
+    return bool(shared_layout)
+
+
+def resolve_single_pass(single_pass=None):
+    """Per-job single_pass flag, else the SINGLE_PASS_AUDIT env switch"""
+    if single_pass is None:
+        return os.getenv('SINGLE_PASS_AUDIT', 'no').lower() == 'yes'
+    return bool(single_pass)
+
+
+async def bfs_crawler(starting_url, max_pages=5, audit_config=None, emit_log=None, stop_flag=None, concurrency=None, single_pass=None, browser_pool=None, bypass_cache=False, on_progress=None, priority_scorer=None, template_sample=None, on_page_result=None, incremental=None, sitemap=None, validation_mode=None, shared_layout=None):
     """
     Crawl website using BFS, analyzing each page for CTA and theme consistency.
 
+    Pages are analyzed by a bounded pool of workers that pull from a shared,
+    priority-ordered frontier (shallow and primary-nav links first). With a
+    concurrency of 1 this is a one-page-at-a-time best-first BFS.
+
     Args:
         starting_url: The initial URL to start crawling from
         max_pages: Maximum number of pages to analyze (default: 5)
         audit_config: Optional dict with user's intended design configuration
         emit_log: Optional SocketIO emit function for streaming logs to frontend
         stop_flag: Optional threading.Event that signals the analysis should stop
+        concurrency: Optional number of pages analyzed in parallel (default: CRAWL_CONCURRENCY env)
+        single_pass: Optional flag to audit links and validation in one agent run (default: SINGLE_PASS_AUDIT env)
+        browser_pool: Optional shared BrowserPool; when omitted the crawl owns a pool sized to its concurrency
+        bypass_cache: Re-run validation even for pages found in the validation cache
+        on_progress: Optional callback(pages_done, max_pages) called after each page finishes
+        priority_scorer: Optional callable(url, hints) -> score for the frontier (lower crawls first)
+        template_sample: Pages audited per URL template cluster; > 0 enables clustering, 0 disables it (default: TEMPLATE_CLUSTERING / TEMPLATE_SAMPLE_SIZE env)
+        on_page_result: Optional callback(result) called with each page's result as soon as it is ready
+        incremental: Reuse the previous crawl's findings for pages that did not change (default: INCREMENTAL_AUDIT env)
+        sitemap: Seed the frontier from robots.txt/sitemap.xml and honor robots.txt (default: SITEMAP_DISCOVERY env)
+        validation_mode: 'pro' or 'tiered' (flash-lite pre-screen, pro on escalation) (default: VALIDATION_MODE env)
+        shared_layout: Audit the header/nav/footer shared by the site's pages once per crawl (default: SHARED_LAYOUT env)
 
     Returns:
         Dictionary containing analysis results for all crawled pages
@@ -69,103 +141,316 @@ async def bfs_crawler(starting_url, max_pages=5, audit_config=None, emit_log=Non
             emit_log('log', {'message': message, 'type': log_type})
 
     # Initialize data structures
-    queue = deque([normalize_url(starting_url)])
-    visited = set()
+    frontier = Frontier(scorer=priority_scorer)
+    frontier.push(starting_url)
+    visited = []
     results = []
     base_domain = get_domain(starting_url)
     page_count = 0
+    in_flight = 0
+    concurrency = resolve_concurrency(concurrency)
+    single_pass = resolve_single_pass(single_pass)
+    # Audit a sample of each page template (/products/{id}, /blog/*) instead of every member
+    clusters = resolve_template_clusters(template_sample)
+    page_clusters = {}  # audited url -> template cluster key
+    # Incremental re-audit: pages unchanged since the last crawl of this site keep their findings
+    snapshots = get_page_snapshots() if resolve_incremental(incremental) else None
+    reused_urls = []
+    reaudited_urls = []
+    # Header/nav/footer shared across pages are audited on the first page that has them
+    layout = SharedLayout() if resolve_shared_layout(shared_layout) else None
+    # Reuse browser sessions across pages instead of a cold start per agent call
+    owns_pool = browser_pool is None and default_pool_size() > 0
+    if owns_pool:
+        browser_pool = BrowserPool(size=max(concurrency, default_pool_size()))
+    # Workers wait on this when the frontier is empty but other pages may still add links
+    frontier_changed = asyncio.Condition()
 
     log(f"Starting BFS Crawler", 'info')
     log(f"Base URL: {starting_url}", 'info')
     log(f"Base Domain: {base_domain}", 'info')
     log(f"Max Pages: {max_pages}", 'info')
-
-    while queue and page_count < max_pages:
-        if is_stopped():
-            log("Analysis stopped by user.", 'info')
-            break
-
-        current_url = queue.popleft()
-
-        # Skip if already visited
-        if current_url in visited:
-            continue
-
-        visited.add(current_url)
-        page_count += 1
-
+    log(f"Concurrency: {concurrency}", 'info')
+    if single_pass:
+        log(f"Audit Mode: single-pass", 'info')
+
+    # Discovery: sitemap pages go straight into the frontier, robots.txt filters every link
+    discovery = None
+    skip_extraction = False
+    if resolve_sitemap(sitemap):
+        log("Reading robots.txt and sitemap...", 'info')
+        try:
+            discovery = await discover_site(starting_url)
+        except Exception as e:
+            log(f"Sitemap discovery failed ({str(e)}), discovering pages by link extraction", 'warning')
+    if discovery:
+        seeded = 0
+        for entry in discovery.entries:
+            normalized_link = normalize_url(entry['url'])
+            if not is_valid_link(normalized_link, base_domain) or not discovery.allowed(normalized_link):
+                continue
+            if frontier.push(normalized_link, {'priority': entry['priority'], 'lastmod': entry['lastmod']}):
+                seeded += 1
+                if clusters:
+                    clusters.observe(normalized_link)
+        if seeded:
+            log(f"Seeded {seeded} pages from {len(discovery.sitemaps)} sitemap(s)", 'success')
+            skip_extraction = os.getenv('SITEMAP_SKIP_EXTRACTION', 'no').lower() == 'yes'
+
+    async def next_page():
+        """Claim the next unvisited URL and its page number, or None when the crawl is done"""
+        nonlocal page_count, in_flight
+        while True:
+            async with frontier_changed:
+                while True:
+                    if is_stopped() or page_count >= max_pages:
+                        return None
+                    if frontier:
+                        # The frontier never hands out the same page twice
+                        current_url = frontier.pop()
+                        in_flight += 1
+                        break
+                    if not in_flight:
+                        return None
+                    await frontier_changed.wait()
+
+            # Outside the lock: DOM fingerprinting may fetch the page
+            cluster = await clusters.assign(current_url) if clusters else None
+
+            async with frontier_changed:
+                if cluster and not clusters.should_audit(cluster):
+                    # Same template as pages already audited — reuse their findings
+                    clusters.add_member(cluster, current_url)
+                    log(f"Skipping {current_url} (template {cluster} already sampled)", 'info')
+                    in_flight -= 1
+                    frontier_changed.notify_all()
+                    continue
+                if is_stopped() or page_count >= max_pages:
+                    in_flight -= 1
+                    frontier_changed.notify_all()
+                    return None
+                if cluster:
+                    clusters.add_sample(cluster, current_url)
+                    page_clusters[current_url] = cluster
+                visited.append(current_url)
+                page_count += 1
+                return current_url, page_count
+
+    async def audit_one_page(current_url, page_number):
+        """Audit a claimed page, returns its result entry or None if the crawl was stopped"""
         log(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━", 'divider')
-        log(f"Analyzing Page {page_count}/{max_pages}", 'progress')
+        log(f"Analyzing Page {page_number}/{max_pages}", 'progress')
         log(f"URL: {current_url}", 'url')
 
+        # Shared layout regions this page audits for the site, and those it takes from other pages
+        owned_regions, shared_regions = {}, {}
         try:
-            # Extract navigation links
-            log("Extracting navigation links...", 'info')
-            extracted = await extract_redirects(current_url, emit_log=emit_log, stop_flag=stop_flag)
-
-            if is_stopped():
-                break
-
-            # Validate page (CTA and theme analysis)
-            log("Validating CTA and theme...", 'info')
-            validation, screenshots = await validate_page(current_url, audit_config, emit_log=emit_log, stop_flag=stop_flag)
-
-            if is_stopped():
-                break
+            extracted = validation = screenshots = None
+            audited = False
+            reused = False
+
+            if snapshots:
+                # SQLite reads and writes run in a thread, the loop keeps serving the other pages
+                snapshot = None if bypass_cache else await asyncio.to_thread(snapshots.get, base_domain, current_url, audit_config)
+                try:
+                    with span('revalidate'):
+                        unchanged, page = await revalidate_page(current_url, snapshot)
+                except Exception as e:
+                    log(f"Conditional request failed ({str(e)}), re-auditing page...", 'warning')
+                    unchanged, page = False, None
+                if unchanged:
+                    log("Page unchanged since the last crawl, reusing its audit", 'success')
+                    extracted = {'posts': snapshot['links']}
+                    validation = snapshot['validation']
+                    screenshots = snapshot['screenshots']
+                    audited = reused = True
+
+            if layout and not audited:
+                with span('layout'):
+                    owned_regions, shared_regions = layout.claim(current_url, await layout.fingerprint(current_url))
+                if shared_regions:
+                    log(f"Shared {', '.join(sorted(shared_regions))} already audited on another page, auditing page content only", 'info')
+
+            if single_pass and not audited:
+                # One navigation + scroll-through for both links and validation
+                log("Auditing links, CTA and theme in a single pass...", 'info')
+                try:
+                    with span('audit_page'):
+                        extracted, validation, screenshots = await audit_page(current_url, audit_config, emit_log=emit_log, stop_flag=stop_flag, browser_pool=browser_pool, bypass_cache=bypass_cache, shared_regions=list(shared_regions))
+                    audited = True
+                except Exception as e:
+                    if is_stopped():
+                        return None
+                    log(f"Single-pass audit failed ({str(e)}), falling back to separate agents...", 'warning')
+
+                if is_stopped():
+                    return None
+
+            if not audited:
+                if skip_extraction and len(frontier) >= max_pages - page_count:
+                    # The sitemap already queued enough pages for the rest of the budget
+                    log("Sitemap covers the remaining pages, skipping link extraction", 'info')
+                else:
+                    # Extract navigation links
+                    log("Extracting navigation links...", 'info')
+                    with span('extract_redirects'):
+                        extracted = await extract_redirects(current_url, emit_log=emit_log, stop_flag=stop_flag, browser_pool=browser_pool)
+
+                    if is_stopped():
+                        return None
+
+                # Validate page (CTA and theme analysis)
+                log("Validating CTA and theme...", 'info')
+                with span('validate_page'):
+                    validation, screenshots = await validate_page(current_url, audit_config, emit_log=emit_log, stop_flag=stop_flag, browser_pool=browser_pool, bypass_cache=bypass_cache, validation_mode=validation_mode, shared_regions=list(shared_regions))
+
+                if is_stopped():
+                    return None
+
+            if layout and not reused:
+                # Owned regions go to the pages waiting on them, shared ones come back from their owners
+                layout.publish(owned_regions, validation)
+                validation = await layout.merge(shared_regions, validation)
 
             # Process extracted links
             if extracted and 'posts' in extracted:
-                new_links = [link['url'] for link in extracted['posts']]
+                new_links = extracted['posts']
                 log(f"Found {len(new_links)} links", 'info')
 
-                # Filter and add valid links to queue
+                # Filter and add valid links to the frontier (it drops visited/queued ones)
                 added_count = 0
-                for link in new_links:
-                    normalized_link = normalize_url(link)
-
-                    # Check if valid and not already visited/queued
-                    if (is_valid_link(normalized_link, base_domain) and
-                        normalized_link not in visited and
-                        normalized_link not in queue):
-                        queue.append(normalized_link)
-                        added_count += 1
+                async with frontier_changed:
+                    for position, link in enumerate(new_links):
+                        normalized_link = normalize_url(link['url'])
+                        if not is_valid_link(normalized_link, base_domain):
+                            continue
+                        if discovery and not discovery.allowed(normalized_link):
+                            continue
+                        hints = {'caption': link.get('caption'), 'position': position, 'total': len(new_links)}
+                        if frontier.push(normalized_link, hints):
+                            added_count += 1
+                            if clusters:
+                                clusters.observe(normalized_link)
+                    if added_count:
+                        frontier_changed.notify_all()
 
                 log(f"Added {added_count} new links to queue", 'success')
 
-            # Store results — screenshots is a dict mapping viewport_number -> base64 JPEG
-            results.append({
+            # Store results — screenshots is a dict mapping viewport_number -> screenshot id (see screenshot_store)
+            result = {
                 'url': current_url,
-                'page_number': page_count,
+                'page_number': page_number,
                 'validation': validation,
                 'screenshots': screenshots or {}
-            })
-
-            log(f"Page {page_count} analysis complete", 'success')
+            }
+            if current_url in page_clusters:
+                result['template_cluster'] = page_clusters[current_url]
+            if snapshots:
+                result['incremental'] = 'reused' if reused else 'reaudited'
+                (reused_urls if reused else reaudited_urls).append(current_url)
+                if not reused and page and validation is not None:
+                    links = extracted['posts'] if extracted and 'posts' in extracted else []
+                    await asyncio.to_thread(snapshots.put, base_domain, current_url, audit_config, page, links, validation, screenshots)
+            log(f"Page {page_number} analysis complete", 'success')
+            return result
 
         except Exception as e:
             log(f"ERROR analyzing {current_url}: {str(e)}", 'error')
             log(f"Skipping to next page...", 'warning')
             # Store error result
-            results.append({
+            return {
                 'url': current_url,
-                'page_number': page_count,
+                'page_number': page_number,
                 'error': str(e)
-            })
+            }
+        finally:
+            if layout:
+                layout.release(owned_regions)
+
+    async def analyze_page(current_url, page_number):
+        # Stage timings, agent steps and tokens of this page (see metrics.page_timer)
+        with page_timer() as timings:
+            result = await audit_one_page(current_url, page_number)
+        if result is None:
+            return
+        result['timings'] = timings
+        if 'error' in result:
+            record_page('error')
+        else:
+            record_page('reused' if result.get('incremental') == 'reused' else 'audited')
+        results.append(result)
+
+        if on_page_result and not is_stopped():
+            on_page_result(result)
+        if on_progress and not is_stopped():
+            on_progress(len(results), max_pages)
+
+    async def worker():
+        nonlocal in_flight
+        while True:
+            claimed = await next_page()
+            if claimed is None:
+                break
+            try:
+                await analyze_page(*claimed)
+            finally:
+                async with frontier_changed:
+                    in_flight -= 1
+                    frontier_changed.notify_all()
+        # Wake idle workers so they can observe the stop/budget condition too
+        async with frontier_changed:
+            frontier_changed.notify_all()
+
+    # Workers (and the agent tasks they start) inherit this, so browser_use logs reach this crawl's client only
+    sink_token = log_sink.set(emit_log)
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        log_sink.reset(sink_token)
+        if browser_pool:
+            print(f"Browser pool stats: {browser_pool.stats()}")
+        if owns_pool:
+            await browser_pool.close()
+        validation_cache = get_validation_cache()
+        if validation_cache:
+            print(f"Validation cache stats: {await asyncio.to_thread(validation_cache.stats)}")
+
+    if is_stopped():
+        log("Analysis stopped by user.", 'info')
+
+    # Workers finish out of order; keep results ordered by page number
+    results.sort(key=lambda r: r['page_number'])
+
+    # Skipped template members inherit their cluster's findings, listed after the audited pages
+    skipped_results = clusters.member_results(results) if clusters else []
+    results.extend(skipped_results)
+    for _ in skipped_results:
+        record_page('skipped')
+    if on_page_result and not is_stopped():
+        for result in skipped_results:
+            on_page_result(result)
 
     # Summary
     log(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━", 'divider')
     log(f"Crawling Complete!", 'success')
     log(f"Total Pages Analyzed: {page_count}", 'info')
-    log(f"URLs in Queue (not analyzed): {len(queue)}", 'info')
-    log(f"Successfully Analyzed: {len([r for r in results if 'error' not in r])}", 'info')
-    log(f"Errors: {len([r for r in results if 'error' in r])}", 'info')
-
-    return {
+    log(f"URLs in Queue (not analyzed): {len(frontier)}", 'info')
+    log(f"Successfully Analyzed: {len([r for r in results if 'error' not in r and not r.get('skipped')])}", 'info')
+    log(f"Errors: {len([r for r in results if 'error' in r and not r.get('skipped')])}", 'info')
+    if skipped_results:
+        log(f"Template Pages Covered by a Sample: {len(skipped_results)}", 'info')
+    if snapshots:
+        log(f"Reused From Last Crawl: {len(reused_urls)}, Re-audited: {len(reaudited_urls)}", 'info')
+
+    crawl = {
         'total_pages_analyzed': page_count,
-        'urls_analyzed': list(visited),
+        'urls_analyzed': visited,
         'results': results,
         'base_domain': base_domain
     }
+    if snapshots:
+        crawl['incremental'] = {'reused': reused_urls, 'reaudited': reaudited_urls}
+    return crawl
 
 
 # Test function
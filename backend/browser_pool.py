@@ -0,0 +1,188 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+from agent_core import create_browser_session
+from metrics import span
+
+
+def default_pool_size():
+    """Pool size from BROWSER_POOL_SIZE (0 disables pooling)"""
+    return int(os.getenv('BROWSER_POOL_SIZE', '2'))
+
+
+class BrowserPool:
+    """
+    Pool of keep-alive BrowserSessions shared by the agent functions.
+
+    Sessions are checked out with `async with pool.session() as browser_session:`
+    and checked back in afterwards. A checked-in session has its extra tabs
+    closed, its cookies and the visited origins' storage cleared and its tab
+    reset to about:blank, so one site's login, consent or cart state never
+    leaks into the next audit. Sessions that cannot be reset are stopped and
+    replaced, the others are health-checked before their next use and recycled
+    after `max_uses` checkouts.
+    Works for both local and USE_CLOUD sessions since it only relies on the
+    BrowserSession API.
+    """
+
+    def __init__(self, size=None, max_uses=None, health_timeout=None, session_factory=None):
+        self.size = size or default_pool_size() or 1
+        self.max_uses = max_uses or int(os.getenv('BROWSER_MAX_USES', '20'))
+        self.health_timeout = health_timeout or float(os.getenv('BROWSER_HEALTH_TIMEOUT', '5'))
+        self.session_factory = session_factory or (lambda: create_browser_session(keep_alive=True))
+
+        self._slots = asyncio.Semaphore(self.size)
+        self._idle = []         # [(session, uses)]
+        self._checked_out = {}  # id(session) -> uses
+        self._closed = False
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'created': 0,
+            'recycled': 0,
+            'discarded': 0,
+        }
+
+    @asynccontextmanager
+    async def session(self):
+        """Check a session out for the duration of the block"""
+        with span('browser_checkout'):
+            browser_session = await self.acquire()
+        reusable = False
+        try:
+            yield browser_session
+            reusable = True
+        finally:
+            await self.release(browser_session, reusable=reusable)
+
+    async def acquire(self):
+        if self._closed:
+            raise RuntimeError("BrowserPool is closed")
+
+        started = time.monotonic()
+        if self._slots.locked():
+            self._stats['waits'] += 1
+        await self._slots.acquire()
+        waited = time.monotonic() - started
+        self._stats['wait_time_total'] += waited
+        self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+
+        try:
+            while self._idle:
+                browser_session, uses = self._idle.pop()
+                if await self._is_healthy(browser_session):
+                    self._stats['hits'] += 1
+                    self._checked_out[id(browser_session)] = uses
+                    return browser_session
+                await self._discard(browser_session)
+
+            self._stats['misses'] += 1
+            browser_session = self.session_factory()
+            with span('browser_start'):
+                await browser_session.start()
+            self._stats['created'] += 1
+            self._checked_out[id(browser_session)] = 0
+            return browser_session
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, browser_session, reusable=True):
+        uses = self._checked_out.pop(id(browser_session), 0) + 1
+        try:
+            if self._closed or not reusable:
+                await self._discard(browser_session)
+            elif uses >= self.max_uses:
+                self._stats['recycled'] += 1
+                await self._discard(browser_session, count=False)
+            elif await self._reset(browser_session):
+                self._idle.append((browser_session, uses))
+            else:
+                await self._discard(browser_session)
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        """Stop every idle session; sessions still checked out are stopped on release"""
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for browser_session, _ in idle:
+            await self._discard(browser_session, count=False)
+
+    def stats(self):
+        lookups = self._stats['hits'] + self._stats['misses']
+        return {
+            **self._stats,
+            'size': self.size,
+            'idle': len(self._idle),
+            'in_use': len(self._checked_out),
+            'hit_rate': round(self._stats['hits'] / lookups, 3) if lookups else 0.0,
+            'wait_time_avg': round(self._stats['wait_time_total'] / lookups, 3) if lookups else 0.0,
+        }
+
+    async def _is_healthy(self, browser_session):
+        try:
+            await asyncio.wait_for(browser_session.get_current_page_url(), timeout=self.health_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def _reset(self, browser_session):
+        """Drop the previous audit's tabs, cookies and storage, False if the session must be replaced"""
+        try:
+            await asyncio.wait_for(self._clear_state(browser_session), timeout=self.health_timeout)
+            return True
+        except Exception as e:
+            print(f"Browser session reset failed, discarding it: {e}")
+            return False
+
+    async def _clear_state(self, browser_session):
+        tabs = await browser_session.get_tabs()
+        origins = set()
+        for tab in tabs:
+            parts = urlsplit(tab.url or '')
+            if parts.scheme in ('http', 'https'):
+                origins.add(f'{parts.scheme}://{parts.netloc}')
+        # Popups and new tabs the agent opened; the focused tab is kept and blanked below
+        focused = browser_session.agent_focus_target_id or (tabs[0].target_id if tabs else None)
+        for tab in tabs:
+            if tab.target_id != focused:
+                await browser_session.close_page(tab.target_id)
+        await browser_session.clear_cookies()
+        for origin in origins:
+            await browser_session.cdp_client.send.Storage.clearDataForOrigin(
+                params={'origin': origin, 'storageTypes': 'all'}
+            )
+        await browser_session.navigate_to('about:blank')
+
+    async def _discard(self, browser_session, count=True):
+        if count:
+            self._stats['discarded'] += 1
+        try:
+            with span('browser_stop'):
+                await browser_session.kill()
+        except Exception as e:
+            print(f"Failed to stop pooled browser session: {e}")
+
+
+_shared_pool = None
+
+
+def get_shared_browser_pool(size=None):
+    """
+    Process-wide pool for crawls running on the shared event loop.
+
+    Must be called from that loop. Returns None when pooling is disabled.
+    """
+    global _shared_pool
+    if default_pool_size() <= 0:
+        return None
+    if _shared_pool is None:
+        _shared_pool = BrowserPool(size=max(size or 0, default_pool_size()))
+    return _shared_pool
@@ -0,0 +1,5 @@
+"""pytest setup: modules import each other (and utils/) from the backend directory"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,135 @@
+import gzip
+import io
+import os
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from utils.http_client import fetch_page
+
+ROBOTS_USER_AGENT = os.getenv('ROBOTS_USER_AGENT', 'QAI-Auditor')
+
+
+def _local_name(tag):
+    """'{http://www.sitemaps.org/schemas/sitemap/0.9}loc' → 'loc'"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _child_text(element, name):
+    for child in element:
+        if _local_name(child.tag) == name and child.text:
+            return child.text.strip()
+    return None
+
+
+def decompress_sitemap(body, max_bytes):
+    """Gunzip .xml.gz sitemaps (servers rarely set Content-Encoding for them), capped at max_bytes"""
+    if body[:2] != b'\x1f\x8b':
+        return body
+    with gzip.GzipFile(fileobj=io.BytesIO(body)) as gz:
+        return gz.read(max_bytes)
+
+
+def parse_sitemap(body):
+    """
+    Parse a sitemap or sitemap index.
+
+    Returns ('index', [sitemap urls]) or ('urlset', [{'url', 'lastmod', 'priority'}]).
+    """
+    root = ET.fromstring(body)
+    kind = _local_name(root.tag)
+    if kind == 'sitemapindex':
+        return 'index', [loc for loc in (_child_text(item, 'loc') for item in root) if loc]
+
+    entries = []
+    for item in root:
+        loc = _child_text(item, 'loc')
+        if not loc:
+            continue
+        priority = _child_text(item, 'priority')
+        try:
+            priority = float(priority) if priority else None
+        except ValueError:
+            priority = None
+        entries.append({'url': loc, 'lastmod': _child_text(item, 'lastmod'), 'priority': priority})
+    return 'urlset', entries
+
+
+def _host(url):
+    return urlsplit(url).netloc.lower().removeprefix('www.')
+
+
+def parse_robots(text):
+    robots = RobotFileParser()
+    robots.parse(text.splitlines())
+    return robots
+
+
+class SiteDiscovery:
+    """What robots.txt and the sitemaps say about a site: crawl rules and known pages"""
+
+    def __init__(self, robots=None, entries=None, sitemaps=None):
+        self.robots = robots
+        self.entries = entries or []
+        self.sitemaps = sitemaps or []
+
+    def allowed(self, url):
+        """False when robots.txt disallows url for our user agent"""
+        return self.robots is None or self.robots.can_fetch(ROBOTS_USER_AGENT, url)
+
+
+async def fetch_robots(origin):
+    """RobotFileParser for origin, or None when the site has no usable robots.txt"""
+    try:
+        page = await fetch_page(urljoin(origin, '/robots.txt'))
+    except Exception as e:
+        print(f"robots.txt fetch failed for {origin}: {e}")
+        return None
+    if page['status'] >= 400:
+        return None
+    return parse_robots(page['text'])
+
+
+async def discover_site(start_url, max_urls=None, max_sitemaps=None):
+    """
+    Fetch robots.txt and walk the site's sitemaps (indexes and .gz included).
+
+    Sitemaps come from robots.txt `Sitemap:` lines, else /sitemap.xml. Only
+    sitemaps on the start URL's host are followed. At most `max_sitemaps` files
+    are fetched and `max_urls` page entries collected.
+    """
+    max_urls = max_urls or int(os.getenv('SITEMAP_MAX_URLS', '500'))
+    max_sitemaps = max_sitemaps or int(os.getenv('SITEMAP_MAX_FILES', '20'))
+    max_bytes = int(os.getenv('SITEMAP_MAX_BYTES', str(50 * 1024 * 1024)))
+
+    parts = urlsplit(start_url)
+    origin = f'{parts.scheme}://{parts.netloc}'
+    robots = await fetch_robots(origin)
+
+    pending = list(robots.site_maps() or []) if robots else []
+    if not pending:
+        pending = [urljoin(origin, '/sitemap.xml')]
+
+    seen = set()
+    fetched = []
+    entries = []
+    while pending and len(fetched) < max_sitemaps and len(entries) < max_urls:
+        sitemap_url = pending.pop(0)
+        if sitemap_url in seen or _host(sitemap_url) != _host(start_url):
+            continue
+        seen.add(sitemap_url)
+        try:
+            page = await fetch_page(sitemap_url, max_bytes=max_bytes)
+            if page['status'] >= 400:
+                continue
+            kind, items = parse_sitemap(decompress_sitemap(page['body'], max_bytes))
+        except Exception as e:
+            print(f"Sitemap {sitemap_url} skipped: {e}")
+            continue
+        fetched.append(sitemap_url)
+        if kind == 'index':
+            pending.extend(items)
+        else:
+            entries.extend(items[:max_urls - len(entries)])
+
+    return SiteDiscovery(robots=robots, entries=entries, sitemaps=fetched)
@@ -0,0 +1,95 @@
+import heapq
+import itertools
+import re
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from utils.urls import canonicalize_url, url_key
+
+# Captions that usually belong to footer / utility links rather than primary navigation
+SECONDARY_LINK_RE = re.compile(
+    r'privacy|terms|cookie|legal|disclaimer|imprint|sitemap|careers?|jobs|press|'
+    r'log\s?in|sign\s?in|sign\s?up|register|account|cart|rss|feed',
+    re.IGNORECASE,
+)
+
+
+def default_priority(url, hints):
+    """
+    Lower scores are crawled first.
+
+    Shallow paths beat deep ones, links found early on a page (primary nav, hero)
+    beat links found late (footer), and utility captions are pushed back.
+    Sitemap entries move up with their <priority> and a recent <lastmod>.
+    """
+    depth = len([segment for segment in urlsplit(url).path.split('/') if segment])
+    score = depth * 10
+
+    position = hints.get('position')
+    total = hints.get('total')
+    if position is not None and total:
+        score += 5 * position / total
+
+    if SECONDARY_LINK_RE.search(hints.get('caption') or ''):
+        score += 8
+
+    # Sitemap hints: <priority> is 0.0–1.0 with 0.5 as the default
+    priority = hints.get('priority')
+    if priority is not None:
+        score -= 10 * (priority - 0.5)
+    if is_recent(hints.get('lastmod')):
+        score -= 3
+
+    return score
+
+
+def is_recent(lastmod, days=30):
+    """True if a sitemap <lastmod> (W3C datetime) is within the last `days` days"""
+    if not lastmod:
+        return False
+    try:
+        modified = datetime.fromisoformat(lastmod.replace('Z', '+00:00'))
+    except ValueError:
+        return False
+    if modified.tzinfo is None:
+        modified = modified.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - modified).days <= days
+
+
+class Frontier:
+    """
+    Priority-ordered crawl frontier with O(1) membership checks.
+
+    URLs are deduplicated by url_key, so case, default-port, www. and
+    query-order variants of a page are queued once. The first variant seen is
+    queued and handed out as discovered; the canonical form is only the key.
+    Ties keep discovery order, which makes the default a breadth-first crawl.
+    """
+
+    def __init__(self, scorer=None):
+        self.scorer = scorer or default_priority
+        self._heap = []
+        self._seen = set()  # keys of every URL ever pushed (queued or already popped)
+        self._counter = itertools.count()
+
+    def push(self, url, hints=None):
+        """Queue url unless it was seen before, returns True if it was added"""
+        key = url_key(url)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        score = self.scorer(canonicalize_url(url), hints or {})
+        heapq.heappush(self._heap, (score, next(self._counter), url))
+        return True
+
+    def pop(self):
+        """Highest-priority queued URL, or None when empty"""
+        if not self._heap:
+            return None
+        return heapq.heappop(self._heap)[2]
+
+    def __contains__(self, url):
+        return url_key(url) in self._seen
+
+    def __len__(self):
+        return len(self._heap)
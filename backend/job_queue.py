@@ -0,0 +1,608 @@
+"""
+Multi-process mode: analyses run in worker processes behind a message queue.
+
+The web process (app.py) keeps the Socket.IO connections and the job store and
+hands each job to the least-loaded worker through a broker. A worker claims a
+job (it stays recorded against the worker until acknowledged), sends its
+Socket.IO frames, progress and outcome back through the broker, polls it for
+stop requests and acknowledges the job once its outcome is sent. Jobs claimed
+by a worker that stops heartbeating are handed to another worker.
+JOB_QUEUE_URL selects the broker:
+
+    redis://host:6379/0          Redis, workers on any host
+    sqlite:///path/queue.sqlite3 local stand-in, workers on this host (no server needed)
+
+Without JOB_QUEUE_URL everything runs in the web process as before.
+"""
+import asyncio
+import base64
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from scheduler import default_max_concurrent
+
+try:
+    import redis
+except ImportError:  # only needed for redis:// queues
+    redis = None
+
+# Shared queue for jobs dispatched while no worker was alive; every worker also pops from it
+ANY_WORKER = 'any'
+
+
+def job_queue_name(worker_id):
+    return f'jobs:{worker_id}'
+
+
+def worker_ttl():
+    """Seconds without a heartbeat after which a worker is considered dead"""
+    return float(os.getenv('WORKER_TTL', '10'))
+
+
+def max_attempts():
+    """Times a job is started before a worker dying under it fails the job"""
+    return int(os.getenv('JOB_MAX_ATTEMPTS', '2'))
+
+
+class RedisBroker:
+    """Broker on Redis lists and keys, for workers spread over several hosts"""
+
+    def __init__(self, url, prefix='qai:', poll_interval=0.2):
+        if redis is None:
+            raise RuntimeError("JOB_QUEUE_URL is a redis:// URL but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.poll_interval = poll_interval
+
+    def push(self, name, item):
+        self.client.rpush(self.prefix + name, json.dumps(item))
+
+    def pop(self, names, timeout=1.0):
+        """First item of the first non-empty queue in names, waiting up to timeout; None if there is none"""
+        keys = [self.prefix + name for name in names]
+        if timeout <= 0:
+            # BLPOP with a timeout of 0 would block forever
+            for key in keys:
+                item = self.client.lpop(key)
+                if item is not None:
+                    return json.loads(item)
+            return None
+        popped = self.client.blpop(keys, timeout=max(1, round(timeout)))
+        return json.loads(popped[1]) if popped else None
+
+    def claim(self, names, worker_id, timeout=1.0):
+        """
+        Like pop, but the item moves to worker_id's claimed list until ack().
+
+        LMOVE (Redis 6.2+) makes the move atomic, so a worker dying right after
+        a claim leaves the job where the dispatchers can reclaim it.
+        """
+        claimed_key = f'{self.prefix}claimed:{worker_id}'
+        deadline = time.monotonic() + timeout
+        while True:
+            for name in names:
+                raw = self.client.lmove(self.prefix + name, claimed_key, 'LEFT', 'RIGHT')
+                if raw is not None:
+                    return json.loads(raw)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def ack(self, worker_id, job_id):
+        """Drop a finished job from worker_id's claimed list"""
+        claimed_key = f'{self.prefix}claimed:{worker_id}'
+        for raw in self.client.lrange(claimed_key, 0, -1):
+            if json.loads(raw)['job_id'] == job_id:
+                self.client.lrem(claimed_key, 1, raw)
+                return
+
+    def release_claims(self, worker_id):
+        """Remove and return the jobs worker_id claimed but never acknowledged"""
+        claimed_key = f'{self.prefix}claimed:{worker_id}'
+        pipe = self.client.pipeline(transaction=True)
+        pipe.lrange(claimed_key, 0, -1)
+        pipe.delete(claimed_key)
+        raws, _ = pipe.execute()
+        return [json.loads(raw) for raw in raws]
+
+    def length(self, name):
+        return self.client.llen(self.prefix + name)
+
+    def job_ids(self, name):
+        """Ids of the jobs waiting in a queue, first in line first"""
+        return [json.loads(raw)['job_id'] for raw in self.client.lrange(self.prefix + name, 0, -1)]
+
+    def set_worker(self, worker_id, info):
+        self.client.hset(self.prefix + 'workers', worker_id, json.dumps(info))
+
+    def remove_worker(self, worker_id):
+        self.client.hdel(self.prefix + 'workers', worker_id)
+
+    def workers(self):
+        return {key.decode(): json.loads(value) for key, value in self.client.hgetall(self.prefix + 'workers').items()}
+
+    def request_stop(self, job_id):
+        self.client.set(f'{self.prefix}stop:{job_id}', 1, ex=24 * 3600)
+
+    def stop_requested(self, job_ids):
+        """The subset of job_ids whose stop was requested"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return set()
+        flags = self.client.mget([f'{self.prefix}stop:{job_id}' for job_id in job_ids])
+        return {job_id for job_id, flag in zip(job_ids, flags) if flag}
+
+
+class SqliteBroker:
+    """
+    Local stand-in for Redis on one SQLite file.
+
+    Works across processes on the same host with no server to run, for tests
+    and single-machine deployments. Pops poll every `poll_interval` seconds.
+    """
+
+    def __init__(self, path, poll_interval=0.1):
+        self.path = path
+        self.poll_interval = poll_interval
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS queue (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, item TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS queue_name ON queue (name, id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, info TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stops (job_id TEXT PRIMARY KEY, requested_at REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS claims (worker_id TEXT NOT NULL, job_id TEXT NOT NULL, item TEXT NOT NULL, PRIMARY KEY (worker_id, job_id))")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def push(self, name, item):
+        with self._connect() as conn:
+            conn.execute("INSERT INTO queue (name, item) VALUES (?, ?)", (name, json.dumps(item)))
+
+    def _pop_now(self, names, claimed_by=None):
+        with self._connect() as conn:
+            # IMMEDIATE takes the write lock up front, so two processes never pop the same row
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for name in names:
+                    row = conn.execute("SELECT id, item FROM queue WHERE name = ? ORDER BY id LIMIT 1", (name,)).fetchone()
+                    if row:
+                        conn.execute("DELETE FROM queue WHERE id = ?", (row[0],))
+                        item = json.loads(row[1])
+                        if claimed_by:
+                            conn.execute(
+                                "INSERT OR REPLACE INTO claims (worker_id, job_id, item) VALUES (?, ?, ?)",
+                                (claimed_by, item['job_id'], row[1]),
+                            )
+                        return item
+                return None
+            finally:
+                conn.execute("COMMIT")
+
+    def _wait_for(self, names, timeout, claimed_by=None):
+        deadline = time.monotonic() + timeout
+        while True:
+            item = self._pop_now(names, claimed_by)
+            if item is not None or time.monotonic() >= deadline:
+                return item
+            time.sleep(self.poll_interval)
+
+    def pop(self, names, timeout=1.0):
+        """First item of the first non-empty queue in names, waiting up to timeout; None if there is none"""
+        return self._wait_for(names, timeout)
+
+    def claim(self, names, worker_id, timeout=1.0):
+        """Like pop, but the item stays recorded against worker_id until ack()"""
+        return self._wait_for(names, timeout, claimed_by=worker_id)
+
+    def ack(self, worker_id, job_id):
+        """Drop a finished job from worker_id's claims"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM claims WHERE worker_id = ? AND job_id = ?", (worker_id, job_id))
+
+    def release_claims(self, worker_id):
+        """Remove and return the jobs worker_id claimed but never acknowledged"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute("SELECT item FROM claims WHERE worker_id = ?", (worker_id,)).fetchall()
+                conn.execute("DELETE FROM claims WHERE worker_id = ?", (worker_id,))
+            finally:
+                conn.execute("COMMIT")
+        return [json.loads(row[0]) for row in rows]
+
+    def length(self, name):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM queue WHERE name = ?", (name,)).fetchone()[0]
+
+    def job_ids(self, name):
+        """Ids of the jobs waiting in a queue, first in line first"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT item FROM queue WHERE name = ? ORDER BY id", (name,)).fetchall()
+        return [json.loads(row[0])['job_id'] for row in rows]
+
+    def set_worker(self, worker_id, info):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO workers (id, info) VALUES (?, ?)", (worker_id, json.dumps(info)))
+
+    def remove_worker(self, worker_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def workers(self):
+        with self._connect() as conn:
+            return {worker_id: json.loads(info) for worker_id, info in conn.execute("SELECT id, info FROM workers")}
+
+    def request_stop(self, job_id):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO stops (job_id, requested_at) VALUES (?, ?)", (job_id, time.time()))
+            conn.execute("DELETE FROM stops WHERE requested_at < ?", (time.time() - 24 * 3600,))
+
+    def stop_requested(self, job_ids):
+        """The subset of job_ids whose stop was requested"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return set()
+        with self._connect() as conn:
+            placeholders = ', '.join('?' * len(job_ids))
+            rows = conn.execute(f"SELECT job_id FROM stops WHERE job_id IN ({placeholders})", job_ids)
+            return {row[0] for row in rows}
+
+
+def create_broker(url=None):
+    """Broker for JOB_QUEUE_URL (or url), None when multi-process mode is off"""
+    url = url if url is not None else os.getenv('JOB_QUEUE_URL', '')
+    if not url:
+        return None
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBroker(url)
+    if url.startswith('sqlite://'):
+        # sqlite:///abs/path or sqlite://relative/path
+        return SqliteBroker(url[len('sqlite://'):])
+    raise ValueError(f"Unsupported JOB_QUEUE_URL: {url}")
+
+
+class QueueDispatcher:
+    """
+    Web-process side: sends jobs to workers and relays what they send back.
+
+    Each job goes to the live worker with the lowest load (running plus queued
+    jobs over its capacity). A relay thread (start()) reads this process's event
+    queue: Socket.IO frames are passed to deliver(sid, event, payload), progress
+    and outcomes are written to the job store, and on_finish(job_id, sid) runs
+    when a job ends. Screenshots a worker stored on its own disk arrive before
+    the frames that reference them and are written to screenshot_store. About
+    once a second, waiting Socket.IO clients get a
+    `queued` frame when their position changes. When a worker stops
+    heartbeating, its queued jobs and the jobs it claimed go back to the shared
+    queue (a claimed job at most JOB_MAX_ATTEMPTS times, then it fails).
+    """
+
+    def __init__(self, broker, store, deliver=None, on_finish=None, screenshot_store=None, position_interval=1.0):
+        self.broker = broker
+        self.store = store
+        self.deliver = deliver
+        self.on_finish = on_finish
+        self.screenshot_store = screenshot_store
+        self.position_interval = position_interval
+        # Each web process gets its workers' events on its own queue
+        self.events_queue = f'events:{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._jobs = {}      # job_id -> {'sid', 'worker', 'running', 'position'} of jobs in flight
+        self._outcomes = {}  # job_id -> (threading.Event, finish event) for callers waiting on a job
+        self._unreachable = set()  # jobs whose worker was gone at the last reap
+        self._lock = threading.Lock()
+        self._relay = None
+
+    def start(self):
+        """Start the relay thread"""
+        self._relay = threading.Thread(target=self._run_relay, name='queue-relay', daemon=True)
+        self._relay.start()
+        return self
+
+    def live_workers(self):
+        now = time.time()
+        return {worker_id: info for worker_id, info in self.broker.workers().items() if now - info['seen'] <= worker_ttl()}
+
+    def pick_worker(self):
+        """(least-loaded live worker id or ANY_WORKER, jobs ahead of a new one on it)"""
+        loads = []
+        for worker_id, info in self.live_workers().items():
+            load = info['load'] + self.broker.length(job_queue_name(worker_id))
+            loads.append((load / max(1, info['capacity']), load, worker_id, info['capacity']))
+        if not loads:
+            return ANY_WORKER, self.broker.length(job_queue_name(ANY_WORKER))
+        _, load, worker_id, capacity = min(loads)
+        return worker_id, max(0, load - capacity + 1)
+
+    def submit(self, job_id, params, sid=None, wait=False):
+        """
+        Queue job_id on the least-loaded worker, returns how many jobs are ahead of it there.
+
+        With wait, the outcome is kept for a later wait(job_id).
+        """
+        worker_id, ahead = self.pick_worker()
+        with self._lock:
+            self._jobs[job_id] = {'sid': sid, 'worker': worker_id, 'running': False, 'position': None}
+            if wait:
+                self._outcomes[job_id] = (threading.Event(), None)
+        self.broker.push(job_queue_name(worker_id), {
+            'job_id': job_id, 'params': params, 'sid': sid, 'reply_to': self.events_queue, 'attempt': 0,
+        })
+        print(f"Job {job_id} dispatched to worker {worker_id} ({ahead} ahead)")
+        return ahead
+
+    def stop(self, job_id):
+        self.broker.request_stop(job_id)
+
+    def wait(self, job_id, timeout=None):
+        """Block until job_id finishes, returns its finish event ({'status', 'result', 'error', ...}) or None on timeout"""
+        with self._lock:
+            entry = self._outcomes.get(job_id)
+        if entry is None or not entry[0].wait(timeout):
+            return None
+        with self._lock:
+            return self._outcomes.pop(job_id)[1]
+
+    def status(self):
+        """Live workers with their load, for the scheduler endpoint"""
+        return {
+            worker_id: {**info, 'queued': self.broker.length(job_queue_name(worker_id))}
+            for worker_id, info in self.live_workers().items()
+        }
+
+    def update_positions(self):
+        """Send `queued` frames to Socket.IO clients whose job is waiting behind others"""
+        with self._lock:
+            waiting = {job_id: dict(job) for job_id, job in self._jobs.items() if job['sid'] and not job['running']}
+        if not waiting or not self.deliver:
+            return
+        workers = self.live_workers()
+        for worker_id in {job['worker'] for job in waiting.values()}:
+            line = self.broker.job_ids(job_queue_name(worker_id))
+            # The first jobs in line are claimed as soon as the worker(s) have a free slot
+            if worker_id == ANY_WORKER:
+                free = sum(max(0, info['capacity'] - info['load']) for info in workers.values())
+            else:
+                info = workers.get(worker_id)
+                free = max(0, info['capacity'] - info['load']) if info else 0
+            for index, job_id in enumerate(line):
+                job = waiting.get(job_id)
+                if job is None or index < free:
+                    continue
+                position = (index - free + 1, len(line) - free)
+                if position == job['position']:
+                    continue
+                with self._lock:
+                    if job_id in self._jobs:
+                        self._jobs[job_id]['position'] = position
+                self.deliver(job['sid'], 'queued', {'job_id': job_id, 'position': position[0], 'queue_length': position[1]})
+
+    def _run_relay(self):
+        next_reap = time.monotonic() + worker_ttl()
+        next_positions = time.monotonic()
+        while True:
+            try:
+                event = self.broker.pop([self.events_queue], timeout=min(1.0, self.position_interval))
+                if event is not None:
+                    self._handle(event)
+                if time.monotonic() >= next_positions:
+                    self.update_positions()
+                    next_positions = time.monotonic() + self.position_interval
+                if time.monotonic() >= next_reap:
+                    self._reap_dead_workers()
+                    next_reap = time.monotonic() + worker_ttl()
+            except Exception as e:
+                print(f"Queue relay error: {e}")
+                time.sleep(1)
+
+    def _handle(self, event):
+        job_id = event['job_id']
+        kind = event['type']
+        if kind == 'screenshots':
+            if self.screenshot_store:
+                for screenshot_id, encoded in event['items'].items():
+                    self.screenshot_store.put_encoded(screenshot_id, base64.b64decode(encoded['full']), base64.b64decode(encoded['thumb']))
+        elif kind == 'emit':
+            if self.deliver and event.get('sid'):
+                self.deliver(event['sid'], event['event'], event['payload'])
+        elif kind == 'running':
+            with self._lock:
+                if job_id in self._jobs:
+                    self._jobs[job_id].update(worker=event['worker'], running=True)
+            self.store.mark_running(job_id)
+        elif kind == 'requeued':
+            with self._lock:
+                if job_id in self._jobs:
+                    self._jobs[job_id].update(worker=ANY_WORKER, running=False, position=None)
+            if self.deliver and event.get('sid'):
+                self.deliver(event['sid'], 'log', {'message': event['message'], 'type': 'warning'})
+        elif kind == 'progress':
+            self.store.update_progress(job_id, event['pages_done'], event['pages_total'])
+        elif kind == 'finish':
+            self._finish(job_id, event)
+
+    def _finish(self, job_id, event):
+        self.store.finish(job_id, event['status'], result=event.get('result'), error=event.get('error'))
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            entry = self._outcomes.get(job_id)
+            if entry is not None:
+                self._outcomes[job_id] = (entry[0], event)
+                entry[0].set()
+        if self.on_finish and job:
+            self.on_finish(job_id, job['sid'])
+
+    def _reap_dead_workers(self):
+        now = time.time()
+        for worker_id, info in self.broker.workers().items():
+            if now - info['seen'] <= worker_ttl():
+                continue
+            print(f"Worker {worker_id} stopped heartbeating, handing its jobs to the other workers")
+            self.broker.remove_worker(worker_id)
+            # Jobs it never started keep their attempt count
+            while True:
+                job = self.broker.pop([job_queue_name(worker_id)], timeout=0)
+                if job is None:
+                    break
+                self._requeue(job, 'Its worker went away, moving the analysis to another worker...')
+            for job in self.broker.release_claims(worker_id):
+                job['attempt'] = job.get('attempt', 0) + 1
+                if job['attempt'] >= max_attempts():
+                    self.broker.push(job['reply_to'], {
+                        'type': 'finish', 'job_id': job['job_id'], 'sid': job.get('sid'), 'status': 'failed',
+                        'error': f'Worker {worker_id} died while running the job',
+                    })
+                    if job.get('sid'):
+                        self.broker.push(job['reply_to'], {
+                            'type': 'emit', 'job_id': job['job_id'], 'sid': job['sid'], 'event': 'error',
+                            'payload': {'message': 'Internal server error: the worker running this analysis died'},
+                        })
+                    continue
+                self._requeue(job, 'The worker running this analysis died, restarting it on another worker...')
+
+        # Our jobs on a worker that vanished without its claims being released (an ack
+        # raced the crash): give the reaping dispatcher one cycle to requeue them, then fail
+        live = self.live_workers()
+        with self._lock:
+            gone = {job_id: job['sid'] for job_id, job in self._jobs.items() if job['worker'] != ANY_WORKER and job['worker'] not in live}
+        for job_id, sid in gone.items():
+            if job_id not in self._unreachable:
+                continue
+            if self.deliver and sid:
+                self.deliver(sid, 'error', {'message': 'Internal server error: the worker running this analysis died'})
+            self._finish(job_id, {'status': 'failed', 'error': 'The worker running the job died'})
+        self._unreachable = set(gone)
+
+    def _requeue(self, job, message):
+        self.broker.push(job_queue_name(ANY_WORKER), job)
+        self.broker.push(job['reply_to'], {'type': 'requeued', 'job_id': job['job_id'], 'sid': job.get('sid'), 'message': message})
+
+
+class QueueWorker:
+    """
+    Worker-process side: claims jobs from its own queue (then the shared one) and runs them.
+
+    At most `capacity` jobs (JOB_WORKERS) run at once on this process's event
+    loop. The worker heartbeats its load so dispatchers can pick the least-loaded
+    one, and turns stop requests into the jobs' stop flags. run_job(job, stop_flag,
+    publish) is the coroutine function doing the work; publish(event) sends an
+    event back to the job's web process. Broker writes go through one outbox
+    thread, in order, so publishing never blocks the event loop.
+    """
+
+    def __init__(self, broker, run_job, event_loop, capacity=None, heartbeat_interval=None):
+        self.broker = broker
+        self.run_job = run_job
+        self.event_loop = event_loop
+        self.capacity = capacity or default_max_concurrent()
+        self.heartbeat_interval = heartbeat_interval or float(os.getenv('WORKER_HEARTBEAT', '2'))
+        self.worker_id = f'{socket.gethostname()}-{os.getpid()}'
+        self._running = {}  # job_id -> threading.Event (stop flag)
+        self._lock = threading.Lock()
+        self._last_heartbeat = 0.0
+        self._outbox = queue.Queue()
+        threading.Thread(target=self._send_outbox, name='queue-outbox', daemon=True).start()
+
+    def _send_outbox(self):
+        while True:
+            send = self._outbox.get()
+            try:
+                send()
+            except Exception as e:
+                print(f"Queue outbox error: {e}")
+            finally:
+                self._outbox.task_done()
+
+    def heartbeat(self):
+        with self._lock:
+            load = len(self._running)
+        self.broker.set_worker(self.worker_id, {'load': load, 'capacity': self.capacity, 'seen': time.time()})
+        self._last_heartbeat = time.monotonic()
+
+    def check_stops(self):
+        with self._lock:
+            running = dict(self._running)
+        for job_id in self.broker.stop_requested(running):
+            running[job_id].set()
+
+    def start(self, job):
+        job_id = job['job_id']
+        stop_flag = threading.Event()
+        if self.broker.stop_requested([job_id]):
+            stop_flag.set()
+
+        def publish(event):
+            message = {**event, 'job_id': job_id, 'sid': job.get('sid')}
+            self._outbox.put(lambda: self.broker.push(job['reply_to'], message))
+
+        async def run():
+            try:
+                if stop_flag.is_set():
+                    # Stopped while it was queued: no reachability probe or intent call for it
+                    publish({'type': 'finish', 'status': 'stopped'})
+                    return
+                publish({'type': 'running', 'worker': self.worker_id})
+                await self.run_job(job, stop_flag, publish)
+            except Exception as e:
+                publish({'type': 'finish', 'status': 'failed', 'error': str(e)})
+            finally:
+                # Acknowledged only after the outcome is on its way
+                self._outbox.put(lambda: self.broker.ack(self.worker_id, job_id))
+                with self._lock:
+                    self._running.pop(job_id, None)
+                await asyncio.to_thread(self.heartbeat)
+
+        with self._lock:
+            self._running[job_id] = stop_flag
+        self.heartbeat()
+        return self.event_loop.submit(run())
+
+    def serve_once(self, timeout=1.0):
+        """Heartbeat, apply stop requests and claim a job if there is a free slot; returns the claimed job's future or None"""
+        if time.monotonic() - self._last_heartbeat >= self.heartbeat_interval:
+            self.heartbeat()
+        self.check_stops()
+        with self._lock:
+            full = len(self._running) >= self.capacity
+        if full:
+            time.sleep(0.2)
+            return None
+        job = self.broker.claim([job_queue_name(self.worker_id), job_queue_name(ANY_WORKER)], self.worker_id, timeout=timeout)
+        return self.start(job) if job is not None else None
+
+    def run_forever(self):
+        print(f"Worker {self.worker_id} serving up to {self.capacity} jobs")
+        self.heartbeat()
+        try:
+            while True:
+                self.serve_once()
+        finally:
+            self.broker.remove_worker(self.worker_id)
+
+
+_lock = threading.Lock()
+_dispatcher = None
+
+
+def get_dispatcher(store, deliver=None, on_finish=None, screenshot_store=None):
+    """Process-wide QueueDispatcher when JOB_QUEUE_URL is set, else None (in-process mode)"""
+    global _dispatcher
+    with _lock:
+        if _dispatcher is None:
+            broker = create_broker()
+            if broker is None:
+                return None
+            _dispatcher = QueueDispatcher(broker, store, deliver=deliver, on_finish=on_finish, screenshot_store=screenshot_store).start()
+        return _dispatcher
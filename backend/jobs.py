@@ -0,0 +1,214 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from scheduler import FairScheduler
+from utils.event_loop import get_event_loop
+
+DEFAULT_JOB_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'jobs.sqlite3')
+
+# Job lifecycle: queued → running → completed | failed | stopped
+FINISHED_STATUSES = ('completed', 'failed', 'stopped')
+
+
+class JobStore:
+    """
+    SQLite-backed store of analysis jobs, their progress and their result payloads.
+
+    Several processes can share one database: each unfinished job is leased by
+    the process that created it, which renews the lease every lease_seconds / 3.
+    Only jobs whose lease ran out (their owner died) are failed on startup.
+    """
+
+    def __init__(self, path=None, owner=None, lease_seconds=None):
+        self.path = path or os.getenv('JOB_DB_PATH', DEFAULT_JOB_DB_PATH)
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.lease_seconds = lease_seconds or float(os.getenv('JOB_LEASE_SECONDS', '60'))
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    client TEXT,
+                    params TEXT NOT NULL,
+                    pages_done INTEGER NOT NULL DEFAULT 0,
+                    pages_total INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    owner TEXT,
+                    lease_until REAL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (('owner', 'TEXT'), ('lease_until', 'REAL')):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self.recover()
+        threading.Thread(target=self._keep_leases, name='job-leases', daemon=True).start()
+
+    def recover(self):
+        """Fail unfinished jobs whose owner stopped renewing their lease (it died), returns how many"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Server restarted before the job finished', finished_at = ? "
+                "WHERE status IN ('queued', 'running') AND (lease_until IS NULL OR lease_until < ?)",
+                (time.time(), time.time()),
+            )
+        return cursor.rowcount
+
+    def renew_leases(self):
+        """Extend the lease of every unfinished job owned by this process"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status IN ('queued', 'running')",
+                (time.time() + self.lease_seconds, self.owner),
+            )
+
+    def _keep_leases(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                self.renew_leases()
+            except sqlite3.Error as e:
+                print(f"Job lease renewal failed: {e}")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, params, client=None):
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, client, params, pages_total, created_at, owner, lease_until) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+                (job_id, client, json.dumps(params), params.get('max_pages', 0), time.time(), self.owner, time.time() + self.lease_seconds),
+            )
+        return job_id
+
+    def mark_running(self, job_id):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def update_progress(self, job_id, pages_done, pages_total):
+        with self._connect() as conn:
+            # Updates written from a thread pool may land out of order, never move backwards
+            conn.execute(
+                "UPDATE jobs SET pages_done = ?, pages_total = ? WHERE id = ? AND pages_done <= ?",
+                (pages_done, pages_total, job_id, pages_done),
+            )
+
+    def finish(self, job_id, status, result=None, error=None):
+        with self._connect() as conn:
+            if result is not None:
+                pages = result.get('total_pages_analyzed', 0)
+                conn.execute(
+                    "UPDATE jobs SET status = ?, result = ?, pages_done = ?, pages_total = ?, finished_at = ? WHERE id = ?",
+                    (status, json.dumps(result), pages, pages, time.time(), job_id),
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (status, error, time.time(), job_id),
+                )
+
+    def get(self, job_id, include_result=False):
+        """Return the job as a dict (result payload only when include_result), or None"""
+        columns = "id, status, client, params, pages_done, pages_total, error, created_at, started_at, finished_at"
+        if include_result:
+            columns += ", result"
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        if include_result:
+            job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+
+class JobRunner:
+    """Executes analysis jobs on the shared event loop and records their outcome in a JobStore"""
+
+    def __init__(self, store, event_loop=None, scheduler=None):
+        self.store = store
+        self.event_loop = event_loop or get_event_loop()
+        # Global concurrency cap + fairness across clients (fewest running first)
+        self.scheduler = scheduler or FairScheduler(loop=self.event_loop.loop)
+        self.max_workers = self.scheduler.max_concurrent
+
+    def submit(self, job_id, task, client=None, on_queued=None):
+        """
+        Run the coroutine function task() on the shared loop for job_id once the
+        scheduler admits it.
+
+        task returns the result dict, or None if the analysis was stopped;
+        any exception marks the job as failed with the exception message.
+        on_queued(position, queue_length) is called while the job waits for a slot.
+        Returns a concurrent.futures.Future for the result.
+        """
+        # SQLite writes go to a thread so they never stall the crawls sharing the loop
+        async def start():
+            await asyncio.to_thread(self.store.mark_running, job_id)
+            return await task()
+
+        async def run():
+            try:
+                result = await self.scheduler.run(client, job_id, start, on_queued=on_queued)
+            except Exception as e:
+                await asyncio.to_thread(self.store.finish, job_id, 'failed', error=str(e))
+                return None
+            if result is None:
+                await asyncio.to_thread(self.store.finish, job_id, 'stopped')
+            else:
+                await asyncio.to_thread(self.store.finish, job_id, 'completed', result=result)
+            return result
+
+        return self.event_loop.submit(run())
+
+    def cancel(self, job_id):
+        """Remove a job that is still waiting for a slot"""
+        self.scheduler.cancel(job_id)
+
+    def status(self):
+        """Scheduler snapshot, read on the loop thread"""
+        async def snapshot():
+            return self.scheduler.snapshot()
+        return self.event_loop.run(snapshot(), timeout=5)
+
+    def progress_callback(self, job_id):
+        """Build an on_progress(pages_done, pages_total) callback that records progress for job_id (called on the loop)"""
+        def on_progress(pages_done, pages_total):
+            asyncio.get_running_loop().run_in_executor(None, self.store.update_progress, job_id, pages_done, pages_total)
+        return on_progress
+
+
+_lock = threading.Lock()
+_store = None
+_runner = None
+
+
+def get_job_runner():
+    """Process-wide JobRunner (and its JobStore), created on first use"""
+    global _store, _runner
+    with _lock:
+        if _runner is None:
+            _store = JobStore()
+            _runner = JobRunner(_store)
+        return _runner
@@ -0,0 +1,172 @@
+import contextvars
+import os
+import threading
+import time
+
+# Entry types that can be merged/dropped when a client falls behind
+SPAMMY_TYPES = ('step', 'result', 'action')
+
+# Process-wide counters across all sessions
+stats = {
+    'records_in': 0,
+    'records_emitted': 0,
+    'records_merged': 0,
+    'records_dropped': 0,
+    'frames_emitted': 0,
+    'buffers_open': 0,  # sessions whose buffer the flusher thread still polls
+}
+_stats_lock = threading.Lock()
+
+
+def _count(key, n=1):
+    with _stats_lock:
+        stats[key] += n
+
+
+class LogBuffer:
+    """
+    Per-session log buffer that turns many tiny `log` emits into batched `logs` frames.
+
+    Entries are flushed as one `logs` event ({'entries': [...]}) every
+    `flush_interval_ms` (by the shared flusher thread) or as soon as
+    `max_entries` are pending. Consecutive identical entries are merged into one
+    with a `count`. Once `max_pending` entries are waiting, step/action spam is
+    dropped, keeping only the newest step so progress stays visible.
+    """
+
+    def __init__(self, emit_fn, flush_interval_ms=None, max_entries=None, max_pending=None):
+        self.emit_fn = emit_fn
+        self.flush_interval = (flush_interval_ms or int(os.getenv('LOG_FLUSH_INTERVAL_MS', '250'))) / 1000
+        self.max_entries = max_entries or int(os.getenv('LOG_FLUSH_MAX_ENTRIES', '20'))
+        self.max_pending = max_pending or int(os.getenv('LOG_MAX_PENDING', '200'))
+        self.emitted = 0
+        self.merged = 0
+        self.dropped = 0
+
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # keeps frames in order across threads
+        self._closed = False
+        _flusher.register(self)
+
+    def add(self, entry):
+        _count('records_in')
+        with self._lock:
+            if self._closed:
+                return
+            last = self._pending[-1] if self._pending else None
+            if last and last.get('type') == entry.get('type') and last.get('message') == entry.get('message'):
+                last['count'] = last.get('count', 1) + 1
+                self.merged += 1
+                _count('records_merged')
+                return
+
+            if len(self._pending) >= self.max_pending and entry.get('type') in SPAMMY_TYPES:
+                self._drop_spam(entry)
+                return
+
+            self._pending.append(dict(entry))
+            flush_now = len(self._pending) >= self.max_entries
+
+        if flush_now:
+            self.flush()
+
+    def _drop_spam(self, entry):
+        """Backpressure: replace the newest pending entry of the same type instead of growing"""
+        for i in range(len(self._pending) - 1, -1, -1):
+            if self._pending[i].get('type') == entry.get('type'):
+                self._pending[i] = dict(entry)
+                break
+        self.dropped += 1
+        _count('records_dropped')
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                entries, self._pending = self._pending, []
+                self._last_flush = time.monotonic()
+            if not entries:
+                return
+            self.emitted += len(entries)
+            _count('records_emitted', len(entries))
+            _count('frames_emitted')
+            self.emit_fn('logs', {'entries': entries})
+
+    def flush_if_due(self):
+        if self._pending and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def close(self):
+        """Flush what is left and stop accepting entries"""
+        self.flush()
+        with self._lock:
+            self._closed = True
+        _flusher.unregister(self)
+
+    def stats(self):
+        return {'emitted': self.emitted, 'merged': self.merged, 'dropped': self.dropped}
+
+
+class _Flusher:
+    """One daemon thread that flushes every registered buffer on its interval"""
+
+    def __init__(self, tick=0.05):
+        self.tick = tick
+        self._buffers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, buffer):
+        with self._lock:
+            if buffer not in self._buffers:
+                self._buffers.add(buffer)
+                _count('buffers_open')
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='qai-log-flusher', daemon=True)
+                self._thread.start()
+
+    def unregister(self, buffer):
+        with self._lock:
+            if buffer in self._buffers:
+                self._buffers.discard(buffer)
+                _count('buffers_open', -1)
+
+    def _run(self):
+        while True:
+            time.sleep(self.tick)
+            with self._lock:
+                buffers = list(self._buffers)
+            for buffer in buffers:
+                try:
+                    buffer.flush_if_due()
+                except Exception as e:
+                    print(f"Log flush failed: {e}")
+
+
+_flusher = _Flusher()
+
+
+def buffered_emitter(emit_fn, buffer=None):
+    """
+    Wrap a Socket.IO emit function so `log` events go through a LogBuffer.
+
+    Other events flush the buffer first so clients see logs before e.g. `complete`.
+    Returns (emit, buffer); call buffer.close() when the session's analysis ends.
+    """
+    buffer = buffer or LogBuffer(emit_fn)
+
+    def emit(event, payload):
+        if event == 'log':
+            buffer.add(payload)
+            return
+        buffer.flush()
+        emit_fn(event, payload)
+
+    return emit, buffer
+
+
+# Emit function of the session whose code is currently running. Set by the crawler
+# and the agent calls; asyncio tasks inherit it, so logging handlers can route a
+# record to the right client without knowing about sessions.
+log_sink = contextvars.ContextVar('log_sink', default=None)
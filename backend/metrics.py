@@ -0,0 +1,151 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, start_http_server
+except ImportError:  # metrics are optional, timings in the results still work without them
+    CollectorRegistry = None
+
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# Timings dict of the page being analyzed, set by page_timer() in the crawler.
+# Agent tasks inherit it, so spans deep in agent_core/browser_pool land on the right page.
+page_timings = contextvars.ContextVar('page_timings', default=None)
+
+if CollectorRegistry is not None:
+    registry = CollectorRegistry()
+    STAGE_SECONDS = Histogram(
+        'qai_stage_duration_seconds', 'Duration of analysis stages', ['stage'],
+        buckets=STAGE_BUCKETS, registry=registry,
+    )
+    AGENT_STEPS = Counter('qai_agent_steps', 'Browser agent steps taken', ['agent'], registry=registry)
+    LLM_TOKENS = Counter('qai_llm_tokens', 'LLM tokens used by browser agents', ['agent', 'kind'], registry=registry)
+    PAGES = Counter('qai_pages', 'Pages handled by the crawler', ['outcome'], registry=registry)
+    SCREENSHOT_BYTES = Counter(
+        'qai_screenshot_bytes', 'Screenshot bytes captured and stored after re-encoding', ['kind'], registry=registry,
+    )
+else:
+    registry = None
+
+
+def observe_stage(stage, seconds):
+    """Record one stage duration in the histogram and in the current page's timings"""
+    if registry is not None:
+        STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    timings = page_timings.get()
+    if timings is not None:
+        stages = timings['stages']
+        stages[stage] = round(stages.get(stage, 0.0) + seconds, 3)
+
+
+@contextmanager
+def span(stage):
+    """Time the block as `stage` (works around awaits too, it only reads the clock)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def history_usage(history):
+    """(steps, prompt tokens, completion tokens) of a browser_use AgentHistoryList"""
+    steps = history.number_of_steps() if hasattr(history, 'number_of_steps') else len(getattr(history, 'history', []))
+    usage = getattr(history, 'usage', None)
+    if usage is not None:
+        return steps, usage.total_prompt_tokens or 0, usage.total_completion_tokens or 0
+    # Older browser_use versions only expose an input token estimate
+    if hasattr(history, 'total_input_tokens'):
+        return steps, history.total_input_tokens() or 0, 0
+    return steps, 0, 0
+
+
+def record_agent_run(agent, history):
+    """Count an agent run's steps and tokens, globally and on the current page"""
+    try:
+        steps, prompt_tokens, completion_tokens = history_usage(history)
+    except Exception as e:
+        print(f"Could not read agent usage: {e}")
+        return
+    if registry is not None:
+        AGENT_STEPS.labels(agent=agent).inc(steps)
+    timings = page_timings.get()
+    if timings is not None:
+        timings['agent_steps'] += steps
+    record_llm_usage(agent, prompt_tokens, completion_tokens)
+
+
+def record_llm_usage(agent, prompt_tokens, completion_tokens):
+    """Count tokens of an LLM call, globally and on the current page"""
+    prompt_tokens = prompt_tokens or 0
+    completion_tokens = completion_tokens or 0
+    if registry is not None:
+        LLM_TOKENS.labels(agent=agent, kind='prompt').inc(prompt_tokens)
+        LLM_TOKENS.labels(agent=agent, kind='completion').inc(completion_tokens)
+    timings = page_timings.get()
+    if timings is not None:
+        timings['llm_tokens'] += prompt_tokens + completion_tokens
+
+
+def record_screenshots(stats):
+    """Count stored screenshots and their bytes, globally and on the current page (stats from put_many)"""
+    observe_stage('screenshot_encode', stats['encode_seconds'])
+    if registry is not None:
+        SCREENSHOT_BYTES.labels(kind='captured').inc(stats['captured_bytes'])
+        SCREENSHOT_BYTES.labels(kind='stored').inc(stats['stored_bytes'])
+    timings = page_timings.get()
+    if timings is not None:
+        screenshots = timings['screenshots']
+        for key in ('count', 'captured_bytes', 'stored_bytes'):
+            screenshots[key] += stats[key]
+
+
+@contextmanager
+def page_timer():
+    """Collect the stage timings, agent steps, tokens and screenshot bytes of one page; yields the timings dict"""
+    timings = {
+        'total': 0.0, 'stages': {}, 'agent_steps': 0, 'llm_tokens': 0,
+        'screenshots': {'count': 0, 'captured_bytes': 0, 'stored_bytes': 0},
+    }
+    token = page_timings.set(timings)
+    started = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        page_timings.reset(token)
+        timings['total'] = round(time.perf_counter() - started, 3)
+        if registry is not None:
+            STAGE_SECONDS.labels(stage='page').observe(timings['total'])
+
+
+def record_page(outcome):
+    """Count a crawled page by outcome: audited, reused, skipped or error"""
+    if registry is not None:
+        PAGES.labels(outcome=outcome).inc()
+
+
+def render_metrics():
+    """(body, content type) in the Prometheus text format, or None without prometheus_client"""
+    if registry is None:
+        return None
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def serve_metrics(port, addr='0.0.0.0'):
+    """
+    Export this process's metrics on http://addr:port/metrics from a daemon thread.
+
+    For worker.py processes, whose analyses never reach the web process's registry.
+    Returns False when prometheus_client is missing or the port cannot be bound.
+    """
+    if registry is None:
+        print("prometheus_client is not installed, metrics are not exported")
+        return False
+    try:
+        start_http_server(port, addr=addr, registry=registry)
+    except OSError as e:
+        print(f"Metrics endpoint on port {port} failed: {e}")
+        return False
+    print(f"Metrics on http://{addr}:{port}/metrics")
+    return True
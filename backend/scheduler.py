@@ -0,0 +1,177 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+
+def default_max_concurrent():
+    """Analyses one process runs at once (JOB_WORKERS)"""
+    return int(os.getenv('JOB_WORKERS', '4'))
+
+
+class FairScheduler:
+    """
+    Admission control for analyses running on the shared event loop.
+
+    At most `max_concurrent` analyses run at once. Waiting analyses are grouped
+    per client. A free slot goes to the waiting client with the fewest running
+    analyses, ties to the one served least recently, so a client submitting a
+    burst (or one that already holds slots) cannot starve everyone else.
+    Waiting callers are told their live queue position through an
+    on_queued(position, queue_length) callback.
+
+    All methods except cancel() must be called on the event loop thread.
+    """
+
+    def __init__(self, max_concurrent=None, loop=None):
+        self.max_concurrent = max_concurrent or default_max_concurrent()
+        self.loop = loop
+        self._queues = {}        # client -> deque of waiting entries
+        self._clients = deque()  # clients with waiting entries, in arrival order
+        self._running = {}       # id(entry) -> entry
+        self._served = {}        # client -> admission count when it was last admitted
+        self._admitted = 0
+        self._cancelled = 0
+
+    async def run(self, client, job_id, task, on_queued=None):
+        """
+        Wait for a slot, then run the coroutine function task().
+
+        Returns task()'s result, or None if the entry was cancelled while queued.
+        """
+        entry = {
+            'job_id': job_id,
+            'client': client,
+            'on_queued': on_queued,
+            'position': None,
+            'queued_at': time.time(),
+            'started_at': None,
+            'turn': asyncio.get_running_loop().create_future(),
+        }
+        if client not in self._queues:
+            self._queues[client] = deque()
+            self._clients.append(client)
+        self._queues[client].append(entry)
+        self._dispatch()
+
+        try:
+            admitted = await entry['turn']
+        except asyncio.CancelledError:
+            self._remove_waiting(entry)
+            raise
+        if not admitted:
+            return None
+
+        try:
+            return await task()
+        finally:
+            self._running.pop(id(entry), None)
+            self._dispatch()
+
+    def cancel(self, job_id):
+        """Drop a still-queued job; safe to call from any thread"""
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self._cancel, job_id)
+
+    def _cancel(self, job_id):
+        for queue in self._queues.values():
+            for entry in queue:
+                if entry['job_id'] == job_id:
+                    self._remove_waiting(entry)
+                    self._cancelled += 1
+                    if not entry['turn'].done():
+                        entry['turn'].set_result(False)
+                    self._notify_positions()
+                    return
+
+    def _remove_waiting(self, entry):
+        queue = self._queues.get(entry['client'])
+        if queue and entry in queue:
+            queue.remove(entry)
+            if not queue:
+                del self._queues[entry['client']]
+                self._clients.remove(entry['client'])
+
+    def _running_counts(self):
+        counts = {}
+        for entry in self._running.values():
+            counts[entry['client']] = counts.get(entry['client'], 0) + 1
+        return counts
+
+    @staticmethod
+    def _pick(clients, running, served):
+        """Client to admit next: fewest running, then least recently served, then arrival order"""
+        return min(clients, key=lambda client: (running.get(client, 0), served.get(client, -1)))
+
+    def _dispatch(self):
+        """Admit waiting entries while there is capacity, fairest client first"""
+        running = self._running_counts()
+        while len(self._running) < self.max_concurrent and self._clients:
+            client = self._pick(self._clients, running, self._served)
+            queue = self._queues[client]
+            entry = queue.popleft()
+            if not queue:
+                del self._queues[client]
+                self._clients.remove(client)
+            if entry['turn'].done():
+                continue
+            entry['started_at'] = time.time()
+            self._running[id(entry)] = entry
+            self._admitted += 1
+            self._served[client] = self._admitted
+            running[client] = running.get(client, 0) + 1
+            entry['turn'].set_result(True)
+        # Forget clients with nothing running or waiting
+        for client in list(self._served):
+            if client not in self._queues and client not in running:
+                del self._served[client]
+        self._notify_positions()
+
+    def _waiting_order(self):
+        """Waiting entries in the order _dispatch will admit them (assuming no running analysis ends first)"""
+        queues = {client: list(self._queues[client]) for client in self._clients}
+        clients = list(self._clients)
+        running = self._running_counts()
+        served = dict(self._served)
+        order = []
+        stamp = self._admitted
+        while clients:
+            client = self._pick(clients, running, served)
+            order.append(queues[client].pop(0))
+            if not queues[client]:
+                clients.remove(client)
+            stamp += 1
+            served[client] = stamp
+            running[client] = running.get(client, 0) + 1
+        return order
+
+    def _notify_positions(self):
+        order = self._waiting_order()
+        for position, entry in enumerate(order, start=1):
+            if entry['position'] != position:
+                entry['position'] = position
+                if entry['on_queued']:
+                    try:
+                        entry['on_queued'](position, len(order))
+                    except Exception as e:
+                        print(f"Queue position callback failed: {e}")
+
+    def snapshot(self):
+        """Scheduler state for the status endpoint"""
+        now = time.time()
+        order = self._waiting_order()
+        return {
+            'max_concurrent': self.max_concurrent,
+            'running': [
+                {'job_id': entry['job_id'], 'running_for': round(now - entry['started_at'], 1)}
+                for entry in self._running.values()
+            ],
+            'queued': [
+                {'job_id': entry['job_id'], 'position': position, 'waiting_for': round(now - entry['queued_at'], 1)}
+                for position, entry in enumerate(order, start=1)
+            ],
+            'clients_waiting': len(self._clients),
+            'admitted_total': self._admitted,
+            'cancelled_total': self._cancelled,
+        }
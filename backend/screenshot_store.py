@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow missing: screenshots are stored as captured, without thumbnails
+    Image = None
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'screenshots')
+
+SCREENSHOT_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ScreenshotStore:
+    """
+    Content-addressed screenshot store on local disk.
+
+    Each screenshot is saved once under the SHA-256 of its captured bytes,
+    recompressed to JPEG at `quality` (capped at `max_width`), with a
+    downscaled thumbnail next to it. Results reference screenshots by that
+    hash and clients fetch them lazily from GET /api/screenshots/<hash>.
+    """
+
+    def __init__(self, root=None, quality=None, max_width=None, thumb_width=None):
+        self.root = root or os.getenv('SCREENSHOT_STORE_DIR', DEFAULT_STORE_DIR)
+        self.quality = quality or int(os.getenv('SCREENSHOT_QUALITY', '70'))
+        self.max_width = max_width or int(os.getenv('SCREENSHOT_MAX_WIDTH', '1280'))
+        self.thumb_width = thumb_width or int(os.getenv('SCREENSHOT_THUMB_WIDTH', '360'))
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, screenshot_id, thumbnail=False):
+        """File path for a stored screenshot, or None if the id is malformed"""
+        if not SCREENSHOT_ID_RE.match(screenshot_id or ''):
+            return None
+        suffix = '_thumb' if thumbnail else ''
+        return os.path.join(self.root, screenshot_id[:2], f'{screenshot_id}{suffix}.jpg')
+
+    def put(self, data):
+        """Store raw image bytes, returns the screenshot id (hash). Existing ids are not rewritten."""
+        return self._put(data)[0]
+
+    def put_file(self, file_path):
+        return self.put(self._read(file_path))
+
+    def _put(self, data):
+        """(screenshot id, bytes written), nothing is written for an id already stored"""
+        screenshot_id = hashlib.sha256(data).hexdigest()
+        full_path = self.path(screenshot_id)
+        if os.path.exists(full_path):
+            return screenshot_id, 0
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        full, thumb = self._encode(data)
+        self._write(self.path(screenshot_id, thumbnail=True), thumb)
+        # The full image is written last, its presence marks the entry complete
+        self._write(full_path, full)
+        return screenshot_id, len(full) + len(thumb)
+
+    def export(self, screenshot_id):
+        """(full, thumbnail) JPEG bytes of a stored screenshot, or None if it is not stored here"""
+        full_path = self.path(screenshot_id)
+        if full_path is None or not os.path.exists(full_path):
+            return None
+        thumb_path = self.path(screenshot_id, thumbnail=True)
+        full = self._read(full_path)
+        return full, self._read(thumb_path) if os.path.exists(thumb_path) else full
+
+    def put_encoded(self, screenshot_id, full, thumb):
+        """Store an already encoded screenshot under its id (as exported by another host's store)"""
+        full_path = self.path(screenshot_id)
+        if full_path is None or os.path.exists(full_path):
+            return
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        self._write(self.path(screenshot_id, thumbnail=True), thumb)
+        self._write(full_path, full)
+
+    def _read(self, file_path):
+        with open(file_path, 'rb') as f:
+            return f.read()
+
+    def _store_one(self, source):
+        """Worker side of put_many: read, encode and write one screenshot"""
+        started = time.perf_counter()
+        data = self._read(source) if isinstance(source, str) else source
+        screenshot_id, written = self._put(data)
+        return screenshot_id, len(data), written, time.perf_counter() - started
+
+    async def put_many(self, sources):
+        """
+        Store screenshots given as file paths or image bytes without blocking the event loop.
+
+        Reading, decoding, resizing and encoding run on the shared encode pool, so at
+        most SCREENSHOT_ENCODE_WORKERS images are decoded at once, whatever the number
+        of pages in flight. Returns (ids in order, {'count', 'captured_bytes',
+        'stored_bytes', 'encode_seconds'}).
+        """
+        loop = asyncio.get_running_loop()
+        pool = get_encode_pool()
+        stored = await asyncio.gather(*(loop.run_in_executor(pool, self._store_one, source) for source in sources))
+        stats = {
+            'count': len(stored),
+            'captured_bytes': sum(item[1] for item in stored),
+            'stored_bytes': sum(item[2] for item in stored),
+            'encode_seconds': sum(item[3] for item in stored),
+        }
+        return [item[0] for item in stored], stats
+
+    def _encode(self, data):
+        """Recompressed full image and thumbnail as JPEG bytes"""
+        if Image is None:
+            return data, data
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert('RGB')
+            full = self._resized(image, self.max_width)
+            # Downscale the already reduced image, not the full capture
+            thumb = self._resized(full, self.thumb_width)
+        return self._jpeg(full), self._jpeg(thumb)
+
+    def _resized(self, image, width):
+        if image.width <= width:
+            return image
+        height = round(image.height * width / image.width)
+        return image.resize((width, height), Image.LANCZOS)
+
+    def _jpeg(self, image):
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=self.quality, optimize=True)
+        return buffer.getvalue()
+
+    def _write(self, path, data):
+        # Per-thread temp file: two workers may store the same screenshot at once
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+_store = None
+_store_lock = threading.Lock()
+_encode_pool = None
+
+
+def get_encode_pool():
+    """Process-wide thread pool for screenshot encoding (Pillow releases the GIL while it works)"""
+    global _encode_pool
+    with _store_lock:
+        if _encode_pool is None:
+            workers = int(os.getenv('SCREENSHOT_ENCODE_WORKERS', '2'))
+            _encode_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='screenshot-encode')
+        return _encode_pool
+
+
+def get_screenshot_store():
+    """Process-wide ScreenshotStore, created on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ScreenshotStore()
+        return _store
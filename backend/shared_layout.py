@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import os
+import re
+from html.parser import HTMLParser
+
+from utils.http_client import fetch_page
+
+# Page chrome regions, by tag and by the equivalent ARIA landmark role
+REGION_TAGS = {'header': 'header', 'nav': 'nav', 'footer': 'footer'}
+REGION_ROLES = {'banner': 'header', 'navigation': 'nav', 'contentinfo': 'footer'}
+# The site nav is the first nav outside these: navs inside content are local (table of contents, related links)
+CONTENT_TAGS = {'main', 'article', 'aside', 'footer'}
+CONTENT_ROLES = {'main', 'article', 'complementary', 'contentinfo'}
+# Per-page navigation: left out of every region so it does not split the fingerprint
+PER_PAGE_NAV = re.compile(r'breadcrumb|pagination|pager', re.IGNORECASE)
+# Content that changes between pages without changing the layout (counters, years, prices)
+DIGITS = re.compile(r'\d+')
+
+
+class RegionParser(HTMLParser):
+    """
+    Collects the tag structure and text of the page's header, site nav and footer
+    (a nav inside the header counts for both).
+
+    Only the first nav outside main/article/aside/footer is the site nav.
+    Breadcrumb and pagination navs are skipped entirely, wherever they are.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.regions = {}
+        self._open = []      # [region, tag, open elements with that tag] for each region being collected
+        self._content = []   # [tag, open elements with that tag] of the content containers we are in
+        self._skip = None    # [tag, open elements with that tag] of the per-page nav being skipped
+        self._nav_seen = False
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip:
+            if tag == self._skip[0]:
+                self._skip[1] += 1
+            return
+        attrs = dict(attrs)
+        role = attrs.get('role') or ''
+        region = REGION_TAGS.get(tag) or REGION_ROLES.get(role)
+        if region == 'nav':
+            label = ' '.join(attrs.get(name) or '' for name in ('aria-label', 'class', 'id'))
+            if PER_PAGE_NAV.search(label):
+                self._skip = [tag, 1]
+                return
+        for entry in self._open:
+            if tag == entry[1]:
+                entry[2] += 1
+            self.regions[entry[0]].append(f'<{tag}>')
+        if region == 'nav' and (self._nav_seen or self._content):
+            region = None
+        if region and all(entry[0] != region for entry in self._open):
+            if region == 'nav':
+                self._nav_seen = True
+            self._open.append([region, tag, 1])
+            self.regions.setdefault(region, []).append(f'<{tag}>')
+        if tag in CONTENT_TAGS or role in CONTENT_ROLES:
+            self._content.append([tag, 1])
+        else:
+            for entry in self._content:
+                if tag == entry[0]:
+                    entry[1] += 1
+
+    def handle_endtag(self, tag):
+        if self._skip:
+            if tag == self._skip[0]:
+                self._skip[1] -= 1
+                if not self._skip[1]:
+                    self._skip = None
+            return
+        for entry in list(self._open):
+            if tag == entry[1]:
+                entry[2] -= 1
+                if not entry[2]:
+                    self._open.remove(entry)
+        for entry in list(self._content):
+            if tag == entry[0]:
+                entry[1] -= 1
+                if not entry[1]:
+                    self._content.remove(entry)
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        text = ' '.join(DIGITS.sub('#', data).split())
+        if text:
+            for entry in self._open:
+                self.regions[entry[0]].append(text)
+
+
+def layout_regions(html):
+    """{region: short hash} of the header, nav and footer found in html"""
+    parser = RegionParser()
+    parser.feed(html)
+    parser.close()
+    return {
+        region: hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:12]
+        for region, parts in parser.regions.items()
+    }
+
+
+def region_findings(validation, region):
+    """cta_thoughts/theme_thoughts of a validation labeled with region"""
+    findings = {'cta_thoughts': [], 'theme_thoughts': []}
+    for value in (validation or {}).get('values', []):
+        for kind in findings:
+            findings[kind].extend(thought for thought in value.get(kind, []) if thought.get('region') == region)
+    return findings
+
+
+class SharedLayout:
+    """
+    Site-level dedup of the header, nav and footer shared by the crawled pages.
+
+    Each page's chrome regions are fingerprinted from its HTML. The first page
+    with a given region fingerprint owns it: its audit covers the region and
+    publishes the findings labeled with it. Later pages with the same
+    fingerprint tell their audit to skip the region and get the owner's
+    findings merged into their result, marked shared.
+    """
+
+    def __init__(self, wait_timeout=None):
+        self.wait_timeout = wait_timeout or float(os.getenv('SHARED_LAYOUT_WAIT', '300'))
+        self._owners = {}    # (region, fingerprint) -> owning url
+        self._findings = {}  # (region, fingerprint) -> future of the owner's findings (None if it failed)
+
+    async def fingerprint(self, url):
+        """Region fingerprints of url, {} when the page cannot be fetched"""
+        try:
+            page = await fetch_page(url)
+        except Exception as e:
+            print(f"Layout fingerprint failed for {url}: {e}")
+            return {}
+        if page['status'] >= 400:
+            return {}
+        return layout_regions(page['text'])
+
+    def claim(self, url, regions):
+        """
+        Split a page's regions into (owned, shared), both {region: key}.
+
+        Owned regions are new to the crawl and audited on this page; shared
+        ones were claimed by an earlier page.
+        """
+        owned, shared = {}, {}
+        for region, fingerprint in regions.items():
+            key = (region, fingerprint)
+            if key in self._owners:
+                shared[region] = key
+            else:
+                self._owners[key] = url
+                self._findings[key] = asyncio.get_running_loop().create_future()
+                owned[region] = key
+        return owned, shared
+
+    def publish(self, owned, validation):
+        """Hand the owned regions' findings to the pages waiting on them"""
+        for region, key in owned.items():
+            future = self._findings[key]
+            if not future.done():
+                future.set_result(region_findings(validation, region))
+
+    def release(self, owned):
+        """Unblock waiters on regions this page did not publish (stopped or failed audit)"""
+        for key in owned.values():
+            future = self._findings[key]
+            if not future.done():
+                future.set_result(None)
+
+    async def merge(self, shared, validation):
+        """validation with the owners' findings for the skipped regions added, marked shared"""
+        if not shared or not validation or not validation.get('values'):
+            return validation
+        values = [dict(value) for value in validation['values']]
+        sources = {}
+        for region, key in shared.items():
+            try:
+                findings = await asyncio.wait_for(asyncio.shield(self._findings[key]), self.wait_timeout)
+            except asyncio.TimeoutError:
+                findings = None
+            if findings is None:
+                print(f"No shared findings for the {region} (audit of {self._owners[key]} did not finish)")
+                continue
+            sources[region] = self._owners[key]
+            for kind, thoughts in findings.items():
+                values[0][kind] = list(values[0].get(kind, [])) + [
+                    {**thought, 'shared': True, 'audited_on': self._owners[key]} for thought in thoughts
+                ]
+        return {**validation, 'values': values, 'shared_layout': sources}
+
+
+def layout_instructions(shared_regions):
+    """Prompt section telling the auditor to skip regions already audited on another page"""
+    if not shared_regions:
+        return ""
+    regions = ', '.join(sorted(shared_regions))
+    return f"""
+    --- SHARED LAYOUT (already audited) ---
+    This page's {regions} are shared with the rest of the site and were audited on another page.
+    Do NOT report issues or count CTAs in the {regions}; audit only the content unique to this page.
+    """
+
+
+def layout_cache_config(audit_config, shared_regions):
+    """audit_config for cache keys: a page audited without its shared regions is a different result"""
+    if not shared_regions:
+        return audit_config
+    return {**(audit_config or {}), 'shared_layout': sorted(shared_regions)}
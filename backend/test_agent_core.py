@@ -0,0 +1,75 @@
+import pytest
+
+from agent_core import cached_tier_satisfies, escalation_reason
+
+THOUGHT = {'element_name': 'Hero', 'issues': 'Low contrast', 'recommendations': 'Darken the button', 'viewport_number': 1}
+
+
+def prescreen(confidence=0.9, cta_score=90, theme_score=40, cta_thoughts=1, theme_thoughts=1):
+    value = {
+        'ctas_found': 2,
+        'cta_score': cta_score,
+        'cta_thoughts': [THOUGHT] * cta_thoughts,
+        'theme_score': theme_score,
+        'theme_thoughts': [THOUGHT] * theme_thoughts,
+    }
+    return {'values': [value], 'confidence': confidence}
+
+
+@pytest.fixture(autouse=True)
+def thresholds(monkeypatch):
+    monkeypatch.setenv('VALIDATION_MIN_CONFIDENCE', '0.7')
+    monkeypatch.setenv('VALIDATION_MAX_FINDINGS', '8')
+    monkeypatch.setenv('VALIDATION_SCORE_THRESHOLD', '70')
+    monkeypatch.setenv('VALIDATION_SCORE_MARGIN', '10')
+
+
+@pytest.mark.parametrize('result, reason', [
+    # Confident, clear-cut flash-lite result stands
+    (prescreen(), None),
+    (prescreen(confidence=0.7, cta_score=81, theme_score=59), None),
+    # No result
+    (None, 'no result'),
+    ({}, 'no result'),
+    ({'values': [], 'confidence': 0.9}, 'no result'),
+    # Low or missing confidence
+    (prescreen(confidence=0.5), 'low confidence (0.5)'),
+    (prescreen(confidence=None), 'low confidence (None)'),
+    (prescreen(confidence='high'), 'low confidence (high)'),
+    # Too many findings
+    (prescreen(cta_thoughts=5, theme_thoughts=4), '9 findings'),
+    (prescreen(cta_thoughts=4, theme_thoughts=4), None),
+    # A clean page with no findings stays on flash-lite
+    (prescreen(cta_thoughts=0, theme_thoughts=0), None),
+    ({'values': [{'cta_score': 95, 'theme_score': 20}], 'confidence': 0.9}, None),
+    # Score near the threshold
+    (prescreen(cta_score=75), 'cta_score 75 near the 70 threshold'),
+    (prescreen(theme_score=60), 'theme_score 60 near the 70 threshold'),
+    (prescreen(cta_score=80.5), None),
+])
+def test_escalation_reason(result, reason):
+    assert escalation_reason(result) == reason
+
+
+def test_thresholds_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv('VALIDATION_MIN_CONFIDENCE', '0.95')
+    assert escalation_reason(prescreen(confidence=0.9)) == 'low confidence (0.9)'
+    monkeypatch.setenv('VALIDATION_MIN_CONFIDENCE', '0.5')
+    monkeypatch.setenv('VALIDATION_SCORE_MARGIN', '25')
+    assert escalation_reason(prescreen()) == 'cta_score 90 near the 70 threshold'
+
+
+@pytest.mark.parametrize('mode, tier, reusable', [
+    ('pro', 'pro', True),
+    ('pro', None, True),
+    ('pro', 'flash-lite', False),
+    ('pro', 'batch', False),
+    ('tiered', 'pro', True),
+    ('tiered', 'flash-lite', True),
+    ('tiered', 'batch', False),
+    ('batch', 'pro', True),
+    ('batch', 'flash-lite', True),
+    ('batch', 'batch', True),
+])
+def test_cached_tier_satisfies(mode, tier, reusable):
+    assert cached_tier_satisfies(mode, tier) is reusable
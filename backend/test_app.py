@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import app as app_module
+import log_stream
+from app import app, parse_analysis_request, parse_flag, socketio
+from jobs import JobRunner, JobStore
+from scheduler import FairScheduler
+from utils.event_loop import BackgroundLoop
+
+FLAGS = ('single_pass', 'bypass_cache', 'incremental', 'sitemap', 'shared_layout')
+
+
+@pytest.mark.parametrize('value, parsed', [
+    (None, None), (True, True), (False, False),
+    ('yes', True), ('no', False), ('true', True), ('false', False), (' TRUE ', True), ('No', False),
+])
+def test_parse_flag(value, parsed):
+    assert parse_flag(value) is parsed
+
+
+@pytest.mark.parametrize('value', ['off', '0', '', 'maybe', 0, 1, [], {}, 1.0])
+def test_parse_flag_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        parse_flag(value)
+
+
+@pytest.mark.parametrize('flag', FLAGS)
+def test_string_false_does_not_enable_a_flag(flag):
+    params, error = parse_analysis_request({'url': 'https://example.com', flag: 'false'})
+    assert error is None
+    assert params[flag] is False
+
+
+@pytest.mark.parametrize('flag', FLAGS)
+def test_invalid_flag_is_rejected(flag):
+    params, error = parse_analysis_request({'url': 'https://example.com', flag: 'sometimes'})
+    assert params is None
+    assert error.startswith(flag)
+
+
+def test_absent_flags_fall_back_to_env_defaults():
+    params, error = parse_analysis_request({'url': 'https://example.com'})
+    assert error is None
+    assert params['sitemap'] is None and params['incremental'] is None
+    assert params['bypass_cache'] is False
+
+
+@pytest.mark.parametrize('body', [
+    {'url': 'https://example.com', 'sitemap': 'nope'},
+    {'url': 'https://example.com', 'incremental': 1},
+    {'url': 'https://example.com', 'async': 'later'},
+])
+def test_api_returns_400_for_bad_flags(body):
+    response = app.test_client().post('/api/analyze', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.02)
+
+
+def test_cancelling_a_queued_job_releases_its_session(tmp_path, monkeypatch):
+    loop = BackgroundLoop(name='test-app')
+    runner = JobRunner(JobStore(str(tmp_path / 'jobs.sqlite3')), event_loop=loop, scheduler=FairScheduler(max_concurrent=1, loop=loop.loop))
+    release = threading.Event()
+
+    async def run_analysis(params, stop_flag=None, **kwargs):
+        # Holds the only slot until the test lets it go
+        while not release.is_set() and not stop_flag.is_set():
+            await asyncio.sleep(0.02)
+        return {'total_pages_analyzed': 0, 'results': []}
+
+    monkeypatch.setattr(app_module, 'get_job_runner', lambda: runner)
+    monkeypatch.setattr(app_module, 'get_queue_dispatcher', lambda: None)
+    monkeypatch.setattr(app_module, 'run_analysis', run_analysis)
+    buffers_before = log_stream.stats['buffers_open']
+    running = socketio.test_client(app)
+    queued = socketio.test_client(app)
+    try:
+        running.emit('start_analysis', {'url': 'https://example.com'})
+        wait_for(lambda: runner.scheduler._running)
+        queued.emit('start_analysis', {'url': 'https://example.com'})
+        wait_for(lambda: any(packet['name'] == 'queued' for packet in queued.get_received()))
+        queued_sid = next(sid for sid in app_module.session_jobs if sid not in runner.scheduler._running_counts())
+        assert log_stream.stats['buffers_open'] == buffers_before + 2
+
+        queued.emit('stop_analysis')
+        wait_for(lambda: log_stream.stats['buffers_open'] == buffers_before + 1)
+        assert queued_sid not in app_module.active_sessions
+        assert queued_sid not in app_module.session_jobs
+
+        release.set()
+        wait_for(lambda: log_stream.stats['buffers_open'] == buffers_before)
+    finally:
+        release.set()
+        running.disconnect()
+        queued.disconnect()
+        loop.stop()
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import bfs_crawler
+from utils.http_client import close_http_session
+from utils.page_snapshots import PageSnapshots
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path):
+    """A one-page site served from tmp_path/site, yields (directory, base url)"""
+    root = tmp_path / 'site'
+    root.mkdir()
+    (root / 'index.html').write_text('<html><body><h1>Welcome</h1><a href="/about.html">About</a></body></html>')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=str(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield root, f'http://127.0.0.1:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def agents(monkeypatch, tmp_path):
+    """Offline crawl: counts agent calls instead of running browsers, snapshots in tmp_path"""
+    for name, value in (('BROWSER_POOL_SIZE', '0'), ('VALIDATION_CACHE', 'no'), ('SHARED_LAYOUT', 'no'),
+                        ('SITEMAP_DISCOVERY', 'no'), ('TEMPLATE_CLUSTERING', 'no'), ('SINGLE_PASS_AUDIT', 'no')):
+        monkeypatch.setenv(name, value)
+    snapshots = PageSnapshots(str(tmp_path / 'snapshots.sqlite3'))
+    monkeypatch.setattr(bfs_crawler, 'get_page_snapshots', lambda: snapshots)
+    calls = []
+
+    async def extract_redirects(url, **kwargs):
+        calls.append(('extract', url))
+        return {'posts': []}
+
+    async def validate_page(url, audit_config=None, **kwargs):
+        calls.append(('validate', url))
+        return {'values': [{'score': 80, 'cta_thoughts': [], 'theme_thoughts': []}]}, {1: 'shot-1'}
+
+    monkeypatch.setattr(bfs_crawler, 'extract_redirects', extract_redirects)
+    monkeypatch.setattr(bfs_crawler, 'validate_page', validate_page)
+    return calls
+
+
+def crawl(url):
+    async def run():
+        try:
+            return await bfs_crawler.bfs_crawler(url, max_pages=1, incremental=True, single_pass=False)
+        finally:
+            await close_http_session()
+    return asyncio.run(run())
+
+
+def test_unchanged_page_is_reused(site, agents):
+    _, base_url = site
+    first = crawl(base_url + '/')
+    assert first['results'][0]['incremental'] == 'reaudited'
+    assert len(agents) == 2
+
+    second = crawl(base_url + '/')
+    result = second['results'][0]
+    assert result['incremental'] == 'reused'
+    assert result['validation'] == first['results'][0]['validation']
+    assert result['screenshots'] == {1: 'shot-1'}
+    # No agent ran for the reused page
+    assert len(agents) == 2
+
+
+def test_changed_page_is_reaudited(site, agents):
+    root, base_url = site
+    crawl(base_url + '/')
+    (root / 'index.html').write_text('<html><body><h1>New offer</h1></body></html>')
+    # Last-Modified has one-second resolution
+    later = time.time() + 5
+    os.utime(root / 'index.html', (later, later))
+
+    second = crawl(base_url + '/')
+    assert second['results'][0]['incremental'] == 'reaudited'
+    assert [kind for kind, _ in agents] == ['extract', 'validate', 'extract', 'validate']
@@ -0,0 +1,86 @@
+import asyncio
+from types import SimpleNamespace
+
+from browser_pool import BrowserPool
+
+
+class FakeSession:
+    """Just the BrowserSession calls the pool makes, recorded"""
+
+    def __init__(self, tabs, fail_on=None):
+        self.tabs = tabs
+        self.agent_focus_target_id = tabs[0].target_id
+        self.calls = []
+        self.fail_on = fail_on
+        self.cdp_client = SimpleNamespace(send=SimpleNamespace(Storage=SimpleNamespace(clearDataForOrigin=self._clear_origin)))
+
+    async def _record(self, *call):
+        if call[0] == self.fail_on:
+            raise RuntimeError(f'{call[0]} failed')
+        self.calls.append(call)
+
+    async def _clear_origin(self, params):
+        await self._record('clear_origin', params['origin'])
+
+    async def start(self):
+        pass
+
+    async def get_tabs(self):
+        return self.tabs
+
+    async def close_page(self, target_id):
+        await self._record('close', target_id)
+
+    async def clear_cookies(self):
+        await self._record('clear_cookies')
+
+    async def navigate_to(self, url):
+        await self._record('navigate', url)
+
+    async def get_current_page_url(self):
+        return 'about:blank'
+
+    async def kill(self):
+        self.calls.append(('kill',))
+
+
+def tab(target_id, url):
+    return SimpleNamespace(target_id=target_id, url=url)
+
+
+def checkout(pool):
+    async def run():
+        async with pool.session() as browser_session:
+            return browser_session
+    return asyncio.run(run())
+
+
+def test_release_clears_tabs_cookies_and_storage():
+    session = FakeSession([tab('main', 'https://shop.example/cart'), tab('popup', 'https://login.example/sso')])
+    pool = BrowserPool(size=1, session_factory=lambda: session)
+    checkout(pool)
+
+    assert ('close', 'popup') in session.calls
+    assert ('close', 'main') not in session.calls
+    assert ('clear_cookies',) in session.calls
+    assert {call[1] for call in session.calls if call[0] == 'clear_origin'} == {'https://shop.example', 'https://login.example'}
+    assert session.calls[-1] == ('navigate', 'about:blank')
+    assert pool.stats()['idle'] == 1
+
+
+def test_failed_reset_replaces_the_session():
+    sessions = [FakeSession([tab('main', 'https://shop.example/')], fail_on='clear_cookies'), FakeSession([tab('main', 'about:blank')])]
+    pool = BrowserPool(size=1, session_factory=lambda: sessions.pop(0))
+
+    async def run():
+        async with pool.session() as first:
+            pass
+        async with pool.session() as second:
+            pass
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is not second
+    assert ('kill',) in first.calls
+    assert pool.stats()['discarded'] == 1
+    assert pool.stats()['created'] == 2
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.server import serve_fixture
+from discovery import discover_site
+from utils.http_client import close_http_session
+
+
+def discover(url):
+    async def run():
+        try:
+            return await discover_site(url)
+        finally:
+            await close_http_session()
+    return asyncio.run(run())
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_dir(directory):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=str(directory)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def test_robots_sitemap_lines_and_index():
+    with serve_fixture('shop') as base_url:
+        discovery = discover(base_url + '/')
+    # robots.txt points at a sitemap index with two urlsets
+    assert discovery.sitemaps == [f'{base_url}/sitemap.xml', f'{base_url}/sitemap-pages.xml', f'{base_url}/sitemap-products.xml']
+    urls = [entry['url'] for entry in discovery.entries]
+    assert f'{base_url}/products/shoes.html' in urls
+    assert f'{base_url}/blog/post-1.html' in urls
+    assert not discovery.allowed(f'{base_url}/newsletter.html')
+    assert discovery.allowed(f'{base_url}/about.html')
+
+
+def test_sitemap_xml_without_robots(tmp_path):
+    server, base_url = serve_dir(tmp_path)
+    try:
+        (tmp_path / 'sitemap.xml').write_text(
+            '<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f'<url><loc>{base_url}/a.html</loc><priority>0.8</priority></url>'
+            f'<url><loc>https://elsewhere.example/b.html</loc></url>'
+            '</urlset>'
+        )
+        discovery = discover(base_url + '/')
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert discovery.robots is None
+    assert discovery.sitemaps == [f'{base_url}/sitemap.xml']
+    assert discovery.entries[0] == {'url': f'{base_url}/a.html', 'lastmod': None, 'priority': 0.8}
+
+
+def test_no_sitemap_falls_back_to_link_extraction():
+    with serve_fixture('landing') as base_url:
+        discovery = discover(base_url + '/')
+    # Nothing to seed: the crawler keeps discovering pages by link extraction
+    assert discovery.entries == []
+    assert discovery.sitemaps == []
+    assert discovery.allowed(f'{base_url}/pricing.html')
+
+
+def test_discovery_is_opt_in(monkeypatch):
+    from bfs_crawler import resolve_sitemap
+    monkeypatch.delenv('SITEMAP_DISCOVERY', raising=False)
+    assert resolve_sitemap() is False
+    assert resolve_sitemap(True) is True
+    monkeypatch.setenv('SITEMAP_DISCOVERY', 'yes')
+    assert resolve_sitemap() is True
@@ -0,0 +1,24 @@
+from bfs_crawler import normalize_url
+from frontier import Frontier
+
+
+def test_dedups_by_canonical_key_but_keeps_discovered_url():
+    frontier = Frontier()
+    assert frontier.push('https://www.example.com/search?q&b=1')
+    assert not frontier.push('https://example.com/search/?b=1&q=')
+    assert not frontier.push('HTTPS://EXAMPLE.com:443/search?q=&b=1&utm_source=mail')
+    assert len(frontier) == 1
+    # Fetched as the site linked it, not as its canonical form
+    assert frontier.pop() == 'https://www.example.com/search?q&b=1'
+    assert 'https://example.com/search?b=1&q=' in frontier
+
+
+def test_shallow_pages_first():
+    frontier = Frontier()
+    frontier.push('https://example.com/a/b/c')
+    frontier.push('https://example.com/a')
+    assert frontier.pop() == 'https://example.com/a'
+
+
+def test_normalize_url_only_drops_the_fragment():
+    assert normalize_url(' https://Example.com/a/?q#top ') == 'https://Example.com/a/?q'
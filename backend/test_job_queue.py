@@ -0,0 +1,199 @@
+import asyncio
+import time
+
+import pytest
+
+from job_queue import ANY_WORKER, QueueDispatcher, QueueWorker, SqliteBroker, create_broker, job_queue_name
+from utils.event_loop import BackgroundLoop
+
+
+class FakeStore:
+    """Records what the dispatcher writes to the job store"""
+
+    def __init__(self):
+        self.calls = []
+
+    def mark_running(self, job_id):
+        self.calls.append(('running', job_id))
+
+    def update_progress(self, job_id, pages_done, pages_total):
+        self.calls.append(('progress', job_id, pages_done))
+
+    def finish(self, job_id, status, result=None, error=None):
+        self.calls.append(('finish', job_id, status))
+
+
+@pytest.fixture
+def broker(tmp_path):
+    return SqliteBroker(str(tmp_path / 'queue.sqlite3'), poll_interval=0.01)
+
+
+def drain(broker, name):
+    events = []
+    while True:
+        event = broker.pop([name], timeout=0)
+        if event is None:
+            return events
+        events.append(event)
+
+
+def test_claim_takes_own_queue_first_and_ack_releases(broker):
+    broker.push(job_queue_name(ANY_WORKER), {'job_id': 'shared'})
+    broker.push(job_queue_name('w1'), {'job_id': 'own'})
+
+    names = [job_queue_name('w1'), job_queue_name(ANY_WORKER)]
+    assert broker.claim(names, 'w1', timeout=0)['job_id'] == 'own'
+    assert broker.claim(names, 'w1', timeout=0)['job_id'] == 'shared'
+    assert broker.claim(names, 'w1', timeout=0) is None
+    assert broker.job_ids(job_queue_name(ANY_WORKER)) == []
+
+    broker.ack('w1', 'own')
+    assert [job['job_id'] for job in broker.release_claims('w1')] == ['shared']
+    assert broker.release_claims('w1') == []
+
+
+def test_create_broker(tmp_path):
+    assert create_broker('') is None
+    assert isinstance(create_broker(f'sqlite://{tmp_path}/queue.sqlite3'), SqliteBroker)
+    with pytest.raises(ValueError):
+        create_broker('amqp://localhost')
+
+
+def dead_worker(broker, worker_id):
+    broker.set_worker(worker_id, {'load': 1, 'capacity': 1, 'seen': time.time() - 3600})
+
+
+def test_stale_claims_are_reclaimed(broker):
+    dispatcher = QueueDispatcher(broker, FakeStore())
+    dispatcher.submit('job-1', {'url': 'https://example.com'}, sid='sid-1')
+    assert broker.claim([job_queue_name(ANY_WORKER)], 'w1', timeout=0)['job_id'] == 'job-1'
+    dispatcher._handle({'type': 'running', 'job_id': 'job-1', 'worker': 'w1'})
+    dead_worker(broker, 'w1')
+
+    dispatcher._reap_dead_workers()
+    assert broker.workers() == {}
+    requeued = broker.job_ids(job_queue_name(ANY_WORKER))
+    assert requeued == ['job-1']
+    events = drain(broker, dispatcher.events_queue)
+    assert [event['type'] for event in events] == ['requeued']
+    for event in events:
+        dispatcher._handle(event)
+    assert dispatcher._jobs['job-1']['worker'] == ANY_WORKER
+
+    # A second worker crash under the same job fails it (JOB_MAX_ATTEMPTS = 2)
+    job = broker.claim([job_queue_name(ANY_WORKER)], 'w2', timeout=0)
+    assert job['attempt'] == 1
+    dead_worker(broker, 'w2')
+    dispatcher._reap_dead_workers()
+    events = drain(broker, dispatcher.events_queue)
+    assert [(event['type'], event.get('status')) for event in events] == [('finish', 'failed'), ('emit', None)]
+    assert broker.job_ids(job_queue_name(ANY_WORKER)) == []
+
+
+def test_queued_jobs_of_a_dead_worker_move_to_the_shared_queue(broker):
+    broker.set_worker('w1', {'load': 0, 'capacity': 1, 'seen': time.time()})
+    dispatcher = QueueDispatcher(broker, FakeStore())
+    dispatcher.submit('job-1', {})
+    assert broker.job_ids(job_queue_name('w1')) == ['job-1']
+    dead_worker(broker, 'w1')
+
+    dispatcher._reap_dead_workers()
+    assert broker.job_ids(job_queue_name(ANY_WORKER)) == ['job-1']
+    assert broker.job_ids(job_queue_name('w1')) == []
+
+
+def test_queue_positions_are_sent_and_updated(broker):
+    frames = []
+    broker.set_worker('w1', {'load': 1, 'capacity': 1, 'seen': time.time()})
+    dispatcher = QueueDispatcher(broker, FakeStore(), deliver=lambda sid, event, payload: frames.append((sid, event, payload)))
+    for n in range(3):
+        dispatcher.submit(f'job-{n}', {}, sid=f'sid-{n}')
+
+    dispatcher.update_positions()
+    assert [(sid, payload['position'], payload['queue_length']) for sid, _, payload in frames] == [
+        ('sid-0', 1, 3), ('sid-1', 2, 3), ('sid-2', 3, 3),
+    ]
+    # Unchanged positions are not sent again
+    dispatcher.update_positions()
+    assert len(frames) == 3
+
+    broker.claim([job_queue_name('w1')], 'w1', timeout=0)
+    dispatcher._handle({'type': 'running', 'job_id': 'job-0', 'worker': 'w1'})
+    dispatcher.update_positions()
+    assert [(sid, payload['position'], payload['queue_length']) for sid, _, payload in frames[3:]] == [
+        ('sid-1', 1, 2), ('sid-2', 2, 2),
+    ]
+
+
+def test_worker_runs_publishes_and_acks(broker):
+    store = FakeStore()
+    dispatcher = QueueDispatcher(broker, store)
+    loop = BackgroundLoop(name='test-worker')
+
+    async def run_job(job, stop_flag, publish):
+        publish({'type': 'progress', 'pages_done': 1, 'pages_total': 1})
+        await asyncio.sleep(0)
+        publish({'type': 'finish', 'status': 'completed', 'result': {'total_pages_analyzed': 1}})
+
+    try:
+        worker = QueueWorker(broker, run_job, loop, capacity=1, heartbeat_interval=60)
+        dispatcher.submit('job-1', {}, wait=True)
+        future = worker.serve_once(timeout=1)
+        future.result(timeout=5)
+        worker._outbox.join()
+    finally:
+        loop.stop()
+
+    for event in drain(broker, dispatcher.events_queue):
+        dispatcher._handle(event)
+    assert store.calls == [('running', 'job-1'), ('progress', 'job-1', 1), ('finish', 'job-1', 'completed')]
+    assert dispatcher.wait('job-1', timeout=0)['status'] == 'completed'
+    assert broker.release_claims(worker.worker_id) == []
+    assert broker.workers()[worker.worker_id]['load'] == 0
+
+
+def test_worker_skips_jobs_stopped_before_the_claim(broker):
+    store = FakeStore()
+    dispatcher = QueueDispatcher(broker, store)
+    loop = BackgroundLoop(name='test-worker')
+    started = []
+
+    async def run_job(job, stop_flag, publish):
+        started.append(job['job_id'])
+
+    try:
+        worker = QueueWorker(broker, run_job, loop, capacity=1, heartbeat_interval=60)
+        dispatcher.submit('job-1', {}, wait=True)
+        dispatcher.stop('job-1')
+        worker.serve_once(timeout=1).result(timeout=5)
+        worker._outbox.join()
+    finally:
+        loop.stop()
+
+    for event in drain(broker, dispatcher.events_queue):
+        dispatcher._handle(event)
+    assert started == []
+    assert store.calls == [('finish', 'job-1', 'stopped')]
+    assert broker.release_claims(worker.worker_id) == []
+
+
+def test_worker_screenshots_reach_the_web_process_store(broker, tmp_path, monkeypatch):
+    import io
+
+    import worker
+    from screenshot_store import ScreenshotStore
+    Image = pytest.importorskip('PIL.Image')
+
+    worker_store = ScreenshotStore(str(tmp_path / 'worker-host'))
+    web_store = ScreenshotStore(str(tmp_path / 'web-host'))
+    image = io.BytesIO()
+    Image.new('RGB', (800, 600), 'white').save(image, format='PNG')
+    screenshot_id = worker_store.put(image.getvalue())
+    monkeypatch.setattr(worker, 'get_screenshot_store', lambda: worker_store)
+
+    items = worker.export_screenshots({'screenshots': {1: screenshot_id, 2: 'placeholder'}})
+    assert list(items) == [screenshot_id]
+
+    dispatcher = QueueDispatcher(broker, FakeStore(), screenshot_store=web_store)
+    dispatcher._handle({'type': 'screenshots', 'job_id': 'job-1', 'items': items})
+    assert web_store.export(screenshot_id) == worker_store.export(screenshot_id)
@@ -0,0 +1,81 @@
+import asyncio
+import sqlite3
+import time
+
+from jobs import JobRunner, JobStore
+from scheduler import FairScheduler
+from utils.event_loop import BackgroundLoop
+
+
+def test_restart_keeps_jobs_leased_by_a_live_process(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite3')
+    first = JobStore(path)
+    job_id = first.create({'url': 'https://example.com', 'max_pages': 3})
+    first.mark_running(job_id)
+
+    # Another process starting on the same database
+    second = JobStore(path)
+    assert second.owner != first.owner
+    assert second.get(job_id)['status'] == 'running'
+
+
+def test_restart_fails_jobs_whose_lease_expired(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite3')
+    store = JobStore(path)
+    running = store.create({'max_pages': 3})
+    store.mark_running(running)
+    done = store.create({'max_pages': 3})
+    store.finish(done, 'completed', result={'total_pages_analyzed': 3})
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE jobs SET lease_until = ?", (time.time() - 1,))
+
+    JobStore(path)
+    job = store.get(running)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'Server restarted before the job finished'
+    assert store.get(done)['status'] == 'completed'
+
+
+def test_renew_leases_only_touches_own_unfinished_jobs(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite3')
+    mine = JobStore(path, lease_seconds=60)
+    other = JobStore(path, lease_seconds=60)
+    own_job = mine.create({'max_pages': 1})
+    other_job = other.create({'max_pages': 1})
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE jobs SET lease_until = 0")
+
+    mine.renew_leases()
+    assert mine.recover() == 1
+    assert mine.get(own_job)['status'] == 'queued'
+    assert mine.get(other_job)['status'] == 'failed'
+
+
+def test_progress_never_moves_backwards(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    job_id = store.create({'max_pages': 5})
+    store.update_progress(job_id, 3, 5)
+    store.update_progress(job_id, 2, 5)
+    assert store.get(job_id)['pages_done'] == 3
+
+
+def test_runner_records_the_outcome(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    loop = BackgroundLoop(name='test-jobs')
+    try:
+        runner = JobRunner(store, event_loop=loop, scheduler=FairScheduler(max_concurrent=1, loop=loop.loop))
+        job_id = store.create({'max_pages': 2})
+        on_progress = runner.progress_callback(job_id)
+
+        async def task():
+            assert store.get(job_id)['status'] == 'running'
+            on_progress(1, 2)
+            await asyncio.sleep(0.05)
+            return {'total_pages_analyzed': 2}
+
+        assert runner.submit(job_id, task).result(timeout=5) == {'total_pages_analyzed': 2}
+        job = store.get(job_id, include_result=True)
+        assert job['status'] == 'completed'
+        assert job['result'] == {'total_pages_analyzed': 2}
+    finally:
+        loop.stop()
@@ -0,0 +1,30 @@
+import socket
+import urllib.request
+
+import pytest
+
+import metrics
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_serve_metrics_exports_the_process_registry():
+    if metrics.registry is None:
+        pytest.skip('prometheus_client is not installed')
+    port = free_port()
+    assert metrics.serve_metrics(port, addr='127.0.0.1')
+    metrics.record_page('audited')
+    with metrics.span('intent'):
+        pass
+
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+        body = response.read().decode()
+    assert 'qai_pages_total{outcome="audited"}' in body
+    assert 'qai_stage_duration_seconds_count{stage="intent"}' in body
+
+    # A second worker on the same port reports the clash instead of crashing
+    assert metrics.serve_metrics(port, addr='127.0.0.1') is False
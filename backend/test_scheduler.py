@@ -0,0 +1,83 @@
+import asyncio
+
+from scheduler import FairScheduler
+
+
+def run_jobs(max_concurrent, submissions):
+    """Submit (client, job_id) pairs in order, returns job ids in the order they started and the queued callbacks"""
+    started = []
+    queued = {}
+
+    async def main():
+        scheduler = FairScheduler(max_concurrent=max_concurrent)
+        release = asyncio.Event()
+
+        def job(job_id):
+            async def task():
+                started.append(job_id)
+                await release.wait()
+                await asyncio.sleep(0)
+            return task
+
+        def on_queued(job_id):
+            return lambda position, length: queued.setdefault(job_id, []).append((position, length))
+
+        tasks = []
+        for client, job_id in submissions:
+            tasks.append(asyncio.create_task(scheduler.run(client, job_id, job(job_id), on_queued=on_queued(job_id))))
+            await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    return started, queued
+
+
+def test_client_with_a_running_job_does_not_jump_the_queue():
+    started, _ = run_jobs(1, [('a', 'a1'), ('a', 'a2'), ('b', 'b1'), ('c', 'c1'), ('a', 'a3')])
+    assert started != ['a1', 'a2', 'b1', 'c1', 'a3']
+    assert started == ['a1', 'b1', 'c1', 'a2', 'a3']
+
+
+def test_free_slot_goes_to_the_client_with_fewest_running():
+    started, _ = run_jobs(2, [('a', 'a1'), ('b', 'b1'), ('a', 'a2'), ('a', 'a3'), ('c', 'c1'), ('b', 'b2')])
+    # a1 and b1 run; then c1 (nothing running) before anyone's second job
+    assert started[:3] == ['a1', 'b1', 'c1']
+    assert sorted(started) == ['a1', 'a2', 'a3', 'b1', 'b2', 'c1']
+
+
+def test_single_client_uses_every_slot():
+    started, queued = run_jobs(2, [('a', 'a1'), ('a', 'a2'), ('a', 'a3')])
+    assert started == ['a1', 'a2', 'a3']
+    assert 'a1' not in queued and 'a2' not in queued
+    assert queued['a3'][0] == (1, 1)
+
+
+def test_positions_follow_admission_order():
+    started, queued = run_jobs(1, [('a', 'a1'), ('a', 'a2'), ('b', 'b1')])
+    assert started == ['a1', 'b1', 'a2']
+    # b1 goes first in line when it arrives, a2 moves back, then up again once b1 starts
+    assert queued == {'a2': [(1, 1), (2, 2), (1, 1)], 'b1': [(1, 2)]}
+
+
+def test_cancel_drops_a_waiting_job():
+    async def main():
+        scheduler = FairScheduler(max_concurrent=1, loop=asyncio.get_running_loop())
+        release = asyncio.Event()
+
+        async def blocker():
+            await release.wait()
+            return 'done'
+
+        first = asyncio.create_task(scheduler.run('a', 'a1', blocker))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(scheduler.run('b', 'b1', blocker))
+        await asyncio.sleep(0)
+        scheduler.cancel('b1')
+        await asyncio.sleep(0.01)
+        release.set()
+        return await first, await second, scheduler.snapshot()
+
+    first, second, snapshot = asyncio.run(main())
+    assert (first, second) == ('done', None)
+    assert snapshot['cancelled_total'] == 1
@@ -0,0 +1,47 @@
+from shared_layout import layout_regions
+
+HEADER = """
+<header>
+  <a href="/">Acme</a>
+  <nav aria-label="Main"><a href="/shop">Shop</a><a href="/about">About</a></nav>
+  {crumbs}
+</header>
+"""
+FOOTER = '<footer><nav><a href="/privacy">Privacy</a></nav><p>© 2024 Acme</p></footer>'
+
+
+def page(crumbs='', body='', footer=FOOTER):
+    return f'<html><body>{HEADER.format(crumbs=crumbs)}<main>{body}</main>{footer}</body></html>'
+
+
+def test_breadcrumbs_do_not_change_the_header_or_nav():
+    shoes = layout_regions(page('<nav aria-label="Breadcrumb"><a href="/">Home</a> / <a href="/shop">Shop</a> / Shoes</nav>'))
+    hats = layout_regions(page('<nav class="site-breadcrumbs"><ol><li><a href="/">Home</a></li><li>Hats</li></ol></nav>'))
+    assert shoes['header'] == hats['header']
+    assert shoes['nav'] == hats['nav']
+    assert shoes == layout_regions(page())
+
+
+def test_pagination_is_skipped_in_every_region():
+    first = layout_regions(page(footer='<footer><nav id="pager"><a href="?p=2">2</a></nav><p>Acme</p></footer>'))
+    second = layout_regions(page(footer='<footer><nav role="navigation" class="Pagination"><a href="?p=1">1</a><a href="?p=3">3</a></nav><p>Acme</p></footer>'))
+    assert first['footer'] == second['footer']
+
+
+def test_only_the_first_top_level_nav_is_the_site_nav():
+    toc = '<article><nav><a href="#a">Section A</a><a href="#b">Section B</a></nav></article><aside><nav><a href="/x">Related</a></nav></aside>'
+    plain, with_toc = layout_regions(page()), layout_regions(page(body=toc))
+    assert plain['nav'] == with_toc['nav']
+    second_nav = layout_regions(page().replace('</main>', '</main><nav><a href="/extra">Extra</a></nav>'))
+    assert second_nav['nav'] == plain['nav']
+
+
+def test_a_changed_site_nav_changes_the_fingerprint():
+    changed = page().replace('About', 'Contact')
+    assert layout_regions(changed)['nav'] != layout_regions(page())['nav']
+    assert layout_regions(changed)['header'] != layout_regions(page())['header']
+
+
+def test_nav_role_outside_the_header_is_the_site_nav():
+    regions = layout_regions('<div role="navigation"><a href="/a">A</a></div><main><p>Hi</p></main>')
+    assert set(regions) == {'nav'}
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from bfs_crawler import resolve_template_clusters
+from url_clusters import TemplateClusters, path_template
+
+
+@pytest.mark.parametrize('url, template', [
+    ('https://example.com/products/1042', '/products/{id}'),
+    ('https://example.com/orders/3f2b8c1e-9a4d-4e2f-8b1a-0c9d2e7f6a5b', '/orders/{id}'),
+    ('https://example.com/p/sku12345/reviews', '/p/{id}/reviews'),
+    # Word slugs are pages, not placeholders
+    ('https://example.com/docs/getting-started', '/docs/getting-started'),
+    ('https://example.com/services/web-design', '/services/web-design'),
+    ('https://example.com/en/about-us', '/en/about-us'),
+    ('https://example.com/team/john-smith', '/team/john-smith'),
+    ('https://example.com/about-us', '/about-us'),
+])
+def test_path_template(url, template):
+    assert path_template(url) == template
+
+
+def clusters(**kwargs):
+    return TemplateClusters(sample_size=1, min_siblings=3, dom_fingerprint=False, **kwargs)
+
+
+def test_slug_pages_do_not_cluster_without_siblings():
+    template_clusters = clusters()
+    for path in ('/docs/getting-started', '/services/web-design', '/en/about-us', '/team/john-smith'):
+        template_clusters.observe(f'https://example.com{path}')
+    for path in ('/docs/getting-started', '/services/web-design', '/en/about-us', '/team/john-smith'):
+        assert template_clusters.pattern(f'https://example.com{path}') is None
+
+
+def test_siblings_under_one_parent_cluster():
+    template_clusters = clusters()
+    for slug in ('shoes', 'hats', 'bags'):
+        template_clusters.observe(f'https://example.com/products/{slug}')
+    assert template_clusters.pattern('https://example.com/products/shoes') == '/products/*'
+    # First-level pages never cluster by siblings
+    for slug in ('about', 'contact', 'pricing'):
+        template_clusters.observe(f'https://example.com/{slug}')
+    assert template_clusters.pattern('https://example.com/about') is None
+
+
+def test_id_pages_cluster_and_sample():
+    template_clusters = clusters()
+    key = asyncio.run(template_clusters.assign('https://example.com/products/1'))
+    assert key == '/products/{id}'
+    assert template_clusters.should_audit(key)
+    template_clusters.add_sample(key, 'https://example.com/products/1')
+    assert not template_clusters.should_audit(key)
+
+
+def test_clustering_is_opt_in(monkeypatch):
+    monkeypatch.delenv('TEMPLATE_CLUSTERING', raising=False)
+    assert resolve_template_clusters() is None
+    assert resolve_template_clusters(0) is None
+    assert resolve_template_clusters(2).sample_size == 2
+    monkeypatch.setenv('TEMPLATE_CLUSTERING', 'yes')
+    assert isinstance(resolve_template_clusters(), TemplateClusters)
+
+
+def test_dom_fingerprint_on_by_default(monkeypatch):
+    monkeypatch.delenv('TEMPLATE_DOM_FINGERPRINT', raising=False)
+    assert TemplateClusters().dom_fingerprint
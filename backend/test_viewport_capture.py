@@ -0,0 +1,112 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import agent_core
+from viewport_capture import CaptureEngine
+
+
+class FakePage:
+    """A page of three 800px viewports"""
+
+    def __init__(self):
+        self.y = 0
+        self.url = None
+
+    async def goto(self, url, **kwargs):
+        self.url = url
+
+    async def evaluate(self, script):
+        if script.startswith('window.scrollTo'):
+            self.y = min(int(script.split(',')[1].strip(' )')), 1600)
+            return None
+        return {'y': self.y, 'height': 800, 'total': 2400}
+
+    async def wait_for_timeout(self, ms):
+        pass
+
+    async def screenshot(self, **kwargs):
+        return f'jpeg@{self.y}'.encode()
+
+
+class FakeBrowser:
+    def __init__(self, log):
+        self.log = log
+
+    async def new_context(self, viewport):
+        self.log.append(('new_context', viewport['width'], viewport['height']))
+        log = self.log
+
+        class Context:
+            async def new_page(self):
+                return FakePage()
+
+            async def close(self):
+                log.append(('close_context',))
+        return Context()
+
+    async def close(self):
+        self.log.append(('close_browser',))
+
+
+class FakeChromium:
+    def __init__(self, log):
+        self.log = log
+
+    async def connect_over_cdp(self, cdp_url):
+        self.log.append(('connect', cdp_url))
+        return FakeBrowser(self.log)
+
+    async def launch(self, **kwargs):
+        raise AssertionError('launched a browser of its own')
+
+
+def test_capture_over_cdp_uses_the_given_browser_and_only_disconnects():
+    log = []
+    engine = CaptureEngine(width=1000, height=800, settle_ms=0)
+    engine._playwright = SimpleNamespace(chromium=FakeChromium(log))
+
+    captures = asyncio.run(engine.capture('http://example.test/', cdp_url='ws://pooled/devtools'))
+
+    assert [(c['viewport_number'], c['scroll_y'], c['image']) for c in captures] == [
+        (1, 0, b'jpeg@0'), (2, 800, b'jpeg@800'), (3, 1600, b'jpeg@1600'),
+    ]
+    assert log == [('connect', 'ws://pooled/devtools'), ('new_context', 1000, 800), ('close_context',), ('close_browser',)]
+
+
+def test_batch_validation_captures_in_a_pooled_session(monkeypatch):
+    calls = []
+    session = SimpleNamespace(cdp_url='ws://pooled/devtools')
+
+    @asynccontextmanager
+    async def scope(browser_pool=None):
+        calls.append(('checkout', browser_pool))
+        yield session
+        calls.append(('checkin',))
+
+    class Engine:
+        async def capture(self, url, cdp_url=None):
+            calls.append(('capture', url, cdp_url))
+            return [{'viewport_number': 1, 'scroll_y': 0, 'image': b'jpeg'}]
+
+    async def analyze(url, audit_config, captures, shared_regions):
+        calls.append(('analyze',))
+        return {'values': []}
+
+    async def store(captures, validation):
+        return {}
+
+    async def lookup(*args):
+        return None, None
+
+    monkeypatch.setattr(agent_core, 'browser_session_scope', scope)
+    monkeypatch.setattr(agent_core, 'get_capture_engine', lambda: Engine())
+    monkeypatch.setattr(agent_core, 'analyze_viewports', analyze)
+    monkeypatch.setattr(agent_core, 'store_captures', store)
+    monkeypatch.setattr(agent_core, 'lookup_cached_validation', lookup)
+
+    validation, _ = asyncio.run(agent_core.validate_page('http://example.test/', browser_pool='pool', validation_mode='batch'))
+
+    assert validation['tier'] == 'batch'
+    # The session goes back to the pool before the (slow) LLM request
+    assert calls == [('checkout', 'pool'), ('capture', 'http://example.test/', 'ws://pooled/devtools'), ('checkin',), ('analyze',)]
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import re
+from collections import defaultdict
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from utils.http_client import fetch_page
+
+NUMERIC_SEGMENT = re.compile(r'^\d+$')
+ID_SEGMENT = re.compile(r'^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{12,}|[a-z]*\d{4,}[a-z]*)$', re.IGNORECASE)
+
+# Structural tags that make up a page's layout skeleton
+SKELETON_TAGS = {
+    'header', 'nav', 'main', 'article', 'section', 'aside', 'footer',
+    'div', 'ul', 'ol', 'form', 'table', 'h1', 'h2', 'h3', 'figure',
+}
+
+
+def path_template(url):
+    """
+    Generalize a URL path into its template, e.g. /products/1042 → /products/{id}.
+
+    Only numeric and id-like segments (uuids, long hex, sku-like codes) become
+    {id}. Word slugs stay as they are: /docs/getting-started, /team/john-smith
+    and /en/about-us are distinct pages, they only cluster through siblings.
+    """
+    segments = [segment for segment in urlsplit(url).path.split('/') if segment]
+    template = []
+    for segment in segments:
+        if NUMERIC_SEGMENT.match(segment) or ID_SEGMENT.match(segment):
+            template.append('{id}')
+        else:
+            template.append(segment)
+    return '/' + '/'.join(template)
+
+
+class SkeletonParser(HTMLParser):
+    """Collects the nesting of structural tags, collapsing runs of identical siblings"""
+
+    def __init__(self, max_depth=8):
+        super().__init__(convert_charrefs=True)
+        self.max_depth = max_depth
+        self.depth = 0
+        self.skeleton = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in SKELETON_TAGS:
+            return
+        self.depth += 1
+        if self.depth <= self.max_depth:
+            entry = f'{self.depth}:{tag}'
+            # Lists of cards/posts differ in length between pages of the same template
+            if not self.skeleton or self.skeleton[-1] != entry:
+                self.skeleton.append(entry)
+
+    def handle_endtag(self, tag):
+        if tag in SKELETON_TAGS and self.depth > 0:
+            self.depth -= 1
+
+
+def dom_fingerprint(html):
+    """Short hash of the page's structural skeleton"""
+    parser = SkeletonParser()
+    parser.feed(html)
+    parser.close()
+    return hashlib.sha1('|'.join(parser.skeleton).encode('utf-8')).hexdigest()[:12]
+
+
+class TemplateClusters:
+    """
+    Groups crawled URLs by page template so only a sample of each is audited.
+
+    A URL belongs to a cluster when its path template contains an {id}
+    placeholder or when at least `min_siblings` discovered URLs share its parent
+    path below the first level (/products/shoes, /products/hats, ...). With
+    dom_fingerprint enabled (the default) the page's layout skeleton is part of
+    the cluster key, so same-pattern URLs with different layouts are audited
+    separately.
+    """
+
+    def __init__(self, sample_size=None, min_siblings=None, dom_fingerprint=None):
+        self.sample_size = sample_size or int(os.getenv('TEMPLATE_SAMPLE_SIZE', '1'))
+        self.min_siblings = min_siblings or int(os.getenv('TEMPLATE_MIN_SIBLINGS', '5'))
+        if dom_fingerprint is None:
+            dom_fingerprint = os.getenv('TEMPLATE_DOM_FINGERPRINT', 'yes').lower() == 'yes'
+        self.dom_fingerprint = dom_fingerprint
+
+        self._children = defaultdict(set)  # parent path -> discovered child paths
+        self.samples = defaultdict(list)    # cluster key -> audited URLs
+        self.members = defaultdict(list)    # cluster key -> skipped URLs
+
+    def observe(self, url):
+        """Record a discovered URL so sibling-based clusters can form"""
+        path = urlsplit(url).path.rstrip('/')
+        parent = path.rsplit('/', 1)[0]
+        if parent:
+            self._children[parent].add(path)
+
+    def pattern(self, url):
+        """Path-based cluster pattern for url, or None if it looks like a one-off page"""
+        template = path_template(url)
+        if '{' in template:
+            return template
+        path = urlsplit(url).path.rstrip('/')
+        parent = path.rsplit('/', 1)[0]
+        if parent and len(self._children[parent]) >= self.min_siblings:
+            return f'{parent}/*'
+        return None
+
+    async def assign(self, url):
+        """Cluster key for url (pattern, plus DOM fingerprint when enabled), or None"""
+        pattern = self.pattern(url)
+        if pattern is None or not self.dom_fingerprint:
+            return pattern
+        try:
+            page = await fetch_page(url)
+            return f"{pattern}#{dom_fingerprint(page['text'])}"
+        except Exception as e:
+            print(f"DOM fingerprint failed for {url}: {e}")
+            return pattern
+
+    def should_audit(self, key):
+        return len(self.samples[key]) < self.sample_size
+
+    def add_sample(self, key, url):
+        self.samples[key].append(url)
+
+    def add_member(self, key, url):
+        self.members[key].append(url)
+
+    def member_results(self, results):
+        """Result entries for skipped members, carrying their cluster's audited findings"""
+        by_url = {result['url']: result for result in results}
+        member_results = []
+        for key, urls in self.members.items():
+            audited = [by_url[url] for url in self.samples[key] if url in by_url]
+            representative = next((result for result in audited if 'error' not in result), None)
+            for url in urls:
+                entry = {
+                    'url': url,
+                    'page_number': None,
+                    'template_cluster': key,
+                    'represented_by': [result['url'] for result in audited],
+                    'skipped': True,
+                }
+                if representative:
+                    entry['validation'] = representative.get('validation')
+                    entry['screenshots'] = representative.get('screenshots', {})
+                else:
+                    entry['error'] = 'No successfully audited page for this template'
+                member_results.append(entry)
+        return member_results
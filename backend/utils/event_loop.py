@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    """
+    A long-lived asyncio event loop running in a daemon thread.
+
+    Sync code (Flask / Socket.IO handlers) submits coroutines with submit() and
+    gets a concurrent.futures.Future back, so every analysis in the process
+    shares one loop and its async resources (browser pool, HTTP sessions).
+    """
+
+    def __init__(self, name='qai-event-loop'):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule coro on the loop from any thread, returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Submit coro and block the calling thread until it finishes"""
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+
+_loop = None
+_lock = threading.Lock()
+
+
+def get_event_loop():
+    """Process-wide BackgroundLoop that owns all crawls, started on first use"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = BackgroundLoop()
+        return _loop
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import time
+import weakref
+from urllib.parse import urlsplit
+
+import aiohttp
+
+USER_AGENT = os.getenv('HTTP_USER_AGENT', 'Mozilla/5.0 (compatible; QAI-Auditor/1.0)')
+
+# One pooled ClientSession per event loop (aiohttp sessions cannot cross loops)
+_sessions = weakref.WeakKeyDictionary()
+
+# Reachability results: origin -> (expires_at, error) for connection failures,
+# url -> (expires_at, error) for HTTP status results
+_reachability = {}
+
+
+def get_http_session():
+    """Return the keep-alive aiohttp session for the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=int(os.getenv('HTTP_POOL_LIMIT', '50')),
+            limit_per_host=int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '8')),
+            use_dns_cache=True,
+            ttl_dns_cache=int(os.getenv('HTTP_DNS_CACHE_TTL', '300')),
+            keepalive_timeout=float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30')),
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=float(os.getenv('HTTP_TIMEOUT', '15'))),
+            headers={'User-Agent': USER_AGENT},
+        )
+        _sessions[loop] = session
+    return session
+
+
+async def close_http_session():
+    """Close the running loop's session, call before the loop shuts down"""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session and not session.closed:
+        await session.close()
+
+
+async def fetch_page(url, headers=None, max_bytes=None):
+    """
+    GET a page through the shared session.
+
+    Returns a dict with the final url (after redirects), status, headers,
+    raw body bytes (capped at HTTP_MAX_BYTES) and the decoded text.
+    """
+    max_bytes = max_bytes or int(os.getenv('HTTP_MAX_BYTES', str(5 * 1024 * 1024)))
+    session = get_http_session()
+    async with session.get(url, headers=headers, allow_redirects=True) as response:
+        body = await response.content.read(max_bytes)
+        charset = response.charset or 'utf-8'
+        return {
+            'url': str(response.url),
+            'status': response.status,
+            'headers': dict(response.headers),
+            'content_type': response.content_type,
+            'body': body,
+            'text': body.decode(charset, errors='replace'),
+        }
+
+
+async def _probe(url, timeout):
+    """HEAD url, falling back to GET for servers that reject or mishandle HEAD; returns the status"""
+    session = get_http_session()
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    try:
+        async with session.head(url, allow_redirects=True, timeout=client_timeout) as response:
+            if response.status < 400:
+                return response.status
+    except (aiohttp.ServerDisconnectedError, aiohttp.ClientResponseError):
+        pass
+    # The body is never read, the connection goes back to the pool once released
+    async with session.get(url, allow_redirects=True, timeout=client_timeout) as response:
+        return response.status
+
+
+async def check_reachable(url, timeout=10):
+    """
+    Check that url answers with a non-error status, returns (reachable, error message).
+
+    Uses the shared keep-alive session, so the crawl reuses the connection and
+    the DNS entry. Results are cached for REACHABILITY_CACHE_TTL seconds:
+    connection failures per origin, HTTP status results per URL.
+    """
+    ttl = float(os.getenv('REACHABILITY_CACHE_TTL', '60'))
+    parts = urlsplit(url)
+    origin = f'{parts.scheme}://{parts.netloc.lower()}'
+    now = time.monotonic()
+    for key in (origin, url):
+        cached = _reachability.get(key)
+        if cached and cached[0] > now:
+            return cached[1] is None, cached[1]
+
+    cache_key = url
+    try:
+        status = await _probe(url, timeout)
+        error = None if status < 400 else f"Website returned status code {status}"
+    except asyncio.TimeoutError:
+        error, cache_key = "Request timeout - website took too long to respond", origin
+    except aiohttp.TooManyRedirects:
+        error = "Too many redirects"
+    except aiohttp.ClientConnectionError:
+        error, cache_key = "Connection error - could not reach the website", origin
+    except Exception as e:
+        return False, f"Error checking URL: {str(e)}"
+
+    _reachability[cache_key] = (now + ttl, error)
+    if len(_reachability) > 1024:
+        # Drop expired entries so the cache stays small
+        for key, (expires_at, _) in list(_reachability.items()):
+            if expires_at <= now:
+                del _reachability[key]
+    return error is None, error
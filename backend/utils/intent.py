@@ -1,8 +1,11 @@
 from pydantic import BaseModel, Field
+from collections import OrderedDict
 from typing import List
+import json
 import os
+import threading
 
-import google.genai as genai
+from utils.llm import get_genai_client
 
 
 class AuditConfig(BaseModel):
@@ -32,10 +35,103 @@ class AuditConfig(BaseModel):
     )
 
 
+# Computed once instead of on every request
+AUDIT_CONFIG_SCHEMA = AuditConfig.model_json_schema()
+
+# LRU memo of normalized intent text -> AuditConfig, optionally persisted to INTENT_CACHE_PATH
+INTENT_MEMO_SIZE = int(os.getenv("INTENT_MEMO_SIZE", "256"))
+INTENT_CACHE_PATH = os.getenv("INTENT_CACHE_PATH")
+
+# Parsed configs of the prebuilt intent templates (qai-client ResourcesPage), resolved without the LLM
+INTENT_TEMPLATES_PATH = os.path.join(os.path.dirname(__file__), "intent_templates.json")
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+_memo_loaded = False
+
+
+def normalize_intent(user_prompt: str):
+    """Collapse whitespace and case so re-submitted templates map to the same memo entry"""
+    return " ".join(user_prompt.split()).casefold()
+
+
+def _load_templates():
+    try:
+        with open(INTENT_TEMPLATES_PATH, "r", encoding="utf-8") as f:
+            return {
+                normalize_intent(template["intent"]): AuditConfig.model_validate(template["config"])
+                for template in json.load(f)
+            }
+    except Exception as e:
+        print(f"Failed to load intent templates: {e}")
+        return {}
+
+
+# Seeded at import and kept out of the LRU, so templates never get evicted
+_templates = _load_templates()
+
+
+def _load_memo():
+    global _memo_loaded
+    _memo_loaded = True
+    if not INTENT_CACHE_PATH or not os.path.exists(INTENT_CACHE_PATH):
+        return
+    try:
+        with open(INTENT_CACHE_PATH, "r", encoding="utf-8") as f:
+            for key, config in json.load(f).items():
+                _memo[key] = AuditConfig.model_validate(config)
+        while len(_memo) > INTENT_MEMO_SIZE:
+            _memo.popitem(last=False)
+    except Exception as e:
+        print(f"Failed to load intent cache: {e}")
+
+
+def _save_memo():
+    if not INTENT_CACHE_PATH:
+        return
+    try:
+        os.makedirs(os.path.dirname(INTENT_CACHE_PATH) or ".", exist_ok=True)
+        tmp_path = f"{INTENT_CACHE_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({key: config.model_dump() for key, config in _memo.items()}, f)
+        os.replace(tmp_path, INTENT_CACHE_PATH)
+    except Exception as e:
+        print(f"Failed to save intent cache: {e}")
+
+
+def _memo_get(key):
+    template = _templates.get(key)
+    if template is not None:
+        return template.model_copy()
+    with _memo_lock:
+        if not _memo_loaded:
+            _load_memo()
+        config = _memo.get(key)
+        if config is None:
+            return None
+        _memo.move_to_end(key)
+        return config.model_copy()
+
+
+def _memo_put(key, config):
+    with _memo_lock:
+        _memo[key] = config.model_copy()
+        _memo.move_to_end(key)
+        while len(_memo) > INTENT_MEMO_SIZE:
+            _memo.popitem(last=False)
+        _save_memo()
+
+
 def extract_audit_config(user_prompt: str):
     print("Started")
+
+    key = normalize_intent(user_prompt)
+    cached = _memo_get(key)
+    if cached:
+        print("Completed (memoized)")
+        return cached
     
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    client = get_genai_client()
     
     prompt = f"""
     You are an expert Project Manager. 
@@ -51,17 +147,19 @@ def extract_audit_config(user_prompt: str):
             contents=prompt,
             config={
             "response_mime_type": "application/json",
-            "response_json_schema": AuditConfig.model_json_schema(),
+            "response_json_schema": AUDIT_CONFIG_SCHEMA,
             },
         )
     
         structured_config = AuditConfig.model_validate_json(response.text)
         print("Completed")
         print(structured_config)
+
+        _memo_put(key, structured_config)
     
         return structured_config
     
     except Exception as e:
         print(e)
         return None
-    
\ No newline at end of file
+    
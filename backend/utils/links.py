@@ -0,0 +1,104 @@
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from utils.http_client import fetch_page
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+
+class LinkParser(HTMLParser):
+    """Collects <a href> anchors, <form action> targets and <base href> from static HTML"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.base_href = None
+        self.links = []      # [(caption, href)]
+        self._anchor = None  # [href, text parts, fallback caption] of the open <a>
+        self._form = None    # [action, caption] of the open <form>
+        self._in_button = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'base' and attrs.get('href') and self.base_href is None:
+            self.base_href = attrs['href']
+        elif tag == 'a' and attrs.get('href'):
+            fallback = attrs.get('aria-label') or attrs.get('title') or ''
+            self._anchor = [attrs['href'], [], fallback]
+        elif tag == 'img' and self._anchor is not None and not self._anchor[2]:
+            self._anchor[2] = attrs.get('alt') or ''
+        elif tag == 'form':
+            caption = attrs.get('aria-label') or attrs.get('name') or attrs.get('id') or ''
+            self._form = [attrs.get('action') or '', caption]
+        elif tag in ('button', 'input') and self._form is not None and not self._form[1]:
+            if tag == 'button' or attrs.get('type') == 'submit':
+                self._form[1] = attrs.get('value') or attrs.get('aria-label') or ''
+                self._in_button = tag == 'button'
+
+    def handle_endtag(self, tag):
+        if tag == 'button':
+            self._in_button = False
+        if tag == 'a' and self._anchor is not None:
+            href, parts, fallback = self._anchor
+            caption = ' '.join(''.join(parts).split()) or fallback.strip()
+            self.links.append((caption, href))
+            self._anchor = None
+        elif tag == 'form' and self._form is not None:
+            action, caption = self._form
+            # A form without an action submits to the current page, which is not a new link
+            if action:
+                self.links.append((' '.join(caption.split()) or 'Form', action))
+            self._form = None
+
+    def handle_data(self, data):
+        if self._anchor is not None:
+            self._anchor[1].append(data)
+        elif self._in_button and self._form is not None:
+            self._form[1] += data
+
+
+def parse_links(html, page_url):
+    """Parse anchors and form actions from html, resolved against page_url / <base href>"""
+    parser = LinkParser()
+    parser.feed(html)
+    parser.close()
+
+    try:
+        base = urljoin(page_url, parser.base_href) if parser.base_href else page_url
+    except ValueError:
+        base = page_url
+    posts = []
+    seen = set()
+    for caption, href in parser.links:
+        href = href.strip()
+        # Blank and in-page (#section) links point back at this page
+        if not href or href.startswith('#'):
+            continue
+        try:
+            url = urldefrag(urljoin(base, href))[0]
+            parsed = urlparse(url)
+        except ValueError:
+            # Malformed href (e.g. an unclosed IPv6 bracket): skip it, not the whole page
+            continue
+        # Skip javascript:, mailto:, tel:, data: etc.
+        if parsed.scheme not in ('http', 'https'):
+            continue
+        if not parsed.hostname or any(c.isspace() for c in parsed.netloc):
+            continue
+        if url in seen:
+            continue
+        seen.add(url)
+        posts.append({'caption': caption, 'url': url})
+    return {'posts': posts}
+
+
+async def extract_links_static(url):
+    """
+    Deterministic, non-LLM link discovery: fetch the page over HTTP and parse its HTML.
+
+    Returns the same shape as extract_redirects ({'posts': [{'caption', 'url'}]}),
+    or None when the page could not be fetched or is not HTML.
+    """
+    page = await fetch_page(url)
+    if page['status'] >= 400 or page['content_type'] not in HTML_CONTENT_TYPES:
+        return None
+    return parse_links(page['text'], page['url'])
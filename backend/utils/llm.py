@@ -0,0 +1,16 @@
+import os
+import threading
+
+import google.genai as genai
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_genai_client():
+    """Module-level google.genai client shared by every caller (created on first use)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        return _client
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.http_client import fetch_page
+from utils.urls import canonicalize_url
+from utils.validation_cache import hash_audit_config
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'snapshots.sqlite3')
+
+
+def content_hash(body):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hashlib.sha256(body).hexdigest()
+
+
+class PageSnapshots:
+    """
+    Persistent SQLite record of each site's previous crawl, used by incremental re-audits.
+
+    Per page (and audit_config) it keeps the HTTP validators (ETag, Last-Modified),
+    a hash of the HTML, the outgoing links and the audit findings, so a page that
+    has not changed since the last crawl can be reused without running the agents.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('SNAPSHOT_DB_PATH', DEFAULT_SNAPSHOT_PATH)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS page_snapshots (
+                    site TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    config_hash TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT,
+                    links TEXT NOT NULL,
+                    validation TEXT NOT NULL,
+                    screenshots TEXT NOT NULL,
+                    audited_at REAL NOT NULL,
+                    PRIMARY KEY (site, url, config_hash)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, site, url, audit_config=None):
+        """Return the page's last snapshot as a dict, or None if it was never audited"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT etag, last_modified, content_hash, links, validation, screenshots, audited_at "
+                "FROM page_snapshots WHERE site = ? AND url = ? AND config_hash = ?",
+                (site, canonicalize_url(url), hash_audit_config(audit_config)),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'content_hash': row[2],
+            'links': json.loads(row[3]),
+            'validation': json.loads(row[4]),
+            # JSON turns viewport numbers into strings, restore the int keys
+            'screenshots': {int(vp): shot for vp, shot in json.loads(row[5]).items()},
+            'audited_at': row[6],
+        }
+
+    def put(self, site, url, audit_config, page, links, validation, screenshots):
+        """Record a freshly audited page; page is the fetch_page dict its validators come from"""
+        headers = {key.lower(): value for key, value in page['headers'].items()}
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO page_snapshots "
+                "(site, url, config_hash, etag, last_modified, content_hash, links, validation, screenshots, audited_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    site,
+                    canonicalize_url(url),
+                    hash_audit_config(audit_config),
+                    headers.get('etag'),
+                    headers.get('last-modified'),
+                    content_hash(page['body']),
+                    json.dumps(links or []),
+                    json.dumps(validation),
+                    json.dumps(screenshots or {}),
+                    time.time(),
+                ),
+            )
+
+
+async def revalidate_page(url, snapshot=None):
+    """
+    Check whether url changed since snapshot with a conditional GET.
+
+    Returns (unchanged, page): unchanged is True on a 304 or when the HTML hash
+    matches; page is the fetch_page dict of a changed page (None on a 304).
+    Without a snapshot this is a plain GET and the page counts as changed.
+    """
+    headers = {}
+    if snapshot:
+        if snapshot['etag']:
+            headers['If-None-Match'] = snapshot['etag']
+        if snapshot['last_modified']:
+            headers['If-Modified-Since'] = snapshot['last_modified']
+
+    page = await fetch_page(url, headers=headers or None)
+    if not snapshot:
+        return False, page
+    if page['status'] == 304:
+        return True, None
+    return page['status'] < 400 and content_hash(page['body']) == snapshot['content_hash'], page
+
+
+_snapshots = None
+_snapshots_lock = threading.Lock()
+
+
+def get_page_snapshots():
+    """Process-wide snapshot store, created on first use"""
+    global _snapshots
+    with _snapshots_lock:
+        if _snapshots is None:
+            _snapshots = PageSnapshots()
+        return _snapshots
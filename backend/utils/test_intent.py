@@ -0,0 +1,47 @@
+import json
+import os
+import re
+
+import pytest
+
+from utils import intent
+
+RESOURCES_PAGE = os.path.join(os.path.dirname(__file__), '..', '..', 'qai-client', 'src', 'ResourcesPage', 'ResourcesPage.jsx')
+
+
+@pytest.fixture
+def no_llm(monkeypatch):
+    def fail():
+        raise AssertionError('the LLM was called')
+    monkeypatch.setattr(intent, 'get_genai_client', fail)
+
+
+def template_intents():
+    with open(intent.INTENT_TEMPLATES_PATH, encoding='utf-8') as f:
+        return [template['intent'] for template in json.load(f)]
+
+
+def test_every_template_is_seeded():
+    assert len(template_intents()) == 10
+    assert len(intent._templates) == 10
+
+
+@pytest.mark.skipif(not os.path.exists(RESOURCES_PAGE), reason='client sources not checked out')
+def test_seeded_templates_match_the_resources_page():
+    with open(RESOURCES_PAGE, encoding='utf-8') as f:
+        page_intents = re.findall(r'"intent": "([^"]+)"', f.read())
+    assert page_intents == template_intents()
+
+
+@pytest.mark.parametrize('text', template_intents())
+def test_templates_resolve_without_the_llm(no_llm, text):
+    config = intent.extract_audit_config(f'  {text.upper()}\n')
+    assert config == intent._templates[intent.normalize_intent(text)]
+    # Callers get a copy, not the seeded instance
+    config.primary_goal = 'changed'
+    assert intent.extract_audit_config(text).primary_goal != 'changed'
+
+
+def test_other_intents_still_go_to_the_llm(no_llm):
+    with pytest.raises(AssertionError, match='the LLM was called'):
+        intent.extract_audit_config('A dark-themed site for a local chess club')
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+import agent_core
+from bench.server import serve_fixture
+from utils.http_client import close_http_session
+from utils.links import extract_links_static, parse_links
+
+PAGE = 'https://example.com/blog/post'
+
+
+def urls(html, page_url=PAGE):
+    return [post['url'] for post in parse_links(html, page_url)['posts']]
+
+
+@pytest.mark.parametrize('href, url', [
+    # Relative and absolute links
+    ('next', 'https://example.com/blog/next'),
+    ('../about', 'https://example.com/about'),
+    ('/pricing', 'https://example.com/pricing'),
+    ('?page=2', 'https://example.com/blog/post?page=2'),
+    ('//cdn.example.com/a', 'https://cdn.example.com/a'),
+    ('https://example.com/contact', 'https://example.com/contact'),
+    ('  /padded  ', 'https://example.com/padded'),
+    # Fragments are dropped, they name a place in a document, not a new one
+    ('/docs#install', 'https://example.com/docs'),
+    # Off-domain links are returned, the crawler decides whether to follow them
+    ('https://other.org/page', 'https://other.org/page'),
+])
+def test_resolves_links(href, url):
+    assert urls(f'<a href="{href}">Link</a>') == [url]
+
+
+@pytest.mark.parametrize('href', [
+    '#top',
+    '#',
+    '   ',
+    'mailto:team@example.com',
+    'javascript:void(0)',
+    'tel:+15550100',
+    'data:text/html,hi',
+    'ftp://example.com/file',
+    # Malformed
+    'http://[::1',
+    'http://exa mple.com/',
+    'http://',
+])
+def test_skips_non_page_links(href):
+    assert urls(f'<a href="{href}">Link</a><a href="/ok">Ok</a>') == ['https://example.com/ok']
+
+
+def test_fragment_variants_dedupe_to_one_link():
+    html = '<a href="/docs#a">A</a><a href="/docs#b">B</a><a href="/docs">C</a>'
+    assert parse_links(html, PAGE)['posts'] == [{'caption': 'A', 'url': 'https://example.com/docs'}]
+
+
+def test_base_href_and_captions():
+    html = """
+        <base href="https://example.com/shop/">
+        <a href="cart">  View
+            cart </a>
+        <a href="help" aria-label="Help centre"></a>
+        <a href="home"><img src="logo.png" alt="Home"></a>
+        <form action="search"><button>Search</button></form>
+        <form><input type="submit" value="Stay"></form>
+    """
+    assert parse_links(html, PAGE)['posts'] == [
+        {'caption': 'View cart', 'url': 'https://example.com/shop/cart'},
+        {'caption': 'Help centre', 'url': 'https://example.com/shop/help'},
+        {'caption': 'Home', 'url': 'https://example.com/shop/home'},
+        {'caption': 'Search', 'url': 'https://example.com/shop/search'},
+    ]
+
+
+def test_malformed_base_href_falls_back_to_page_url():
+    assert urls('<base href="http://[oops"><a href="next">Next</a>') == ['https://example.com/blog/next']
+
+
+def fetch(coroutine_function, *args, **kwargs):
+    async def run():
+        try:
+            return await coroutine_function(*args, **kwargs)
+        finally:
+            await close_http_session()
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def no_agent(monkeypatch):
+    def fail(model):
+        raise AssertionError('the link extraction agent was invoked')
+    monkeypatch.setattr(agent_core, 'create_llm', fail)
+
+
+def test_extract_links_static_over_http():
+    with serve_fixture('landing') as base_url:
+        extracted = fetch(extract_links_static, base_url + '/')
+    assert extracted['posts'] == [
+        {'caption': 'Launchpad', 'url': f'{base_url}/'},
+        {'caption': 'Pricing', 'url': f'{base_url}/pricing.html'},
+        {'caption': 'Sign up', 'url': f'{base_url}/signup.html'},
+    ]
+
+
+def test_extract_links_static_skips_missing_and_non_html_pages():
+    with serve_fixture('shop') as base_url:
+        assert fetch(extract_links_static, base_url + '/missing.html') is None
+        assert fetch(extract_links_static, base_url + '/style.css') is None
+
+
+def test_extract_redirects_uses_the_static_html_without_the_agent(no_agent):
+    with serve_fixture('shop') as base_url:
+        extracted = fetch(agent_core.extract_redirects, base_url + '/', static_first=True)
+    assert [post['url'] for post in extracted['posts']] == [
+        f'{base_url}/',
+        f'{base_url}/products/',
+        f'{base_url}/blog/',
+        f'{base_url}/about.html',
+        f'{base_url}/contact.html',
+        f'{base_url}/products/bags.html',
+        f'{base_url}/newsletter.html',  # form action
+        f'{base_url}/privacy.html',
+    ]
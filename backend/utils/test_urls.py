@@ -0,0 +1,45 @@
+import pytest
+
+from utils.urls import canonicalize_url, url_key
+
+
+@pytest.mark.parametrize('url, canonical', [
+    # Scheme and host case, default ports, trailing slash
+    ('HTTP://Example.COM/About/', 'http://example.com/About'),
+    ('https://example.com:443/', 'https://example.com'),
+    ('http://example.com:80/a', 'http://example.com/a'),
+    ('https://example.com:8443/x', 'https://example.com:8443/x'),
+    ('https://example.com./x', 'https://example.com/x'),
+    # Dot segments
+    ('https://example.com/a/./b/../c', 'https://example.com/a/c'),
+    ('https://example.com/../a', 'https://example.com/a'),
+    # Percent-encoding: unreserved decoded, the rest uppercased, raw unsafe escaped
+    ('https://example.com/%7euser', 'https://example.com/~user'),
+    ('https://example.com/a%2fb', 'https://example.com/a%2Fb'),
+    ('https://example.com/a b', 'https://example.com/a%20b'),
+    # Query: sorted, tracking parameters dropped, spaces as %20
+    ('https://example.com/p?b=2&a=1', 'https://example.com/p?a=1&b=2'),
+    ('https://example.com/p?utm_source=x&gclid=1&fbclid=2&id=3', 'https://example.com/p?id=3'),
+    # ref often selects content (git refs, referral pages), it stays in the key
+    ('https://example.com/tree?ref=main&utm_medium=email', 'https://example.com/tree?ref=main'),
+    ('https://example.com/s?q=a+b', 'https://example.com/s?q=a%20b'),
+    ('https://example.com/s?q', 'https://example.com/s?q='),
+    # Fragment, userinfo, IDN, IPv6
+    ('https://example.com/a#section', 'https://example.com/a'),
+    ('https://user:pw@Example.com/x', 'https://user:pw@example.com/x'),
+    ('https://bücher.de/', 'https://xn--bcher-kva.de'),
+    ('http://[::1]:8080/x', 'http://[::1]:8080/x'),
+    ('  https://example.com/a  ', 'https://example.com/a'),
+])
+def test_canonicalize_url(url, canonical):
+    assert canonicalize_url(url) == canonical
+
+
+def test_url_key_merges_www_variants():
+    assert url_key('https://www.example.com/a/') == url_key('https://example.com/a')
+    assert url_key('https://user@www.example.com/a') == 'https://user@example.com/a'
+    assert url_key('https://example.com/a') != url_key('https://example.com/b')
+
+
+def test_ref_keeps_pages_apart():
+    assert url_key('https://example.com/blob?ref=main') != url_key('https://example.com/blob?ref=dev')
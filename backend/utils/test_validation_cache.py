@@ -0,0 +1,54 @@
+import sqlite3
+import time
+
+from utils.validation_cache import ValidationCache, get_validation_cache, make_cache_key
+
+VALIDATION = {'values': [{'score': 72, 'cta_thoughts': [], 'theme_thoughts': []}]}
+
+
+def test_hit_returns_validation_and_screenshots(tmp_path):
+    cache = ValidationCache(str(tmp_path / 'validation.sqlite3'))
+    key = make_cache_key('https://example.com/', '<html>v1</html>', {'primary_goal': 'signups'})
+    cache.put(key, 'https://example.com/', VALIDATION, {1: 'shot-1', 2: 'shot-2'})
+
+    assert cache.get(key) == (VALIDATION, {1: 'shot-1', 2: 'shot-2'})
+    assert cache.stats()['hits'] == 1
+
+
+def test_miss_on_changed_content_or_config(tmp_path):
+    cache = ValidationCache(str(tmp_path / 'validation.sqlite3'))
+    key = make_cache_key('https://example.com/', '<html>v1</html>')
+    cache.put(key, 'https://example.com/', VALIDATION, {})
+
+    assert cache.get(make_cache_key('https://example.com/', '<html>v2</html>')) is None
+    assert cache.get(make_cache_key('https://example.com/', '<html>v1</html>', {'primary_goal': 'sales'})) is None
+    # Same page under another URL variant shares the key
+    assert make_cache_key('https://EXAMPLE.com:443/', '<html>v1</html>') == key
+    assert cache.stats()['misses'] == 2
+
+
+def test_expired_entry_is_a_miss_and_removed(tmp_path):
+    path = str(tmp_path / 'validation.sqlite3')
+    cache = ValidationCache(path, ttl=60)
+    key = make_cache_key('https://example.com/', '<html>v1</html>')
+    cache.put(key, 'https://example.com/', VALIDATION, {})
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE validations SET created_at = ?", (time.time() - 61,))
+
+    assert cache.get(key) is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_lru_eviction(tmp_path):
+    cache = ValidationCache(str(tmp_path / 'validation.sqlite3'), max_entries=2)
+    keys = [make_cache_key(f'https://example.com/{n}', 'x') for n in range(3)]
+    for n, key in enumerate(keys):
+        cache.put(key, f'https://example.com/{n}', VALIDATION, {})
+        time.sleep(0.01)
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_cache_is_opt_in(monkeypatch):
+    monkeypatch.delenv('VALIDATION_CACHE', raising=False)
+    assert get_validation_cache() is None
@@ -0,0 +1,97 @@
+import re
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|gclid|fbclid|msclkid|mc_cid|mc_eid|_ga)$', re.IGNORECASE)
+
+# RFC 3986 unreserved characters never need percent-encoding
+UNRESERVED = "-._~"
+# Characters kept as-is in a path (sub-delims, ':' and '@' plus the separator)
+PATH_SAFE = "/!$&'()*+,;=:@" + UNRESERVED
+PERCENT_ESCAPE = re.compile(r'%[0-9a-fA-F]{2}')
+
+
+def remove_dot_segments(path):
+    """RFC 3986 section 5.2.4: resolve '.' and '..' segments"""
+    segments = path.split('/')
+    output = []
+    for segment in segments:
+        if segment == '.':
+            continue
+        if segment == '..':
+            if len(output) > 1:
+                output.pop()
+            continue
+        output.append(segment)
+    # Keep the trailing slash semantics of "a/." and "a/.."
+    if segments and segments[-1] in ('.', '..'):
+        output.append('')
+    return '/'.join(output)
+
+
+def normalize_percent_encoding(path):
+    """Decode escaped unreserved characters, uppercase the remaining escapes, escape raw unsafe ones"""
+    def fix_escape(match):
+        char = chr(int(match.group(0)[1:], 16))
+        if char.isascii() and (char.isalnum() or char in UNRESERVED):
+            return char
+        return match.group(0).upper()
+
+    path = PERCENT_ESCAPE.sub(fix_escape, path)
+    return quote(path, safe=PATH_SAFE + '%')
+
+
+def canonicalize_url(url):
+    """
+    RFC-style canonical form of an http(s) URL:
+    lowercase scheme and host, no default port, dot segments resolved,
+    normalized percent-encoding, sorted query without tracking parameters,
+    no fragment and no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    host = (parts.hostname or '').rstrip('.')
+    try:
+        host = host.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    host = host.lower()
+    if ':' in host:
+        # IPv6 literal
+        host = f'[{host}]'
+
+    netloc = host
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{netloc}:{port}'
+    if parts.username:
+        userinfo = parts.username + (f':{parts.password}' if parts.password else '')
+        netloc = f'{userinfo}@{netloc}'
+
+    path = normalize_percent_encoding(remove_dot_segments(parts.path))
+    path = path.rstrip('/')
+
+    query_pairs = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    ]
+    query = urlencode(sorted(query_pairs), quote_via=quote)
+
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def url_key(url):
+    """Dedup key: canonical URL with a leading 'www.' dropped, so www/non-www variants collide"""
+    canonical = canonicalize_url(url)
+    parts = urlsplit(canonical)
+    netloc = parts.netloc
+    host_start = netloc.rfind('@') + 1
+    if netloc[host_start:].startswith('www.'):
+        netloc = netloc[:host_start] + netloc[host_start + 4:]
+    return urlunsplit((parts.scheme, netloc, parts.path, parts.query, ''))
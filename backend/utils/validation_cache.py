@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.urls import canonicalize_url
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'validation.sqlite3')
+
+
+def hash_audit_config(audit_config):
+    return hashlib.sha256(json.dumps(audit_config or {}, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def make_cache_key(url, content, audit_config=None):
+    """Content-addressed key: normalized URL + page content hash + audit_config hash"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    content_hash = hashlib.sha256(content).hexdigest()
+    raw = f"{canonicalize_url(url)}\n{content_hash}\n{hash_audit_config(audit_config)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ValidationCache:
+    """
+    Persistent SQLite cache of validate_page results with LRU eviction and TTL.
+
+    Entries hold the Values dict and the screenshots dict so an unchanged page
+    can be returned without running the validation agent.
+    """
+
+    def __init__(self, path=None, max_entries=None, ttl=None):
+        self.path = path or os.getenv('VALIDATION_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.max_entries = max_entries or int(os.getenv('VALIDATION_CACHE_MAX_ENTRIES', '500'))
+        self.ttl = ttl or float(os.getenv('VALIDATION_CACHE_TTL', str(7 * 24 * 3600)))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS validations (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    validation TEXT NOT NULL,
+                    screenshots TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_validations_last_access ON validations (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Return (validation, screenshots) for key, or None on miss/expiry"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT validation, screenshots, created_at FROM validations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl:
+                if row is not None:
+                    conn.execute("DELETE FROM validations WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute("UPDATE validations SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+
+        validation = json.loads(row[0])
+        # JSON turns viewport numbers into strings, restore the int keys
+        screenshots = {int(vp): shot for vp, shot in json.loads(row[1]).items()}
+        return validation, screenshots
+
+    def put(self, key, url, validation, screenshots):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO validations (key, url, validation, screenshots, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, json.dumps(validation), json.dumps(screenshots or {}), now, now),
+            )
+            # Drop expired entries, then the least recently used ones over the limit
+            conn.execute("DELETE FROM validations WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM validations WHERE key IN ("
+                "SELECT key FROM validations ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM validations").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'max_entries': self.max_entries,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_validation_cache():
+    """Process-wide cache, or None unless VALIDATION_CACHE=yes (opt-in: the key only covers the static HTML)"""
+    global _cache
+    if os.getenv('VALIDATION_CACHE', 'no').lower() != 'yes':
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ValidationCache()
+        return _cache
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import weakref
+
+from playwright.async_api import async_playwright
+
+# Scroll offset of the page's top-left corner, and how far the page can scroll
+SCROLL_STATE_JS = "() => ({y: window.scrollY, height: window.innerHeight, total: document.documentElement.scrollHeight})"
+
+
+class CaptureEngine:
+    """
+    Deterministic viewport capture over Playwright.
+
+    capture(url) loads the page, scrolls it by window.innerHeight at a time and
+    takes one JPEG per viewport together with the scroll offset it was taken at,
+    without any LLM in the loop. Given a cdp_url (a browser_use session checked
+    out of the browser pool, local or cloud) it drives that browser; otherwise
+    it uses a Chromium of its own kept alive between pages, capturing at most
+    `concurrency` pages at once.
+    """
+
+    def __init__(self, width=None, height=None, max_viewports=None, settle_ms=None, concurrency=None, quality=None):
+        self.width = width or int(os.getenv('CAPTURE_WIDTH', '1280'))
+        self.height = height or int(os.getenv('CAPTURE_HEIGHT', '800'))
+        self.max_viewports = max_viewports or int(os.getenv('CAPTURE_MAX_VIEWPORTS', '12'))
+        self.settle_ms = settle_ms if settle_ms is not None else int(os.getenv('CAPTURE_SETTLE_MS', '500'))
+        self.quality = quality or int(os.getenv('SCREENSHOT_QUALITY', '70'))
+        self.timeout_ms = int(float(os.getenv('CAPTURE_TIMEOUT', '30')) * 1000)
+        self._slots = asyncio.Semaphore(concurrency or int(os.getenv('CAPTURE_CONCURRENCY', '2')))
+        self._playwright = None
+        self._browser = None
+        self._start_lock = asyncio.Lock()
+
+    async def _ensure_playwright(self):
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        return self._playwright
+
+    async def _ensure_browser(self):
+        async with self._start_lock:
+            if self._browser is None or not self._browser.is_connected():
+                playwright = await self._ensure_playwright()
+                self._browser = await playwright.chromium.launch(headless=True)
+            return self._browser
+
+    async def capture(self, url, cdp_url=None):
+        """
+        Capture every viewport of url, top to bottom, in the browser at cdp_url if given.
+
+        Returns a list of {'viewport_number', 'scroll_y', 'image'} with JPEG bytes,
+        viewport_number starting at 1.
+        """
+        if cdp_url:
+            # The pool already bounds how many of its browsers are in use
+            async with self._start_lock:
+                playwright = await self._ensure_playwright()
+            browser = await playwright.chromium.connect_over_cdp(cdp_url)
+            try:
+                return await self._capture_in(browser, url)
+            finally:
+                # Only disconnects: the browser belongs to the session
+                await browser.close()
+
+        async with self._slots:
+            return await self._capture_in(await self._ensure_browser(), url)
+
+    async def _capture_in(self, browser, url):
+        context = await browser.new_context(viewport={'width': self.width, 'height': self.height})
+        try:
+            page = await context.new_page()
+            await page.goto(url, wait_until='load', timeout=self.timeout_ms)
+            return await self._scroll_and_capture(page)
+        finally:
+            await context.close()
+
+    async def _scroll_and_capture(self, page):
+        captures = []
+        previous_y = None
+        for index in range(self.max_viewports):
+            state = await page.evaluate(SCROLL_STATE_JS)
+            target = index * state['height']
+            if index and target >= state['total']:
+                break
+            await page.evaluate(f"window.scrollTo(0, {target})")
+            if self.settle_ms:
+                await page.wait_for_timeout(self.settle_ms)
+            scroll_y = (await page.evaluate(SCROLL_STATE_JS))['y']
+            if scroll_y == previous_y:
+                # The page stopped scrolling, the last viewport is already captured
+                break
+            image = await page.screenshot(type='jpeg', quality=self.quality)
+            captures.append({'viewport_number': index + 1, 'scroll_y': scroll_y, 'image': image})
+            previous_y = scroll_y
+        return captures
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+# One engine per event loop (Playwright objects cannot cross loops)
+_engines = weakref.WeakKeyDictionary()
+
+
+def get_capture_engine():
+    loop = asyncio.get_running_loop()
+    engine = _engines.get(loop)
+    if engine is None:
+        engine = CaptureEngine()
+        _engines[loop] = engine
+    return engine
@@ -0,0 +1,124 @@
+"""
+Analysis worker process for multi-process mode (see job_queue.py).
+
+    JOB_QUEUE_URL=redis://localhost:6379/0 python worker.py
+
+Start one per core (or more per host); the web process dispatches each job to
+the least-loaded worker and relays its Socket.IO frames to the client.
+"""
+import asyncio
+import base64
+import os
+import signal
+import sys
+
+from analysis import AnalysisError, run_analysis, summarize_results
+from job_queue import QueueWorker, create_broker
+from log_stream import buffered_emitter
+from metrics import serve_metrics
+from screenshot_store import get_screenshot_store
+from utils.event_loop import get_event_loop
+
+
+def proxy_screenshots():
+    """False when SCREENSHOT_STORE_DIR is storage shared with the web process (SCREENSHOT_SHARED_STORE=yes)"""
+    return os.getenv('SCREENSHOT_SHARED_STORE', 'no').lower() != 'yes'
+
+
+def export_screenshots(result):
+    """{id: {'full', 'thumb'}} base64 JPEGs of the screenshots a page result references"""
+    store = get_screenshot_store()
+    items = {}
+    for screenshot_id in (result.get('screenshots') or {}).values():
+        exported = store.export(screenshot_id) if isinstance(screenshot_id, str) else None
+        if exported:
+            items[screenshot_id] = {
+                'full': base64.b64encode(exported[0]).decode('ascii'),
+                'thumb': base64.b64encode(exported[1]).decode('ascii'),
+            }
+    return items
+
+
+async def run_job(job, stop_flag, publish):
+    """Run one dispatched analysis, sending its frames, progress and outcome back with publish"""
+    job_id = job['job_id']
+    sid = job.get('sid')
+
+    def send_to_client(event, payload):
+        if stop_flag.is_set():
+            return
+        publish({'type': 'emit', 'event': event, 'payload': payload})
+
+    def on_progress(pages_done, pages_total):
+        publish({'type': 'progress', 'pages_done': pages_done, 'pages_total': pages_total})
+
+    # Socket.IO jobs stream logs and pages, REST jobs only report progress
+    emit_to_client = log_buffer = None
+    if sid:
+        # Frames are batched here, before they cross the queue
+        emit_to_client, log_buffer = buffered_emitter(send_to_client)
+
+    # Screenshots live on this host's disk: they go to the web process ahead of the page referencing them
+    pending_pages = []
+
+    async def send_page_result(result):
+        if proxy_screenshots():
+            items = await asyncio.to_thread(export_screenshots, result)
+            if items:
+                publish({'type': 'screenshots', 'items': items})
+        if emit_to_client:
+            emit_to_client('page_result', {'job_id': job_id, 'result': result})
+
+    def on_page_result(result):
+        pending_pages.append(asyncio.ensure_future(send_page_result(result)))
+
+    try:
+        results = await run_analysis(job['params'], emit_log=emit_to_client, stop_flag=stop_flag, on_progress=on_progress, on_page_result=on_page_result)
+        await asyncio.gather(*pending_pages)
+
+        if stop_flag.is_set():
+            print(f"Job {job_id} was stopped by user.")
+            publish({'type': 'finish', 'status': 'stopped'})
+            return
+
+        if emit_to_client:
+            emit_to_client('log', {'message': f'Analysis complete. Analyzed {results["total_pages_analyzed"]} pages.', 'type': 'success'})
+            # Pages were already streamed, the final frame only carries the summary
+            emit_to_client('complete', {'status': 'success', 'data': summarize_results(results)})
+        publish({'type': 'finish', 'status': 'completed', 'result': results})
+
+    except AnalysisError as e:
+        if emit_to_client:
+            emit_to_client('error', {'message': str(e)})
+        publish({'type': 'finish', 'status': 'failed', 'error': str(e), 'user_error': True})
+    except Exception as e:
+        if stop_flag.is_set():
+            print(f"Job {job_id} was stopped by user.")
+            publish({'type': 'finish', 'status': 'stopped'})
+            return
+        print(f"ERROR in job {job_id}: {str(e)}")
+        if emit_to_client:
+            emit_to_client('error', {'message': f'Internal server error: {str(e)}'})
+        publish({'type': 'finish', 'status': 'failed', 'error': str(e)})
+    finally:
+        if log_buffer:
+            log_buffer.close()
+
+
+def main():
+    broker = create_broker()
+    if broker is None:
+        print("JOB_QUEUE_URL is not set, nothing to serve (set it to redis://... or sqlite:///...)")
+        return 1
+    # Stage timings, agent steps and LLM usage are recorded here, not in the web process
+    metrics_port = int(os.getenv('WORKER_METRICS_PORT', '9100'))
+    if metrics_port:
+        serve_metrics(metrics_port)
+    # Leave through run_forever's cleanup (deregistering the worker) on SIGTERM too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    QueueWorker(broker, run_job, get_event_loop()).run_forever()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,6 +11,27 @@ function getProgressIcon(message) {
   return <Globe size={14} />;
 }
 
+const BACKEND_URL = import.meta.env.VITE_BACKEND_URL || 'http://localhost:5000';
+
+// Audited pages in page order, template-covered pages (no page_number) after them
+function sortResults(results) {
+  return [...results].sort((a, b) => (a.page_number ?? Infinity) - (b.page_number ?? Infinity));
+}
+
+// The job's stored payload, retried briefly while the job is still being finalized (202)
+async function fetchJobResults(jobId, attempts = 5) {
+  for (let attempt = 0; attempt < attempts; attempt++) {
+    const response = await fetch(`${BACKEND_URL}/api/jobs/${jobId}/result`);
+    if (response.status === 200) {
+      const body = await response.json();
+      return body.data?.results || null;
+    }
+    if (response.status !== 202) return null;
+    await new Promise(resolve => setTimeout(resolve, 1000));
+  }
+  return null;
+}
+
 function AuditPage() {
   const location = useLocation();
   const navigate = useNavigate();
@@ -21,6 +42,9 @@ function AuditPage() {
   const [auditResults, setAuditResults] = useState(null);
   const logsEndRef = useRef(null);
   const socketRef = useRef(null);
+  // Per-page results streamed before the summary-only 'complete' event
+  const pageResultsRef = useRef([]);
+  const jobIdRef = useRef(null);
 
   const auditUrl = location.state?.url;
   const maxPages = location.state?.max_pages || 3;
@@ -48,7 +72,7 @@ function AuditPage() {
 
   // Connect to WebSocket on mount
   useEffect(() => {
-    const socket = io(import.meta.env.VITE_BACKEND_URL || 'http://localhost:5000');
+    const socket = io(BACKEND_URL);
     socketRef.current = socket;
 
     socket.on('connect', () => {
@@ -66,9 +90,44 @@ function AuditPage() {
       setLogs(prev => [...prev, data]);
     });
 
-    socket.on('complete', (data) => {
+    // Batched frame of log entries; repeated entries arrive merged with a count
+    socket.on('logs', (data) => {
+      const entries = data.entries.map(entry => (
+        entry.count > 1 ? { ...entry, message: `${entry.message} (×${entry.count})` } : entry
+      ));
+      setLogs(prev => [...prev, ...entries]);
+    });
+
+    socket.on('queued', (data) => {
+      setLogs(prev => [...prev, { message: `Waiting for a free analysis slot (position ${data.position} of ${data.queue_length})`, type: 'info' }]);
+    });
+
+    socket.on('job', (data) => {
+      jobIdRef.current = data.job_id;
+    });
+
+    socket.on('page_result', (data) => {
+      pageResultsRef.current = [...pageResultsRef.current, data.result];
+    });
+
+    socket.on('complete', async (data) => {
       setLogs(prev => [...prev, { message: 'Analysis complete!', type: 'success' }]);
-      setAuditResults(data.data);
+      const { pages = [], ...summary } = data.data;
+      let results = pageResultsRef.current;
+      // Some page_result frames were missed (reconnect, dropped frame): load the full payload instead
+      if (results.length < pages.length) {
+        const stored = jobIdRef.current
+          ? await fetchJobResults(jobIdRef.current).catch(() => null)
+          : null;
+        if (stored) {
+          results = stored;
+        } else {
+          // Keep the streamed pages, the summary fills in the rest (without validation/screenshots)
+          const streamed = new Set(results.map(r => r.url));
+          results = [...results, ...pages.filter(p => !streamed.has(p.url))];
+        }
+      }
+      setAuditResults({ ...summary, results: sortResults(results) });
       setIsRunning(false);
     });
 
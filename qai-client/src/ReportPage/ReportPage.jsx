@@ -83,6 +83,14 @@ function ScoreGauge({ score, label, icon, issueCount }) {
   );
 }
 
+const BACKEND_URL = import.meta.env.VITE_BACKEND_URL || 'http://localhost:5000';
+
+// Screenshots are ids in the backend's screenshot store; older results inline base64
+function screenshotUrl(screenshot, size) {
+  if (!/^[0-9a-f]{64}$/.test(screenshot)) return `data:image/jpeg;base64,${screenshot}`;
+  return `${BACKEND_URL}/api/screenshots/${screenshot}${size ? `?size=${size}` : ''}`;
+}
+
 function IssueCard({ elementName, issues, recommendations, type, screenshot }) {
   const icon = type === 'cta'
     ? <MousePointerClick size={16} />
@@ -116,13 +124,15 @@ function IssueCard({ elementName, issues, recommendations, type, screenshot }) {
 
         {/* Right: screenshot or placeholder */}
         {screenshot && screenshot !== "placeholder" ? (
-          <div className={styles.screenshotWrap}>
+          <a className={styles.screenshotWrap} href={screenshotUrl(screenshot)} target="_blank" rel="noopener noreferrer">
             <img
-              src={`data:image/jpeg;base64,${screenshot}`}
+              src={screenshotUrl(screenshot, 'thumb')}
               alt={`Screenshot for ${elementName}`}
               className={styles.screenshotImage}
+              loading="lazy"
+              crossOrigin="anonymous"
             />
-          </div>
+          </a>
         ) : (
           <div className={styles.screenshotPlaceholder}>
             <ImageIcon size={24} strokeWidth={1.5} />
@@ -157,7 +167,9 @@ function ReportPage() {
   }
 
   const auditConfig = reportData.audit_config || {};
-  const allValues = reportData.results.flatMap(r =>
+  // Pages skipped as members of an audited URL template repeat their sample's findings
+  const auditedResults = reportData.results.filter(r => !r.skipped);
+  const allValues = auditedResults.flatMap(r =>
     r.validation?.values || []
   );
 
@@ -168,20 +180,21 @@ function ReportPage() {
     ? allValues.reduce((s, v) => s + v.theme_score, 0) / allValues.length
     : 0;
 
-  // Build thoughts with per-viewport screenshot mapped via viewport_number
-  const allCtaThoughts = reportData.results.flatMap(r => {
+  // Build thoughts with per-viewport screenshot mapped via viewport_number.
+  // Shared header/nav/footer findings are listed once, from the page they were audited on
+  const allCtaThoughts = auditedResults.flatMap(r => {
     const screenshots = r.screenshots || {};
     return (r.validation?.values || []).flatMap(v =>
-      (v.cta_thoughts || []).map(t => ({
+      (v.cta_thoughts || []).filter(t => !t.shared).map(t => ({
         ...t,
         screenshot: screenshots[t.viewport_number] || null,
       }))
     );
   });
-  const allThemeThoughts = reportData.results.flatMap(r => {
+  const allThemeThoughts = auditedResults.flatMap(r => {
     const screenshots = r.screenshots || {};
     return (r.validation?.values || []).flatMap(v =>
-      (v.theme_thoughts || []).map(t => ({
+      (v.theme_thoughts || []).filter(t => !t.shared).map(t => ({
         ...t,
         screenshot: screenshots[t.viewport_number] || null,
       }))